@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令分发基准
+不经过网络，直接把命令行交给 CommandHandler.handle_command，统计每秒处理的命令数。
+连接使用丢弃所有输出的假 StreamWriter，世界数据为 data/ 下的真实数据。
+
+用法: python3 -m benchmarks.command_dispatch [--count 20000] [--metrics]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import CommandHandler
+from protocol import GameProtocol
+from systems.chat_manager import ChatManager
+from systems.metrics import Metrics
+from systems.player_manager import PlayerManager
+from world.world_manager import WorldManager
+
+# 每个场景依次循环执行的命令
+CASES = [
+    ('LOOK', ['LOOK']),
+    ('N/S 别名', ['N', 'S']),
+    ('GO N/GO S', ['GO N', 'GO S']),
+    ('INV', ['INV']),
+    ('WHO', ['WHO']),
+    ('PATH', ['PATH beach']),
+    ('MAP', ['MAP']),
+    ('SAY (冷却中)', ['SAY 你好']),
+    ('未知命令', ['FOO bar'])
+]
+
+
+class NullTransport:
+    def get_write_buffer_size(self):
+        return 0
+
+    def abort(self):
+        pass
+
+
+class NullWriter:
+    """丢弃所有输出的假 StreamWriter"""
+
+    def __init__(self):
+        self.transport = NullTransport()
+
+    def get_extra_info(self, name, default=None):
+        return ('127.0.0.1', 0) if name == 'peername' else default
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class BenchServer:
+    """只包含命令处理需要的管理器"""
+
+    def __init__(self, db_file: str, metrics: Metrics = None):
+        self.metrics = metrics
+        self.world = WorldManager(snapshot_file=None)
+        self.players = PlayerManager(db_file=db_file)
+        self.chat = ChatManager(self)
+        self.command_handler = CommandHandler(self)
+
+
+async def run_case(handler, protocol, lines, count: int) -> float:
+    """执行 count 条命令，返回每秒命令数"""
+    handle = handler.handle_command
+    start = time.perf_counter()
+    for i in range(count):
+        await handle(protocol, lines[i % len(lines)])
+        if i % 64 == 63:
+            # 让发送协程把队列写到假连接里
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+async def run(count: int, metrics: bool = False):
+    with tempfile.TemporaryDirectory() as tmp:
+        server = BenchServer(os.path.join(tmp, 'game.db'), Metrics() if metrics else None)
+        await server.world.load_world()
+        handler = server.command_handler
+
+        protocols = []
+        for name in ('alice', 'bob'):
+            protocol = GameProtocol(None, NullWriter(), server)
+            await handler.handle_command(protocol, f"LOGIN {name}")
+            protocols.append(protocol)
+        protocol = protocols[0]
+
+        # 只查表和解析参数的开销
+        commands = handler.commands
+        start = time.perf_counter()
+        for _ in range(count):
+            name, _, text = "GO N".partition(' ')
+            commands[name].parse(text)
+        parse_rate = count / (time.perf_counter() - start)
+
+        print(f"命令分发基准: 每个场景 {count} 条命令，指标{'开启' if metrics else '关闭'} (Python {sys.version.split()[0]})")
+        print(f"{'场景':<14}{'命令/秒':>12}{'微秒/条':>10}")
+        print(f"{'查表+解析':<14}{parse_rate:>12.0f}{1e6 / parse_rate:>10.2f}")
+        for label, lines in CASES:
+            rate = await run_case(handler, protocol, lines, count)
+            print(f"{label:<14}{rate:>12.0f}{1e6 / rate:>10.2f}")
+
+        for protocol in protocols:
+            await protocol.close()
+        server.players.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令分发基准")
+    parser.add_argument('--count', type=int, default=20000, help="每个场景执行的命令数")
+    parser.add_argument('--metrics', action='store_true', help="开启命令耗时统计")
+    args = parser.parse_args()
+    asyncio.run(run(args.count, args.metrics))
+
+
+if __name__ == "__main__":
+    main()
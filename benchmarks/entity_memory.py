@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实体内存基准
+生成一个大型世界（默认 10 万房间）和一批玩家，用 tracemalloc 统计每个实体常驻的字节数，
+对比改用 __slots__ 之前（实例字典、列表字段）和之后的实现。
+
+原始数据先经过 marshal 往返（与世界快照加载路径相同），构建完对象后释放，
+只统计对象本身留下的内存。
+
+用法: python3 -m benchmarks.entity_memory [--rooms 100000] [--players 10000]
+"""
+
+import argparse
+import gc
+import marshal
+import os
+import sys
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world.world_manager import Room, NPC, Item, Quest
+from systems.player_manager import Player
+
+
+# 改造前的实体实现（实例字典，字段直接引用原始数据）
+
+class LegacyRoom:
+    def __init__(self, data: dict):
+        self.id = data['id']
+        self.title = data['title']
+        self.desc = data['desc']
+        self.pos = data.get('pos', [0, 0])
+        self.exits = data.get('exits', {})
+        self.npcs = data.get('npcs', [])
+        self.monsters = data.get('monsters', [])
+        self.items = data.get('items', [])
+        self.features = data.get('features', [])
+        self.on_enter = data.get('on_enter', [])
+        self.players = set()
+
+class LegacyNPC:
+    def __init__(self, data: dict):
+        self.id = data['id']
+        self.name = data['name']
+        self.title = data.get('title', '')
+        self.room = data.get('room', '')
+        self.dialog = data.get('dialog', {})
+        self.trade = data.get('trade', {})
+        self.quests = data.get('quests', [])
+        self.inventory = data.get('inventory', [])
+
+class LegacyItem:
+    def __init__(self, data: dict):
+        self.id = data['id']
+        self.name = data['name']
+        self.type = data['type']
+        self.desc = data['desc']
+        self.value = data.get('value', 0)
+        self.weight = data.get('weight', 0.0)
+        self.stackable = data.get('stackable', False)
+        self.max_stack = data.get('max_stack', 1)
+        self.durability = data.get('durability', 100)
+        self.damage = data.get('damage', 0)
+        self.defense = data.get('defense', 0)
+        self.effect = data.get('effect', '')
+
+class LegacyQuest:
+    def __init__(self, data: dict):
+        self.id = data['id']
+        self.name = data['name']
+        self.desc = data['desc']
+        self.type = data.get('type', 'side')
+        self.steps = data.get('steps', [])
+        self.reward = data.get('reward', {})
+        self.repeatable = data.get('repeatable', False)
+        self.completed = False
+
+class LegacyPlayer:
+    """与 Player 字段相同，但保存在实例字典中，每个玩家有自己的改动集合，背包为字典"""
+
+    def __init__(self, data: dict):
+        player = Player.from_dict(data)
+        for name in Player.__slots__:
+            setattr(self, name, getattr(player, name))
+        self._dirty = set()
+        self.inventory = player.inventory.to_dict()
+
+
+def generate_records(kind: str, rooms: int) -> list:
+    """生成网格状世界中的一类数据，NPC/物品数量为房间数的 1/10，任务为 1/100"""
+    if kind == 'rooms':
+        side = max(1, int(rooms ** 0.5))
+        records = []
+        for i in range(rooms):
+            x, y = i % side, i // side
+            exits = {}
+            if x > 0:
+                exits['W'] = f"r{i - 1}"
+            if x < side - 1 and i + 1 < rooms:
+                exits['E'] = f"r{i + 1}"
+            if y > 0:
+                exits['S'] = f"r{i - side}"
+            if i + side < rooms:
+                exits['N'] = f"r{i + side}"
+            record = {'id': f"r{i}", 'title': f"房间{i}", 'desc': "潮湿的石板路。", 'pos': [x, y], 'exits': exits}
+            if i % 10 == 0:
+                record['npcs'] = [f"npc{i // 10}"]
+                record['items'] = [f"item{i // 10}"]
+            records.append(record)
+    elif kind == 'npcs':
+        records = [{'id': f"npc{i}", 'name': f"居民{i}", 'room': f"r{i * 10}",
+                    'dialog': {'greet': "你好。"}} for i in range(rooms // 10)]
+    elif kind == 'items':
+        records = [{'id': f"item{i}", 'name': f"物品{i}", 'type': 'material', 'desc': "一件杂物。",
+                    'value': i % 50, 'stackable': True, 'max_stack': 99} for i in range(rooms // 10)]
+    else:
+        records = [{'id': f"q{i}", 'name': f"任务{i}", 'desc': "跑腿。", 'type': 'side',
+                    'steps': [{'talk': {'npc': f"npc{i}"}}], 'reward': {'money': 10}}
+                   for i in range(max(1, rooms // 100))]
+
+    # 与快照加载路径一致：数据来自 marshal 反序列化
+    return marshal.loads(marshal.dumps(records))
+
+
+def generate_players(count: int) -> list:
+    records = []
+    for i in range(count):
+        player = Player(f"旅人{i}", None)
+        player.add_money(i)
+        player.add_item("paper_tape", 1 + i % 3)
+        records.append(player.to_dict())
+    return marshal.loads(marshal.dumps(records))
+
+
+def measure(factory, make_records) -> float:
+    """生成原始数据、构建对象、释放原始数据后常驻的字节数 / 实体"""
+    gc.collect()
+    tracemalloc.start()
+    records = make_records()
+    objects = {}
+    for record in records:
+        obj = factory(record)
+        objects[record['id'] if 'id' in record else record['name']] = obj
+    records.clear()
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(objects)
+    del objects
+    return used / max(1, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实体内存基准")
+    parser.add_argument('--rooms', type=int, default=100000, help="房间数量")
+    parser.add_argument('--players', type=int, default=10000, help="离线玩家记录数量")
+    args = parser.parse_args()
+
+    cases = [
+        ('rooms', LegacyRoom, Room),
+        ('npcs', LegacyNPC, NPC),
+        ('items', LegacyItem, Item),
+        ('quests', LegacyQuest, Quest)
+    ]
+
+    print(f"实体内存基准: {args.rooms} 房间, {args.players} 玩家 (Python {sys.version.split()[0]})")
+    print(f"{'实体':<8}{'数量':>10}{'改造前 B/个':>14}{'改造后 B/个':>14}{'节省':>8}")
+
+    total_before = total_after = 0.0
+    for kind, legacy_cls, cls in cases:
+        count = len(generate_records(kind, args.rooms))
+        before = measure(legacy_cls, lambda: generate_records(kind, args.rooms))
+        after = measure(cls, lambda: generate_records(kind, args.rooms))
+        total_before += before * count
+        total_after += after * count
+        print(f"{kind:<8}{count:>10}{before:>14.0f}{after:>14.0f}{1 - after / before:>8.0%}")
+
+    before = measure(LegacyPlayer, lambda: generate_players(args.players))
+    after = measure(Player.from_dict, lambda: generate_players(args.players))
+    print(f"{'players':<8}{args.players:>10}{before:>14.0f}{after:>14.0f}{1 - after / before:>8.0%}")
+
+    print(f"世界合计: 改造前 {total_before / 1024 / 1024:.1f}MB, 改造后 {total_after / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+负载测试
+用 asyncio 模拟大量 telnet 客户端，每个机器人登录后按配置的比例循环执行
+LOOK/GO/SAY/TELL/JOIN/INV，统计吞吐量、各命令的响应延迟（p50/p95/p99）、
+广播送达延迟和错误数。
+
+默认在本进程内启动一个 GameServer（临时目录，使用 data/ 下的世界数据）；
+指定 --host/--port 时连接已经运行的服务器。--processes 把机器人分到多个进程中，
+避免客户端本身成为瓶颈。--json 把结果写入文件，便于在不同版本之间对比。
+
+延迟的计算方式：
+- 命令延迟：发出命令到收到第一行非 SEEN 的回复；每个机器人同时只有一条命令在途；
+- 广播延迟：SAY/TELL 的内容带有发送时的时间戳（lt:<秒>），接收方收到 SEEN 行时计算差值。
+
+用法: python3 -m benchmarks.loadtest [--bots 1000] [--duration 30] [--processes 4]
+                                     [--mix look=25,go=25,say=20,tell=10,join=5,inv=15]
+                                     [--json result.json] [--max-error-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# 添加项目根目录到Python路径
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COMMAND_KINDS = ('look', 'go', 'say', 'tell', 'join', 'inv')
+DEFAULT_MIX = 'look=25,go=25,say=20,tell=10,join=5,inv=15'
+CHANNELS = ('#bench0', '#bench1', '#bench2', '#bench3')
+REPLAY_PREFIX = "SYS 最近的 "
+EXITS_PREFIX = "SYS 出口: "
+WELCOME_END = "LOGIN <"  # 欢迎信息的最后一行
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析 "go=30,say=20" 形式的命令比例"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.strip().partition('=')
+        kind = kind.lower()
+        if kind not in COMMAND_KINDS:
+            raise ValueError(f"未知命令类型: {kind}（可选 {', '.join(COMMAND_KINDS)}）")
+        mix[kind] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("命令比例不能全部为 0")
+    return mix
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """已排序样本的 q 分位数（最近秩）"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(q / 100.0 * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """延迟样本（秒）汇总为毫秒"""
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0
+    }
+
+
+class LoadStats:
+    """一个进程内所有机器人共享的统计"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {kind: [] for kind in COMMAND_KINDS + ('login',)}
+        self.errors: Dict[str, int] = {kind: 0 for kind in COMMAND_KINDS + ('login',)}
+        self.broadcast: List[float] = []
+        self.counters = {'connect_errors': 0, 'timeouts': 0, 'disconnects': 0, 'lines_received': 0}
+
+    def to_dict(self) -> Dict:
+        return {'latencies': self.latencies, 'errors': self.errors,
+                'broadcast': self.broadcast, 'counters': self.counters}
+
+    def merge(self, data: Dict):
+        for kind, samples in data['latencies'].items():
+            self.latencies[kind].extend(samples)
+        for kind, count in data['errors'].items():
+            self.errors[kind] += count
+        self.broadcast.extend(data['broadcast'])
+        for key, value in data['counters'].items():
+            self.counters[key] += value
+
+
+class Bot:
+    """一个脚本化的客户端：同一时间只有一条命令在途"""
+
+    def __init__(self, name: str, stats: LoadStats, mix: Dict[str, float],
+                 peers: List[str], rng: random.Random, timeout: float):
+        self.name = name
+        self.stats = stats
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.peers = peers
+        self.rng = rng
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.pending: Optional[asyncio.Future] = None
+        self.exits: List[str] = []
+        self.skip_seen = 0  # 回放的历史消息行数，不计入广播延迟
+
+    async def run(self, host: str, port: int, start_at: float, end_at: float, think: float):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(max(0.0, start_at - loop.time()))
+        try:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+            # 读完欢迎信息再登录，登录延迟不包括欢迎信息
+            while WELCOME_END not in (await asyncio.wait_for(self.reader.readline(), self.timeout)).decode('utf-8', 'replace'):
+                pass
+        except (OSError, asyncio.TimeoutError):
+            self.stats.counters['connect_errors'] += 1
+            if self.writer is not None:
+                self.writer.close()
+            return
+
+        reader_task = asyncio.create_task(self._read_loop())
+        try:
+            if await self.command(f"LOGIN {self.name}", 'login'):
+                self.peers.append(self.name)
+                while loop.time() < end_at:
+                    await asyncio.sleep(self.rng.uniform(0.5, 1.5) * think)
+                    kind = self.rng.choices(self.kinds, self.weights)[0]
+                    if not await self.command(self._line(kind), kind):
+                        break
+                self.peers.remove(self.name)
+            # 等服务器发完再见并关闭连接
+            self.writer.write(b"QUIT\n")
+            await self.writer.drain()
+            await asyncio.wait_for(reader_task, self.timeout)
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            self.stats.counters['disconnects'] += 1
+        finally:
+            reader_task.cancel()
+            self.writer.close()
+
+    def _line(self, kind: str) -> str:
+        """按类型生成一条命令"""
+        if kind == 'go':
+            return f"GO {self.rng.choice(self.exits or ['N', 'S', 'E', 'W'])}"
+        if kind == 'say':
+            return f"SAY lt:{time.time():.6f}"
+        if kind == 'tell':
+            target = self.rng.choice(self.peers) if len(self.peers) > 1 else self.name
+            return f"TELL {target} lt:{time.time():.6f}"
+        if kind == 'join':
+            return f"JOIN {self.rng.choice(CHANNELS)}"
+        return kind.upper()
+
+    async def command(self, line: str, kind: str) -> bool:
+        """发出命令并等待回复，返回连接是否仍然可用"""
+        self.pending = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        self.writer.write(line.encode('utf-8') + b"\n")
+        try:
+            reply = await asyncio.wait_for(self.pending, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.counters['timeouts'] += 1
+            self.stats.errors[kind] += 1
+            return True
+        if reply is None:
+            self.stats.counters['disconnects'] += 1
+            self.stats.errors[kind] += 1
+            return False
+        self.stats.latencies[kind].append(time.perf_counter() - start)
+        if reply.startswith("ERR") and not (kind == 'go' and "没有出口" in reply):
+            self.stats.errors[kind] += 1
+        return True
+
+    async def _read_loop(self):
+        """读取所有输出：SEEN 行是广播，其他行中的第一行是当前命令的回复"""
+        stats = self.stats
+        try:
+            while True:
+                data = await self.reader.readline()
+                if not data:
+                    break
+                stats.counters['lines_received'] += 1
+                line = data.decode('utf-8', errors='replace').rstrip()
+                if line.startswith("SEEN"):
+                    if self.skip_seen:
+                        self.skip_seen -= 1
+                        continue
+                    marker = line.rfind(" lt:")
+                    if marker >= 0:
+                        try:
+                            stats.broadcast.append(time.time() - float(line[marker + 4:]))
+                        except ValueError:
+                            pass
+                    continue
+
+                if line.startswith(EXITS_PREFIX):
+                    self.exits = [part.split(' -> ')[0] for part in line[len(EXITS_PREFIX):].split(', ')]
+                elif line.startswith(REPLAY_PREFIX):
+                    self.skip_seen = int(line[len(REPLAY_PREFIX):].split(' ')[0])
+                if self.pending is not None and not self.pending.done():
+                    self.pending.set_result(line)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if self.pending is not None and not self.pending.done():
+                self.pending.set_result(None)
+
+
+async def run_bots(host: str, port: int, names: List[str], options: Dict) -> Dict:
+    """在当前事件循环中运行一组机器人，返回统计"""
+    stats = LoadStats()
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    ramp, duration = options['ramp'], options['duration']
+    peers: List[str] = []
+    rng = random.Random(f"{options['seed']}:{names[0] if names else ''}")
+    bots = [Bot(name, stats, options['mix'], peers, random.Random(rng.random()), options['timeout'])
+            for name in names]
+    await asyncio.gather(*[
+        bot.run(host, port, now + ramp * i / max(1, len(bots)), now + ramp + duration, options['think'])
+        for i, bot in enumerate(bots)
+    ])
+    return stats.to_dict()
+
+
+def _worker(host: str, port: int, names: List[str], options: Dict, results):
+    """子进程入口"""
+    _raise_fd_limit()
+    results.put(asyncio.run(run_bots(host, port, names, options)))
+
+
+def _raise_fd_limit():
+    """机器人数量较多时需要提高文件描述符上限"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def start_local_server():
+    """在临时目录中启动一个进程内服务器，返回 (服务器, 任务, 端口, 临时目录)"""
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.makedirs(os.path.join(workdir, 'data'))
+    from world.snapshot import WORLD_FILES, source_path
+    for kind in WORLD_FILES:
+        shutil.copy(source_path(os.path.join(ROOT, 'data'), kind), source_path(os.path.join(workdir, 'data'), kind))
+    os.chdir(workdir)
+
+    import logging
+    from server import GameServer
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = GameServer(host='127.0.0.1', port=0)
+    task = asyncio.create_task(server.start())
+    while server.server is None or not server.running:
+        if task.done():
+            raise RuntimeError("服务器启动失败")
+        await asyncio.sleep(0.05)
+    port = server.server.sockets[0].getsockname()[1]
+    return server, task, port, workdir
+
+
+async def run(args) -> Dict:
+    options = {
+        'mix': parse_mix(args.mix),
+        'duration': args.duration,
+        'ramp': args.ramp,
+        'think': args.think,
+        'timeout': args.timeout,
+        'seed': args.seed
+    }
+    names = [f"bot{i}" for i in range(args.bots)]
+    host, port = args.host, args.port
+    server = task = workdir = None
+    cwd = os.getcwd()
+    if host is None:
+        server, task, port, workdir = await start_local_server()
+        host = '127.0.0.1'
+
+    stats = LoadStats()
+    started = time.perf_counter()
+    try:
+        if args.processes <= 1:
+            stats.merge(await run_bots(host, port, names, options))
+        else:
+            context = multiprocessing.get_context('spawn')
+            results = context.Queue()
+            workers = [context.Process(target=_worker, args=(host, port, names[i::args.processes], options, results))
+                       for i in range(args.processes)]
+            for worker in workers:
+                worker.start()
+            loop = asyncio.get_running_loop()
+            for _ in workers:
+                stats.merge(await loop.run_in_executor(None, results.get))
+            for worker in workers:
+                worker.join()
+        elapsed = time.perf_counter() - started
+
+        server_stats = None
+        if server is not None:
+            server_stats = {
+                'tick': server.scheduler.get_stats(),
+                'peak_players': server.stats['peak_players'],
+                'events_written': server.events.log.stats['records_written']
+            }
+    finally:
+        if server is not None:
+            await server.stop()
+            await task
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commands = {kind: dict(summarize(stats.latencies[kind]), errors=stats.errors[kind])
+                for kind in ('login',) + COMMAND_KINDS}
+    total = sum(len(stats.latencies[kind]) for kind in COMMAND_KINDS)
+    errors = sum(stats.errors.values())
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'config': {
+            'bots': args.bots, 'processes': args.processes, 'duration': args.duration,
+            'ramp': args.ramp, 'think': args.think, 'mix': options['mix'],
+            'server': 'local' if server is not None else f"{args.host}:{args.port}"
+        },
+        'elapsed': round(elapsed, 3),
+        'commands_total': total,
+        'throughput': round(total / elapsed, 1) if elapsed else 0.0,
+        'errors_total': errors,
+        'error_rate': round(errors / max(1, total + len(stats.latencies['login'])), 5),
+        'commands': commands,
+        'broadcast': summarize(stats.broadcast),
+        'counters': stats.counters,
+        'server': server_stats
+    }
+
+
+def print_report(result: Dict):
+    config = result['config']
+    print(f"负载测试: {config['bots']} 个机器人, {config['processes']} 个进程, "
+          f"{config['duration']}s (+{config['ramp']}s 爬坡), 服务器 {config['server']}")
+    print(f"{'命令':<8}{'次数':>9}{'错误':>7}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'maxms':>10}")
+    rows = list(result['commands'].items()) + [('广播', dict(result['broadcast'], errors=0))]
+    for kind, row in rows:
+        print(f"{kind:<8}{row['count']:>9}{row['errors']:>7}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    print(f"吞吐量: {result['throughput']:.1f} 命令/秒，错误率 {result['error_rate']:.3%}，"
+          f"超时 {result['counters']['timeouts']}，连接失败 {result['counters']['connect_errors']}，"
+          f"断开 {result['counters']['disconnects']}")
+    if result['server']:
+        tick = result['server']['tick']
+        print(f"服务器: 峰值在线 {result['server']['peak_players']}，tick 统计 {tick}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟大量客户端的负载测试")
+    parser.add_argument('--bots', type=int, default=200, help="机器人数量")
+    parser.add_argument('--duration', type=float, default=20.0, help="全部上线后持续的秒数")
+    parser.add_argument('--ramp', type=float, default=5.0, help="机器人逐个上线所用的秒数")
+    parser.add_argument('--think', type=float, default=1.0, help="两条命令之间的平均间隔（秒）")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="命令比例，如 look=25,go=25,say=20")
+    parser.add_argument('--processes', type=int, default=1, help="运行机器人的进程数")
+    parser.add_argument('--host', help="连接已运行的服务器（默认在本进程启动一个）")
+    parser.add_argument('--port', type=int, default=2323, help="已运行服务器的端口")
+    parser.add_argument('--timeout', type=float, default=10.0, help="单条命令的超时（秒）")
+    parser.add_argument('--seed', type=int, default=1, help="随机种子")
+    parser.add_argument('--json', help="把结果写入 JSON 文件")
+    parser.add_argument('--max-error-rate', type=float, help="错误率超过该值时以状态码 1 退出")
+    args = parser.parse_args()
+
+    _raise_fd_limit()
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    if args.max_error_rate is not None and result['error_rate'] > args.max_error_rate:
+        print(f"错误率 {result['error_rate']:.3%} 超过上限 {args.max_error_rate:.3%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
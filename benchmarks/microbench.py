@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点路径微基准
+不经过网络，用丢弃输出的假连接逐个测量热点路径：
+命令分发、房间聊天广播、玩家序列化、世界加载和输入分帧。
+每个场景在不同规模（1/100/1000 名同房间玩家，10/1 万个房间）下测量每秒操作数，
+并用 tracemalloc 统计单次操作的峰值分配和残留内存。
+
+结果可以保存为基线，之后与基线对比，速度下降或分配增加超过阈值的场景标记为回归，
+此时以状态码 1 退出。
+
+用法: python3 -m benchmarks.microbench [--filter chat] [--quick]
+                                      [--save baseline.json] [--compare baseline.json] [--threshold 0.15]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import yaml
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.command_dispatch import BenchServer, NullWriter
+from benchmarks.entity_memory import generate_records
+from framing import LineFramer
+from protocol import GameProtocol
+from systems.player_manager import Player
+from systems.rate_limiter import RateLimiter
+from world.item_catalog import ItemCatalog
+from world.snapshot import WORLD_FILES, source_path
+from world.world_manager import WorldManager
+
+PLAYER_SCALES = (1, 100, 1000)
+ROOM_SCALES = (10, 10000)
+UNLIMITED = {'command': (1e9, 1e9), 'chat': (1e9, 1e9)}
+YIELD_EVERY = 64  # 异步场景每执行这么多次让出一次，让发送协程清空队列
+YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)  # 没有编译 libyaml 时退回纯 Python 实现
+
+# 场景注册表：(名称, 规模, setup)。setup 是协程，返回 (操作, 清理)
+CASES: List[Tuple[str, str, Callable]] = []
+
+
+def case(name: str, scales=(None,)):
+    """注册一个场景，scales 中的每个值生成一个条目"""
+    def register(setup):
+        for scale in scales:
+            label = '' if scale is None else str(scale)
+            CASES.append((name, label, (lambda s: lambda ctx: setup(ctx, s))(scale)))
+        return setup
+    return register
+
+
+class Context:
+    """场景共用的临时目录"""
+
+    def __init__(self, tmp: str):
+        self.tmp = tmp
+        self.worlds: Dict[int, str] = {}
+
+    def world_dir(self, rooms: int) -> str:
+        """生成 rooms 个房间的网格世界，写成 YAML 数据目录"""
+        if rooms not in self.worlds:
+            directory = os.path.join(self.tmp, f"world{rooms}")
+            os.makedirs(directory)
+            for kind in WORLD_FILES:
+                with open(source_path(directory, kind), 'w', encoding='utf-8') as f:
+                    yaml.dump(generate_records(kind, rooms), f, Dumper=YamlDumper, allow_unicode=True)
+            self.worlds[rooms] = directory
+        return self.worlds[rooms]
+
+
+async def login_players(count: int, db_file: str):
+    """登录 count 个玩家（都在出生点），返回服务器和连接列表"""
+    server = BenchServer(db_file)
+    await server.world.load_world()
+    protocols = []
+    for i in range(count):
+        protocol = GameProtocol(None, NullWriter(), server)
+        protocol.rate_limiter = RateLimiter(UNLIMITED)
+        await server.command_handler.handle_command(protocol, f"LOGIN bench{i}")
+        protocols.append(protocol)
+    await asyncio.sleep(0)
+
+    async def cleanup():
+        for protocol in protocols:
+            await protocol.close()
+        server.players.close()
+    return server, protocols, cleanup
+
+
+def _command_case(lines: List[str]):
+    async def setup(ctx: Context, players: int):
+        server, protocols, cleanup = await login_players(players, os.path.join(ctx.tmp, f"cmd{id(lines)}_{players}.db"))
+        handle, protocol = server.command_handler.handle_command, protocols[0]
+        state = [0]
+
+        async def op():
+            i = state[0]
+            state[0] = i + 1
+            await handle(protocol, lines[i % len(lines)])
+        return op, cleanup
+    return setup
+
+
+case("handle_command LOOK", PLAYER_SCALES)(_command_case(["LOOK"]))
+case("handle_command GO", PLAYER_SCALES)(_command_case(["GO N", "GO S"]))
+case("handle_command SAY", PLAYER_SCALES)(_command_case(["SAY 你好"]))
+
+
+@case("send_room_message", PLAYER_SCALES)
+async def _room_chat(ctx: Context, players: int):
+    server, protocols, cleanup = await login_players(players, os.path.join(ctx.tmp, f"chat{players}.db"))
+    player, send = protocols[0].player, server.chat.send_room_message
+
+    async def op():
+        await send(player, "开船了")
+    return op, cleanup
+
+
+@case("Player.to_dict")
+async def _to_dict(ctx: Context, _):
+    player = _sample_player()
+    return player.to_dict, None
+
+
+@case("Player.from_dict")
+async def _from_dict(ctx: Context, _):
+    data = _sample_player().to_dict()
+    return (lambda: Player.from_dict(data)), None
+
+
+def _sample_player() -> Player:
+    player = Player("旅人", None)
+    player.add_money(120)
+    player.add_item("paper_tape", 2)
+    player.add_item("fish", 5)
+    return player
+
+
+@case("load_world 快照", ROOM_SCALES)
+async def _load_snapshot(ctx: Context, rooms: int):
+    directory = ctx.world_dir(rooms)
+    snapshot = os.path.join(directory, 'world.snapshot')
+    await WorldManager(directory, snapshot, ItemCatalog()).load_world()  # 生成快照
+
+    async def op():
+        await WorldManager(directory, snapshot, ItemCatalog()).load_world()
+    return op, None
+
+
+@case("load_world YAML", ROOM_SCALES)
+async def _load_yaml(ctx: Context, rooms: int):
+    directory = ctx.world_dir(rooms)
+
+    async def op():
+        await WorldManager(directory, None, ItemCatalog()).load_world()
+    return op, None
+
+
+@case("分帧+解析 64行")
+async def _framing(ctx: Context, _):
+    server = BenchServer(os.path.join(ctx.tmp, "framing.db"))
+    commands = server.command_handler.commands
+    chunk = b"".join(line.encode('utf-8') + b"\r\n" for line in ["LOOK", "GO N", "SAY 你好", "TELL bob hi"] * 16)
+    framer = LineFramer(2000)
+
+    def op():
+        for line in framer.feed(chunk):
+            name, _, text = line.decode('utf-8', errors='replace').strip().partition(' ')
+            command = commands.get(name) or commands.get(name.upper())
+            command.parse(text)
+
+    async def cleanup():
+        server.players.close()
+    return op, cleanup
+
+
+async def _run_batch(op: Callable, is_async: bool, n: int) -> float:
+    start = time.perf_counter()
+    if is_async:
+        for i in range(n):
+            await op()
+            if i % YIELD_EVERY == YIELD_EVERY - 1:
+                await asyncio.sleep(0)
+    else:
+        for _ in range(n):
+            op()
+    return time.perf_counter() - start
+
+
+async def measure(op: Callable, min_time: float, rounds: int) -> Dict[str, float]:
+    """每秒操作数（多轮取最好）、单次操作的峰值分配和平均残留字节"""
+    is_async = asyncio.iscoroutinefunction(op)
+
+    # 校准每轮的次数，使一轮至少 min_time / rounds
+    n = 1
+    while True:
+        elapsed = await _run_batch(op, is_async, n)
+        if elapsed >= min_time / rounds or n >= 1 << 20:
+            break
+        n *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / rounds / elapsed) + 1))
+
+    gc.collect()
+    best = min([await _run_batch(op, is_async, n) for _ in range(rounds)])
+
+    # 分配：逐次测峰值，再统计一批操作之后残留的内存
+    samples = max(1, min(n, 200))
+    gc.collect()
+    tracemalloc.start()
+    peak_total = 0
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(samples):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        if is_async:
+            await op()
+        else:
+            op()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    if is_async:
+        await asyncio.sleep(0)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': round(n / best, 1),
+        'us_per_op': round(best / n * 1e6, 3),
+        'peak_bytes_per_op': round(peak_total / samples),
+        'retained_bytes_per_op': round(max(0, after - before) / samples)
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """与基线对比，返回回归的场景"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            result['delta'] = None
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        alloc = result['peak_bytes_per_op'] - base['peak_bytes_per_op']
+        result['delta'] = {'speed': round(speed, 4), 'peak_bytes': alloc}
+        # 分配增加 64 字节以内视为噪声
+        if speed < -threshold or (alloc > 64 and alloc > base['peak_bytes_per_op'] * threshold):
+            regressions.append(key)
+    return regressions
+
+
+async def run(args) -> Dict[str, Dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = Context(tmp)
+        print(f"热点路径微基准 (Python {sys.version.split()[0]})")
+        print(f"{'场景':<28}{'规模':>7}{'操作/秒':>12}{'微秒/次':>12}{'峰值B/次':>11}{'残留B/次':>10}")
+        for name, label, setup in CASES:
+            key = f"{name} [{label}]" if label else name
+            if args.filter and args.filter.lower() not in key.lower():
+                continue
+            op, cleanup = await setup(ctx)
+            try:
+                result = await measure(op, args.min_time, args.rounds)
+            finally:
+                if cleanup is not None:
+                    await cleanup()
+            results[key] = result
+            print(f"{name:<28}{label:>7}{result['ops_per_sec']:>12.1f}{result['us_per_op']:>12.1f}"
+                  f"{result['peak_bytes_per_op']:>11}{result['retained_bytes_per_op']:>10}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点路径微基准")
+    parser.add_argument('--filter', help="只运行名称包含该字符串的场景")
+    parser.add_argument('--min-time', type=float, default=1.0, help="每个场景计时的总秒数")
+    parser.add_argument('--rounds', type=int, default=5, help="计时轮数，取最快的一轮")
+    parser.add_argument('--quick', action='store_true', help="快速模式（0.2 秒，3 轮）")
+    parser.add_argument('--save', help="把结果保存为基线 JSON")
+    parser.add_argument('--compare', help="与基线 JSON 对比")
+    parser.add_argument('--threshold', type=float, default=0.15, help="判定为回归的相对变化")
+    args = parser.parse_args()
+    if args.quick:
+        args.min_time, args.rounds = 0.2, 3
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    results = asyncio.run(run(args))
+
+    status = 0
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n与基线 {args.compare} 对比（阈值 {args.threshold:.0%}）:")
+        for key, result in results.items():
+            delta = result['delta']
+            if delta is None:
+                print(f"  {key:<36} 基线中没有")
+                continue
+            flag = "  <-- 回归" if key in regressions else ""
+            print(f"  {key:<36} 速度 {delta['speed']:+.1%}  峰值分配 {delta['peak_bytes']:+d}B{flag}")
+        if regressions:
+            print(f"{len(regressions)} 个场景出现回归")
+            status = 1
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.save}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
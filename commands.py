@@ -7,66 +7,171 @@
 
 import asyncio
 import logging
-from typing import List, Optional
+import time
+from typing import Callable, Dict, List, Optional
+
+import config
+from framing import encode_line
+from world.room_graph import render_map
 
 logger = logging.getLogger(__name__)
 
+def compile_parser(spec: str) -> Callable[[str], Optional[List[str]]]:
+    """把参数格式编译为解析函数，参数不足时解析函数返回 None
+    
+    格式: <名称> 为必填参数，[名称] 为可选参数；
+    最后一个参数以 ... 结尾时收集剩余的全部文本（保留中间的空格）。
+    """
+    params = spec.split()
+    required = sum(1 for param in params if param.startswith('<'))
+    
+    if params and params[-1].rstrip('>]').endswith('...'):
+        maxsplit = len(params) - 1
+        
+        def parse(text: str) -> Optional[List[str]]:
+            args = text.split(None, maxsplit)
+            return args if len(args) >= required else None
+    else:
+        def parse(text: str) -> Optional[List[str]]:
+            args = text.split()
+            return args if len(args) >= required else None
+    
+    return parse
+
+class Command:
+    """一条命令的定义：处理函数、是否需要登录、参数格式，注册时编译好解析器"""
+    
+    __slots__ = ('name', 'handler', 'auth', 'usage', 'parse')
+    
+    def __init__(self, name: str, handler, auth: bool = True, args: str = ''):
+        self.name = name
+        self.handler = handler
+        self.auth = auth
+        self.usage = f"用法: {name} {args.replace('...', '')}".rstrip()  # 剩余文本标记 ... 只供解析器使用
+        self.parse = compile_parser(args)
+    
+    def alias(self, name: str, prefix: str = '') -> 'Command':
+        """别名：同一个处理函数，可以预先填入参数（例如 N = GO N）
+
+        别名沿用原命令的名字，耗时等指标计入原命令。
+        """
+        command = Command(name, self.handler, self.auth)
+        command.name = self.name
+        command.usage = self.usage
+        if prefix:
+            parse = self.parse
+            prefix = f"{prefix} "
+            command.parse = lambda text: parse(prefix + text)
+        else:
+            command.parse = self.parse
+        return command
+
 class CommandHandler:
     def __init__(self, server):
         self.server = server
-        self.commands = {}
+        self.metrics = getattr(server, 'metrics', None)  # 关闭指标或测试中为 None
+        self.monitor = getattr(server, 'loop_monitor', None)  # 关闭卡顿监视或测试中为 None
+        self.commands: Dict[str, Command] = {}
         self._register_commands()
     
     def _register_commands(self):
-        """注册所有命令"""
-        self.commands = {
-            'LOGIN': self.cmd_login,
-            'LOOK': self.cmd_look,
-            'GO': self.cmd_go,
-            'SAY': self.cmd_say,
-            'WHO': self.cmd_who,
-            'TELL': self.cmd_tell,
-            'JOIN': self.cmd_join,
-            'LEAVE': self.cmd_leave,
-            'INV': self.cmd_inventory,
-            'USE': self.cmd_use,
-            'GIVE': self.cmd_give,
-            'EQUIP': self.cmd_equip,
-            'STATS': self.cmd_stats,
-            'QUESTS': self.cmd_quests,
-            'TRACK': self.cmd_track,
-            'TURNIN': self.cmd_turnin,
-            'ATTACK': self.cmd_attack,
-            'SKILL': self.cmd_skill,
-            'FLEE': self.cmd_flee,
-            'HELP': self.cmd_help,
-            'QUIT': self.cmd_quit,
-            'MAP': self.cmd_map,
-            'EMOTE': self.cmd_emote,
-            'BOARD': self.cmd_board,
-            'MAIL': self.cmd_mail
-        }
-    
-    async def handle_command(self, protocol, command: str, args: List[str]):
-        """处理命令"""
+        """注册所有命令：是否需要登录、参数格式和别名都只在这里声明一次"""
+        registry = [
+            (Command('LOGIN', self.cmd_login, auth=False, args='<昵称>'), {}),
+            (Command('LOOK', self.cmd_look), {}),
+            (Command('GO', self.cmd_go, args='<方向>'), {'N': 'N', 'S': 'S', 'E': 'E', 'W': 'W'}),
+            (Command('SAY', self.cmd_say, args='<内容...>'), {}),
+            (Command('WHO', self.cmd_who, auth=False), {}),
+            (Command('TELL', self.cmd_tell, args='<玩家名> <内容...>'), {}),
+            (Command('JOIN', self.cmd_join, args='<频道名>'), {}),
+            (Command('LEAVE', self.cmd_leave, args='<频道名>'), {}),
+            (Command('INV', self.cmd_inventory), {}),
+            (Command('USE', self.cmd_use, args='<物品>'), {}),
+            (Command('GIVE', self.cmd_give, args='<玩家名> <物品>'), {}),
+            (Command('EQUIP', self.cmd_equip, args='<物品>'), {}),
+            (Command('STATS', self.cmd_stats), {}),
+            (Command('QUESTS', self.cmd_quests), {}),
+            (Command('TRACK', self.cmd_track, args='<任务ID>'), {}),
+            (Command('TURNIN', self.cmd_turnin, args='<任务ID>'), {}),
+            (Command('ATTACK', self.cmd_attack, args='<目标>'), {}),
+            (Command('SKILL', self.cmd_skill, args='<技能名> <目标>'), {}),
+            (Command('FLEE', self.cmd_flee), {}),
+            (Command('HELP', self.cmd_help, auth=False, args='[主题]'), {}),
+            (Command('QUIT', self.cmd_quit, auth=False), {}),
+            (Command('MAP', self.cmd_map), {}),
+            (Command('PATH', self.cmd_path, args='<房间...>'), {}),
+            (Command('EMOTE', self.cmd_emote, args='<动作...>'), {}),
+            (Command('BOARD', self.cmd_board), {}),
+            (Command('MAIL', self.cmd_mail), {}),
+            (Command('LAG', self.cmd_lag, args='[卡顿编号]'), {})
+        ]
+        
+        # 命令名和别名编译进同一张表，分发时只查一次
+        self.commands = {}
+        for command, aliases in registry:
+            self.commands[command.name] = command
+            for alias, prefix in aliases.items():
+                self.commands[alias] = command.alias(alias, prefix)
+    
+    async def handle_command(self, protocol, message: str):
+        """处理一行命令：一次查表，一次参数解析"""
         try:
-            if command in self.commands:
-                await self.commands[command](protocol, args)
+            # "内容" 是 SAY 内容 的简写
+            if len(message) > 1 and message[0] == '"' and message[-1] == '"':
+                command = self.commands['SAY']
+                text = message[1:-1]
+            else:
+                name, _, text = message.partition(' ')
+                command = self.commands.get(name)
+                if command is None:
+                    command = self.commands.get(name.upper())
+                    if command is None:
+                        await protocol.send_message("ERR", f"未知命令: {name.upper()}")
+                        return
+            
+            if command.auth and not protocol.is_authenticated():
+                await protocol.send_message("ERR", "请先登录")
+                return
+            
+            args = command.parse(text)
+            if args is None:
+                await protocol.send_message("ERR", command.usage)
+                return
+            
+            metrics, monitor = self.metrics, self.monitor
+            if metrics is None and monitor is None:
+                await command.handler(protocol, args)
             else:
-                await protocol.send_message("ERR", f"未知命令: {command}")
+                if monitor is not None:
+                    previous = monitor.begin('命令', command.name)
+                start = time.perf_counter()
+                try:
+                    await command.handler(protocol, args)
+                finally:
+                    if metrics is not None:
+                        metrics.record_command(command.name, time.perf_counter() - start)
+                    if monitor is not None:
+                        monitor.end(previous)
                 
         except Exception as e:
             logger.error(f"命令执行错误: {e}")
             await protocol.send_message("ERR", "命令执行出错，请重试")
     
+    def _record(self, kind: str, sender: str, target: str = "", content: str = ""):
+        """写入事件日志（测试和基准中的服务器没有事件日志时忽略）"""
+        events = getattr(self.server, 'events', None)
+        if events is not None:
+            events.record(kind, sender, target, content)
+    
     async def cmd_login(self, protocol, args: List[str]):
         """登录命令"""
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: LOGIN <昵称>")
-            return
-        
         nickname = args[0]
         
+        # 已登录的连接再次登录会留下一个不会被移除的旧玩家
+        if protocol.is_authenticated():
+            await protocol.send_message("ERR", f"你已经以 {protocol.get_player().name} 登录")
+            return
+        
         # 检查昵称长度
         if len(nickname) < 2 or len(nickname) > 20:
             await protocol.send_message("ERR", "昵称长度必须在2-20个字符之间")
@@ -81,11 +186,17 @@ class CommandHandler:
             # 创建或加载玩家
             player = await self.server.players.create_player(nickname, protocol)
             protocol.set_player(player)
+            self.server.world.place_player(player, player.current_room)
             
             await protocol.send_message("OK", f"登录成功！欢迎来到电传之城，{nickname}")
+            self._record("login", player.name, player.current_room,
+                         str(protocol.addr[0]) if protocol.addr else "")
             
-            # 显示当前房间信息
+            # 显示当前房间信息和最近的房间聊天
             await self.cmd_look(protocol, [])
+            replay = self.server.chat.room_replay(player.current_room)
+            if replay:
+                protocol.queue_bytes(replay)
             
         except ValueError as e:
             await protocol.send_message("ERR", str(e))
@@ -95,10 +206,6 @@ class CommandHandler:
     
     async def cmd_look(self, protocol, args: List[str]):
         """查看房间命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
         player = protocol.get_player()
         room_id = player.current_room
         
@@ -108,31 +215,16 @@ class CommandHandler:
             await protocol.send_message("ERR", "房间不存在")
             return
         
-        # 发送房间信息
-        await protocol.send_message("ROOM", room.title)
-        await protocol.send_message("DESC", room.desc)
-        
-        # 显示出口
-        if room.exits:
-            exits = ", ".join([f"{dir} -> {room_id}" for dir, room_id in room.exits.items()])
-            await protocol.send_message("SYS", f"出口: {exits}")
-        
-        # 显示房间内的其他玩家
+        # 静态部分使用房间缓存的字节，只有在场玩家一行按需生成，整体一次写入
+        data = room.view
         room_players = [p for p in room.get_players() if p != player]
         if room_players:
             player_names = ", ".join([p.name for p in room_players])
-            await protocol.send_message("SYS", f"房间内的其他玩家: {player_names}")
+            data += encode_line(f"SYS 房间内的其他玩家: {player_names}")
+        protocol.queue_bytes(data)
     
     async def cmd_go(self, protocol, args: List[str]):
         """移动命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: GO <方向> (N/S/E/W)")
-            return
-        
         direction = args[0].upper()
         if direction not in ['N', 'S', 'E', 'W']:
             await protocol.send_message("ERR", "无效方向，请使用 N/S/E/W")
@@ -156,34 +248,26 @@ class CommandHandler:
             await protocol.send_message("ERR", "目标房间不存在")
             return
         
+        # 通知原房间的其他玩家
+        await protocol.broadcast_to_room(f"离开了房间", exclude_self=True)
+        
         # 移动玩家
         old_room = player.current_room
-        player.current_room = target_room_id
-        
-        # 通知其他玩家
-        await protocol.broadcast_to_room(f"离开了房间")
+        self.server.world.move_player(player, target_room_id)
+        self._record("move", player.name, target_room_id, old_room)
         
         # 进入新房间
-        await protocol.send_message("OK", f"你向{direction}方向移动")
-        await protocol.send_message("ROOM", target_room.title)
-        await protocol.send_message("DESC", target_room.desc)
+        protocol.queue_bytes(encode_line(f"OK 你向{direction}方向移动") + target_room.view +
+                             self.server.chat.room_replay(target_room_id))
         
         # 通知新房间的玩家
-        await protocol.broadcast_to_room(f"进入了房间")
+        await protocol.broadcast_to_room(f"进入了房间", exclude_self=True)
         
         logger.info(f"玩家 {player.name} 从 {old_room} 移动到 {target_room_id}")
     
     async def cmd_say(self, protocol, args: List[str]):
         """说话命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: SAY <内容>")
-            return
-        
-        message = " ".join(args)
+        message = args[0]
         player = protocol.get_player()
         
         # 发送房间消息
@@ -215,16 +299,7 @@ class CommandHandler:
     
     async def cmd_tell(self, protocol, args: List[str]):
         """私聊命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 2:
-            await protocol.send_message("ERR", "用法: TELL <玩家名> <内容>")
-            return
-        
-        target_name = args[0]
-        message = " ".join(args[1:])
+        target_name, message = args
         sender = protocol.get_player()
         
         # 发送私聊
@@ -234,14 +309,6 @@ class CommandHandler:
     
     async def cmd_join(self, protocol, args: List[str]):
         """加入频道命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: JOIN <频道名>")
-            return
-        
         channel_name = args[0]
         if not channel_name.startswith('#'):
             channel_name = '#' + channel_name
@@ -253,14 +320,6 @@ class CommandHandler:
     
     async def cmd_leave(self, protocol, args: List[str]):
         """离开频道命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: LEAVE <频道名>")
-            return
-        
         channel_name = args[0]
         if not channel_name.startswith('#'):
             channel_name = '#' + channel_name
@@ -272,10 +331,6 @@ class CommandHandler:
     
     async def cmd_inventory(self, protocol, args: List[str]):
         """查看背包命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
         player = protocol.get_player()
         inventory = player.get_inventory()
         
@@ -283,20 +338,15 @@ class CommandHandler:
             await protocol.send_message("SYS", "你的背包是空的")
             return
         
-        await protocol.send_message("SYS", "背包内容:")
-        for item_id, count in inventory.items():
-            item = self.server.world.get_item(item_id)
-            if item:
-                await protocol.send_message("SYS", f"  {item.name} x{count}")
-            else:
-                await protocol.send_message("SYS", f"  {item_id} x{count}")
+        # 逐格生成显示内容，整个列表作为一次写入发送
+        catalog = inventory.catalog
+        lines = [f"SYS 背包内容 ({inventory.used_slots}/{inventory.capacity} 格):"]
+        for code, count in inventory.slots():
+            lines.append(f"SYS   {catalog.name(code)} x{count}")
+        protocol.queue_bytes(encode_line("\n".join(lines)))
     
     async def cmd_stats(self, protocol, args: List[str]):
         """查看状态命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
         player = protocol.get_player()
         
         await protocol.send_message("SYS", f"角色状态 - {player.name}")
@@ -316,6 +366,7 @@ class CommandHandler:
   LOOK                  - 查看当前房间
   GO N|S|E|W           - 朝方向移动
   MAP                   - 查看地图
+  PATH <房间>           - 查看前往某个房间的路线
 
 社交:
   SAY <内容>            - 房间内发言
@@ -353,45 +404,72 @@ class CommandHandler:
     async def cmd_quit(self, protocol, args: List[str]):
         """退出命令"""
         await protocol.send_message("SYS", "再见！欢迎再次来到电传之城！")
-        protocol.writer.close()
+        await protocol.close()
     
     async def cmd_map(self, protocol, args: List[str]):
         """地图命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
+        player = protocol.get_player()
+        world = self.server.world
+        lines = render_map(world.graph, world.rooms, player.current_room)
+        if not lines:
+            await protocol.send_message("ERR", "当前位置没有地图")
             return
         
-        map_text = """电传之城地图:
-        
-        [灯塔下] [海滩]
-           |        |
-        [老码头] [电传机房]
-           |        |
-        [暗巷] [集市] [公告板]
-           |        |
-        [地下水道] [杂货店]
-        
-        你当前在: [老码头]"""
+        room = world.get_room(player.current_room)
+        lines = ["电传之城地图:"] + lines + [f"你当前在: <{room.title}>" if room else ""]
+        await protocol.send_message("SYS", "\n".join(lines))
+    
+    async def cmd_path(self, protocol, args: List[str]):
+        """寻路命令"""
+        world = self.server.world
+        target = world.find_room(args[0])
+        if not target:
+            await protocol.send_message("ERR", "没有这个地方")
+            return
         
-        await protocol.send_message("SYS", map_text)
+        player = protocol.get_player()
+        route = world.find_path(player.current_room, target.id)
+        if route is None:
+            await protocol.send_message("ERR", f"从这里无法到达{target.title}")
+        elif not route:
+            await protocol.send_message("OK", f"你已经在{target.title}")
+        else:
+            await protocol.send_message("OK", f"前往{target.title}: {' '.join(route)} ({len(route)} 步)")
     
     async def cmd_emote(self, protocol, args: List[str]):
         """动作命令"""
-        if not protocol.is_authenticated():
-            await protocol.send_message("ERR", "请先登录")
-            return
-        
-        if len(args) < 1:
-            await protocol.send_message("ERR", "用法: EMOTE <动作>")
-            return
-        
-        action = " ".join(args)
+        action = args[0]
         player = protocol.get_player()
         
         # 广播动作到房间
-        await protocol.broadcast_to_room(f"{action}")
+        await protocol.broadcast_to_room(f"{action}", exclude_self=True)
         await protocol.send_message("OK", f"你{action}")
     
+    async def cmd_lag(self, protocol, args: List[str]):
+        """管理命令：事件循环延迟、最近的卡顿和最耗时的命令；LAG <编号> 查看一次卡顿的调用栈"""
+        player = protocol.get_player()
+        if player.name not in config.ADMIN_PLAYERS:
+            await protocol.send_message("ERR", "未知命令: LAG")
+            return
+        
+        monitor = self.monitor
+        if monitor is None:
+            await protocol.send_message("SYS", "事件循环监视未开启")
+            return
+        
+        if args:
+            number = args[0].lstrip('#')
+            stall = monitor.get_stall(int(number)) if number.isdigit() else None
+            if stall is None:
+                await protocol.send_message("ERR", f"没有卡顿记录 {args[0]}")
+                return
+            lines = monitor.stall_report(stall)
+        else:
+            lines = monitor.report()
+            if self.metrics is not None:
+                lines.extend(self.metrics.report(5))
+        protocol.queue_bytes(encode_line("\n".join(f"SYS {line}" for line in lines)))
+    
     # 其他命令的占位符实现
     async def cmd_use(self, protocol, args: List[str]):
         await protocol.send_message("SYS", "此功能正在开发中")
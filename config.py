@@ -4,6 +4,8 @@
 游戏配置文件
 """
 
+import os
+
 # 服务器配置
 SERVER_HOST = '0.0.0.0'
 SERVER_PORT = 2323
@@ -13,9 +15,22 @@ GAME_TICK_RATE = 10  # Hz
 MAX_PLAYERS = 100
 MAX_MESSAGE_LENGTH = 500
 
+# 网络配置
+OUTBOUND_HIGH_WATER = 64 * 1024  # 发送积压超过此值时丢弃新消息（字节）
+OUTBOUND_DISCONNECT_LIMIT = 256 * 1024  # 发送积压超过此值时断开连接（字节）
+READ_CHUNK_SIZE = 16 * 1024  # 每次从连接读取的最大字节数
+COMMAND_QUEUE_SIZE = 32  # 每个连接排队等待执行的命令行数，满时暂停读取
+
 # 数据库配置
 DATABASE_FILE = 'data/game.db'
 BACKUP_INTERVAL = 300  # 5分钟
+PLAYER_FLUSH_INTERVAL = 5  # 秒，定期写回有改动的玩家
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', 'data/events')  # 聊天和游戏事件日志，需要可写
+EVENT_LOG_SEGMENT_SIZE = 8 * 1024 * 1024  # 单个分段文件的大小上限
+EVENT_LOG_MAX_SEGMENTS = 64  # 保留的分段数，超出后删除最旧的
+EVENT_LOG_INDEX_INTERVAL = 64 * 1024  # 稀疏时间索引的间隔（字节）
+EVENT_LOG_FSYNC = False  # 每批写入后是否 fsync
+EVENT_LOG_MAX_PENDING = 100000  # 写入失败时缓冲区最多保留的事件数，超出后丢弃最早的
 
 # 日志配置
 LOG_LEVEL = 'INFO'
@@ -24,11 +39,24 @@ LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
 # 安全配置
 MAX_COMMANDS_PER_SECOND = 10
+COMMAND_BURST = 20  # 可以连续输入的命令数，超出部分按 MAX_COMMANDS_PER_SECOND 排队执行
 CHAT_COOLDOWN = 1.0  # 秒
+CHAT_BURST = 3  # 可以连续发送的聊天消息数
+RATE_LIMIT_DISCONNECT_AFTER = 10.0  # 连续被限流超过此时间（秒）视为刷屏，断开连接
+RATE_LIMITS = {  # 类别 -> (每秒令牌数, 令牌桶容量)
+    'command': (MAX_COMMANDS_PER_SECOND, COMMAND_BURST),
+    'chat': (1.0 / CHAT_COOLDOWN, CHAT_BURST)
+}
 
 # 世界配置
 STARTING_ROOM = 'dock'
+WORLD_SNAPSHOT_FILE = 'data/world.snapshot'  # data/*.yml 编译后的快照
+WORLD_HOT_RELOAD = True  # 修改 data/*.yml 后自动热加载
+WORLD_RELOAD_INTERVAL = 2.0  # 检查数据文件修改的间隔（秒）
+ROOM_PATH_CACHE_SIZE = 1024  # 缓存最短路径的目标房间数量
+MAP_RADIUS = 2  # MAP 命令显示的范围（格）
 STARTING_MONEY = 0
+INVENTORY_SLOTS = 20  # 基础背包格子数，背包类物品额外提供格子
 STARTING_HP = 100
 STARTING_EP = 100
 
@@ -46,6 +74,17 @@ ATTACK_COOLDOWN = 2.0  # 秒
 SKILL_COOLDOWN = 5.0  # 秒
 
 # 社交配置
-MAX_CHAT_HISTORY = 1000
+MAX_CHAT_HISTORY = 10000  # 环形缓冲区容量
+CHAT_REPLAY_LINES = 10  # 进入房间、加入频道时回放的消息数
 MAX_CHANNELS = 20
 MAX_CHANNEL_MEMBERS = 50
+
+# 监控配置
+METRICS_ENABLED = True  # 统计命令耗时和tick各阶段耗时，关闭后不计时
+METRICS_HOST = '0.0.0.0'
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '0'))  # Prometheus 指标端口，0 表示不开启
+LOOP_MONITOR_ENABLED = True  # 持续测量事件循环延迟，卡顿时记录事件循环线程的调用栈
+LOOP_MONITOR_INTERVAL = 0.05  # 心跳间隔（秒）
+LOOP_STALL_THRESHOLD = 0.1  # 心跳迟到超过此值视为卡顿（秒）
+LOOP_STALL_HISTORY = 50  # 保留最近的卡顿记录数
+ADMIN_PLAYERS = {name for name in os.environ.get('ADMIN_PLAYERS', '').split(',') if name}  # 可以使用管理命令的玩家名
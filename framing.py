@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+协议行的分帧与编码
+把客户端发来的字节流切分成命令行：过滤 telnet IAC 协商字节，限制单行长度；
+把要发送的协议行编码成字节。不依赖网络层，世界和聊天模块也可以直接预编码消息。
+"""
+
+from typing import List, Optional
+
+# 协议层字节统计：编码字节数 vs 实际发送字节数，以及收到的字节和广播次数
+wire_stats = {
+    'lines_encoded': 0,
+    'bytes_encoded': 0,
+    'bytes_sent': 0,
+    'bytes_received': 0,
+    'broadcasts': 0,
+    'broadcast_deliveries': 0
+}
+
+def encode_line(line: str) -> bytes:
+    """编码一行协议消息（追加换行符）"""
+    data = (line + "\n").encode('utf-8')
+    wire_stats['lines_encoded'] += 1
+    wire_stats['bytes_encoded'] += len(data)
+    return data
+
+# telnet 命令字节
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+
+# 解析状态
+_DATA = 0
+_IAC = 1
+_OPTION = 2  # WILL/WONT/DO/DONT 之后的选项字节
+_SUB = 3  # 子协商内容，直到 IAC SE
+_SUB_IAC = 4
+
+class LineFramer:
+    """行分帧器
+
+    feed() 接收任意大小的数据块，返回其中所有完整的行（不含 CR/LF）。
+    超过 max_length 字节的行被整行丢弃，在结果中以 None 表示。
+    对客户端的 telnet 选项请求一律拒绝（DO -> WONT，WILL -> DONT），回复放在 replies 中。
+    """
+
+    __slots__ = ('max_length', 'buffer', 'discarding', 'state', 'command', 'replies', 'refused')
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self.buffer = bytearray()  # 未完成的行，反复复用
+        self.discarding = False  # 当前行已超长，丢弃到下一个换行
+        self.state = _DATA
+        self.command = 0
+        self.replies = bytearray()  # 需要发回客户端的 telnet 协商
+        self.refused = set()  # 已经拒绝过的 (命令, 选项)，不重复回复
+
+    def feed(self, data: bytes) -> List[Optional[bytes]]:
+        """追加一块数据，返回完整的行"""
+        if self.state != _DATA or IAC in data:
+            data = self._strip_telnet(data)
+
+        buffer = self.buffer
+        lines: List[Optional[bytes]] = []
+        start = 0
+        while True:
+            end = data.find(b'\n', start)
+            if end < 0:
+                break
+            if self.discarding:
+                self.discarding = False
+                lines.append(None)
+            elif len(buffer) + end - start > self.max_length:
+                buffer.clear()
+                lines.append(None)
+            else:
+                if buffer:
+                    buffer += data[start:end]
+                    line = bytes(buffer)
+                    buffer.clear()
+                else:
+                    line = data[start:end]
+                lines.append(line.rstrip(b'\r\x00'))
+            start = end + 1
+
+        # 剩余的半行留在缓冲区，超长时立即丢弃，不再继续积累
+        if start < len(data) and not self.discarding:
+            buffer += data[start:]
+            if len(buffer) > self.max_length:
+                buffer.clear()
+                self.discarding = True
+        return lines
+
+    def flush(self) -> Optional[bytes]:
+        """连接结束时取出没有换行的最后一行"""
+        if self.discarding or not self.buffer:
+            return None
+        line = bytes(self.buffer).rstrip(b'\r\x00')
+        self.buffer.clear()
+        return line
+
+    def _strip_telnet(self, data: bytes) -> bytes:
+        """去掉 telnet 命令序列，IAC IAC 还原为一个 0xFF 字节"""
+        out = bytearray()
+        state = self.state
+        for byte in data:
+            if state == _DATA:
+                if byte == IAC:
+                    state = _IAC
+                else:
+                    out.append(byte)
+            elif state == _IAC:
+                if byte == IAC:
+                    out.append(IAC)
+                    state = _DATA
+                elif byte in (WILL, WONT, DO, DONT):
+                    self.command = byte
+                    state = _OPTION
+                elif byte == SB:
+                    state = _SUB
+                else:
+                    state = _DATA  # NOP、GA 等单字节命令
+            elif state == _OPTION:
+                self._refuse(self.command, byte)
+                state = _DATA
+            elif state == _SUB:
+                if byte == IAC:
+                    state = _SUB_IAC
+            else:  # _SUB_IAC
+                state = _DATA if byte == SE else _SUB
+        self.state = state
+        return bytes(out)
+
+    def _refuse(self, command: int, option: int):
+        """拒绝客户端提出的选项，每个选项只回复一次"""
+        if command == DO:
+            reply = WONT
+        elif command == WILL:
+            reply = DONT
+        else:
+            return
+        if (reply, option) not in self.refused:
+            self.refused.add((reply, option))
+            self.replies += bytes((IAC, reply, option))
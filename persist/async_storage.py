@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步存储管理器
+在专用线程池中执行 StorageManager 的文件操作，事件循环不等待磁盘
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from persist.storage import StorageManager
+
+logger = logging.getLogger(__name__)
+
+class AsyncStorageManager:
+    """StorageManager 的异步门面
+
+    - 所有文件操作在专用线程池中执行；
+    - 同时进行的操作数量不超过 max_workers，多余的在事件循环中排队；
+    - 同一个文件的操作按提交顺序串行执行，两次保存不会交错。
+
+    save_data 的 data 在写入线程中序列化，调用方应传入之后不再修改的快照。
+    """
+
+    def __init__(self, storage: StorageManager, max_workers: int = 2):
+        self.storage = storage
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage')
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._key_locks: Dict[str, List] = {}  # 文件名 -> [锁, 使用者数量]
+
+    async def _run(self, key: str, func, *args):
+        """按文件名串行、按线程数限流地在线程池中执行 func"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        entry = self._key_locks.get(key)
+        if entry is None:
+            entry = self._key_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._semaphore:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[key]
+
+    async def save_data(self, filename: str, data: Any) -> bool:
+        """保存数据到文件"""
+        return await self._run(filename, self.storage.save_data, filename, data)
+
+    async def load_data(self, filename: str) -> Optional[Any]:
+        """从文件加载数据"""
+        return await self._run(filename, self.storage.load_data, filename)
+
+    async def create_backup(self, filename: str) -> bool:
+        """创建数据备份"""
+        return await self._run(filename, self.storage.create_backup, filename)
+
+    async def cleanup_old_backups(self, max_backups: int = 10):
+        """清理旧的备份文件"""
+        await self._run(self.storage.backup_dir, self.storage.cleanup_old_backups, max_backups)
+
+    async def save_game_stats(self, stats: Dict[str, Any]) -> bool:
+        """保存游戏统计"""
+        return await self.save_data("game_stats.json", stats)
+
+    async def load_game_stats(self) -> Optional[Dict[str, Any]]:
+        """加载游戏统计"""
+        return await self.load_data("game_stats.json")
+
+    def close(self):
+        """等待未完成的写入并关闭线程池"""
+        self._executor.shutdown(wait=True)
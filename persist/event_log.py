@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件日志
+只追加的二进制日志，记录聊天消息和登录、移动等游戏事件，供管理员按时间或发送者查询。
+
+文件格式：目录下按编号命名的分段文件（00000001.seg ...），每条记录为
+    头部 <IIdH>: 正文长度, CRC32, 时间戳, 发送者长度
+    发送者 (UTF-8)
+    正文 (JSON: type/target/content)
+发送者放在头部之后，按发送者过滤时不需要解析正文。
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('<IIdH')
+_SUFFIX = '.seg'
+
+# 待写入的事件：(时间戳, 类型, 发送者, 目标, 内容)
+Event = Tuple[float, str, str, str, str]
+
+class Segment:
+    """一个分段文件及其稀疏时间索引
+
+    times/offsets 每隔 index_interval 字节记录一次 (时间戳, 文件偏移)，
+    查询时二分找到起点附近的位置，从那里开始顺序扫描。
+    """
+
+    __slots__ = ('number', 'path', 'size', 'first_ts', 'last_ts', 'times', 'offsets', '_indexed_at')
+
+    def __init__(self, number: int, path: str):
+        self.number = number
+        self.path = path
+        self.size = 0
+        self.first_ts = 0.0
+        self.last_ts = 0.0
+        self.times: List[float] = []
+        self.offsets: List[int] = []
+        self._indexed_at = -1
+
+    def note(self, offset: int, ts: float, interval: int):
+        """记录一条写在 offset 处的记录"""
+        if not self.times:
+            self.first_ts = ts
+        if self._indexed_at < 0 or offset - self._indexed_at >= interval:
+            self.times.append(ts)
+            self.offsets.append(offset)
+            self._indexed_at = offset
+        self.last_ts = ts
+
+    def seek_offset(self, start: Optional[float]) -> int:
+        """时间戳不早于 start 的第一条记录之前最近的索引位置"""
+        if start is None or not self.times:
+            return 0
+        i = bisect.bisect_left(self.times, start) - 1
+        return self.offsets[i] if i >= 0 else 0
+
+class EventLog:
+    """分段的只追加事件日志
+
+    所有方法都是同步的，调用方负责放到事件循环之外执行（见 EventRecorder）。
+    写入的时间戳保证不递减，分段和分段内的记录都按时间排列。
+    """
+
+    def __init__(self, directory: str = config.EVENT_LOG_DIR,
+                 segment_size: int = config.EVENT_LOG_SEGMENT_SIZE,
+                 max_segments: int = config.EVENT_LOG_MAX_SEGMENTS,
+                 index_interval: int = config.EVENT_LOG_INDEX_INTERVAL,
+                 fsync: bool = config.EVENT_LOG_FSYNC):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.index_interval = index_interval
+        self.fsync = fsync
+        self.segments: List[Segment] = []
+        self._file = None
+        self._lock = threading.Lock()
+        self.stats = {'records_written': 0, 'bytes_written': 0, 'batches': 0,
+                      'segments_rotated': 0, 'records_scanned': 0}
+
+    # ---- 打开与恢复 ----
+
+    def open(self, readonly: bool = False):
+        """扫描已有分段，重建稀疏索引；末尾不完整的记录被截掉
+
+        readonly 为 True 时只建索引供查询，不修改文件（服务器运行时也可以安全地查询）。
+        """
+        with self._lock:
+            if self._file is not None or self.segments:
+                return
+            if readonly and not os.path.isdir(self.directory):
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            numbers = sorted(int(name[:-len(_SUFFIX)]) for name in os.listdir(self.directory)
+                             if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit())
+            for number in numbers:
+                segment = Segment(number, self._segment_path(number))
+                valid = self._rebuild_index(segment)
+                if valid < os.path.getsize(segment.path) and not readonly:
+                    logger.warning(f"事件日志 {segment.path} 末尾有 {os.path.getsize(segment.path) - valid} 字节不完整，已截断")
+                    with open(segment.path, 'r+b') as f:
+                        f.truncate(valid)
+                segment.size = valid
+                self.segments.append(segment)
+
+            if readonly:
+                return
+            if not self.segments:
+                self.segments.append(Segment(1, self._segment_path(1)))
+            self._file = open(self.segments[-1].path, 'ab')
+            logger.info(f"事件日志已打开: {self.directory}，{len(self.segments)} 个分段")
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:08d}{_SUFFIX}")
+
+    def _rebuild_index(self, segment: Segment) -> int:
+        """顺序校验每条记录的 CRC 并重建稀疏索引，返回有效数据的长度"""
+        offset = 0
+        with open(segment.path, 'rb') as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc, ts, sender_len = _HEADER.unpack(header)
+                body = f.read(sender_len + length)
+                if len(body) < sender_len + length or zlib.crc32(body) != crc:
+                    break
+                segment.note(offset, ts, self.index_interval)
+                offset += _HEADER.size + sender_len + length
+        return offset
+
+    # ---- 写入 ----
+
+    def append_many(self, events: List[Event]) -> int:
+        """把一批事件写到当前分段（一次 write），必要时先轮换分段，返回写入条数"""
+        if not events:
+            return 0
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("事件日志未打开")
+            segment = self.segments[-1]
+            if segment.size >= self.segment_size:
+                segment = self._rotate()
+
+            chunk = bytearray()
+            notes = []
+            for ts, kind, sender, target, content in events:
+                sender_bytes = sender.encode('utf-8')
+                payload = json.dumps({'type': kind, 'target': target, 'content': content},
+                                     ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                body = sender_bytes + payload
+                notes.append((segment.size + len(chunk), ts))
+                chunk += _HEADER.pack(len(payload), zlib.crc32(body), ts, len(sender_bytes))
+                chunk += body
+
+            try:
+                self._file.write(chunk)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except OSError:
+                self._discard_partial(segment)
+                raise
+
+            # 写入成功后才记入索引
+            for offset, ts in notes:
+                segment.note(offset, ts, self.index_interval)
+            segment.size += len(chunk)
+
+            self.stats['records_written'] += len(events)
+            self.stats['bytes_written'] += len(chunk)
+            self.stats['batches'] += 1
+        return len(events)
+
+    def _discard_partial(self, segment: Segment):
+        """写入失败后截掉文件中可能已经写入的部分，使文件长度与 segment.size 一致，然后重新打开"""
+        try:
+            self._file.close()  # 缓冲区中剩余的数据可能在这里写出，随后一起截掉
+        except OSError:
+            pass
+        self._file = None
+        try:
+            os.truncate(segment.path, segment.size)
+        except OSError as e:
+            logger.error(f"截断事件日志失败 {segment.path}: {e}")
+        self._file = open(segment.path, 'ab')
+
+    def _rotate(self) -> Segment:
+        """关闭当前分段，开始新分段，超出数量上限的旧分段被删除"""
+        self._file.close()
+        segment = Segment(self.segments[-1].number + 1, self._segment_path(self.segments[-1].number + 1))
+        self.segments.append(segment)
+        self._file = open(segment.path, 'ab')
+        self.stats['segments_rotated'] += 1
+
+        while len(self.segments) > self.max_segments:
+            old = self.segments.pop(0)
+            try:
+                os.remove(old.path)
+            except OSError as e:
+                logger.error(f"删除旧事件日志失败 {old.path}: {e}")
+        return segment
+
+    # ---- 读取 ----
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None,
+             sender: Optional[str] = None, kind: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """按时间顺序逐条读出 [start, end] 内的记录，可按发送者、类型过滤
+
+        只打开时间范围重叠的分段，从稀疏索引定位的位置开始扫描；
+        发送者不匹配的记录只读头部，正文直接跳过。
+        """
+        with self._lock:
+            segments = [(s.path, s.size, s.seek_offset(start)) for s in self.segments
+                        if s.times and (start is None or s.last_ts >= start)
+                        and (end is None or s.first_ts <= end)]
+        sender_bytes = sender.encode('utf-8') if sender is not None else None
+
+        for path, size, offset in segments:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue  # 读取期间被轮换删除
+            with f:
+                f.seek(offset)
+                while offset < size:
+                    length, crc, ts, sender_len = _HEADER.unpack(f.read(_HEADER.size))
+                    offset += _HEADER.size + sender_len + length
+                    self.stats['records_scanned'] += 1
+                    if end is not None and ts > end:
+                        return
+                    if (start is not None and ts < start) or \
+                            (sender_bytes is not None and sender_len != len(sender_bytes)):
+                        f.seek(sender_len + length, 1)
+                        continue
+                    name = f.read(sender_len)
+                    if sender_bytes is not None and name != sender_bytes:
+                        f.seek(length, 1)
+                        continue
+                    record = json.loads(f.read(length))
+                    if kind is not None and record['type'] != kind:
+                        continue
+                    record['time'] = ts
+                    record['sender'] = name.decode('utf-8')
+                    yield record
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              sender: Optional[str] = None, kind: Optional[str] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """返回满足条件的最早 limit 条记录"""
+        result = []
+        for record in self.read(start, end, sender, kind):
+            result.append(record)
+            if len(result) >= limit:
+                break
+        return result
+
+    def close(self):
+        """关闭当前分段"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class EventRecorder:
+    """EventLog 的异步门面
+
+    record() 只把事件放进内存缓冲区；每个 tick 调用 request_flush()，
+    在专用写入线程中一次写完这一个 tick 累积的事件，事件循环不等待磁盘。
+    """
+
+    def __init__(self, log: Optional[EventLog] = None, max_pending: int = config.EVENT_LOG_MAX_PENDING):
+        self.log = log if log is not None else EventLog()
+        self.pending: List[Event] = []
+        self.max_pending = max_pending
+        self.dropped = 0  # 磁盘持续写入失败、缓冲区满时丢弃的事件数
+        self._last_ts = 0.0
+        self._flush_task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-log')
+        self.closed = False
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        """在写入线程中打开日志并重建索引"""
+        await self._run(self.log.open)
+
+    def disable(self):
+        """停用记录（日志无法打开时），之后的 record() 直接忽略"""
+        self.closed = True
+        self.pending.clear()
+
+    def record(self, kind: str, sender: str, target: str = "", content: str = ""):
+        """记录一个事件（只追加到缓冲区）"""
+        if self.closed:
+            return
+        ts = time.time()
+        if ts < self._last_ts:
+            ts = self._last_ts  # 系统时钟回拨时保持时间戳不递减
+        self._last_ts = ts
+        self.pending.append((ts, kind, sender, target, content))
+
+    def record_message(self, message):
+        """记录一条聊天消息"""
+        self.record(message.type, message.sender, message.target, message.content)
+
+    def request_flush(self):
+        """在后台写出缓冲区，上一批尚未写完时本次的事件留到下一个 tick 合并写入"""
+        if self.pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> int:
+        """写出当前缓冲区中的所有事件，返回写入条数"""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, []
+        try:
+            return await self._run(self.log.append_many, batch)
+        except Exception as e:
+            logger.error(f"写入事件日志失败: {e}")
+            # 放回缓冲区，下次重试；磁盘持续失败时只保留最新的 max_pending 条
+            self.pending[:0] = batch
+            overflow = len(self.pending) - self.max_pending
+            if overflow > 0:
+                del self.pending[:overflow]
+                self.dropped += overflow
+                logger.warning(f"事件日志缓冲区已满，丢弃最早的 {overflow} 条事件")
+            return 0
+
+    async def query(self, start: Optional[float] = None, end: Optional[float] = None,
+                    sender: Optional[str] = None, kind: Optional[str] = None,
+                    limit: int = 100) -> List[Dict[str, Any]]:
+        """在写入线程中查询，不会与写入交错"""
+        return await self._run(self.log.query, start, end, sender, kind, limit)
+
+    async def close(self):
+        """写出剩余事件并关闭日志"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+        self.closed = True
+        await self._run(self.log.close)
+        self._executor.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="查询事件日志")
+    parser.add_argument('--dir', default=config.EVENT_LOG_DIR, help="日志目录")
+    parser.add_argument('--sender', help="只显示该玩家发出的记录")
+    parser.add_argument('--type', dest='kind', help="记录类型，如 room/global/private/channel/login/move")
+    parser.add_argument('--since', type=float, help="开始时间（Unix 时间戳）")
+    parser.add_argument('--minutes', type=float, help="只看最近多少分钟")
+    parser.add_argument('--until', type=float, help="结束时间（Unix 时间戳）")
+    parser.add_argument('--limit', type=int, default=200, help="最多显示的条数")
+    args = parser.parse_args()
+
+    start = args.since
+    if args.minutes is not None:
+        start = time.time() - args.minutes * 60
+    log = EventLog(args.dir)
+    log.open(readonly=True)
+    try:
+        for record in log.query(start, args.until, args.sender, args.kind, args.limit):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['time']))
+            print(f"{stamp} [{record['type']}] {record['sender']} -> {record['target']}: {record['content']}")
+    finally:
+        log.close()
+
+if __name__ == "__main__":
+    main()
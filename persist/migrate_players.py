@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家数据迁移工具
+把旧的 data/players.json 导入 SQLite 玩家存档
+
+用法: python3 -m persist.migrate_players [--json data/players.json] [--db data/game.db]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from persist.player_store import PlayerStore
+
+logger = logging.getLogger(__name__)
+
+def migrate(json_file: str = 'data/players.json', db_file: str = config.DATABASE_FILE) -> int:
+    """把 JSON 中的所有玩家写入 SQLite，返回迁移数量"""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        players_data = json.load(f)
+
+    store = PlayerStore(db_file)
+    try:
+        count = store.save_many(players_data.items())
+    finally:
+        store.close()
+
+    logger.info(f"已从 {json_file} 迁移 {count} 个玩家到 {db_file}")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="把 players.json 迁移到 SQLite 玩家存档")
+    parser.add_argument('--json', default='data/players.json', help="旧的 JSON 存档")
+    parser.add_argument('--db', default=config.DATABASE_FILE, help="SQLite 数据库文件")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.json):
+        print(f"文件不存在: {args.json}")
+        sys.exit(1)
+
+    count = migrate(args.json, args.db)
+    print(f"迁移完成: {count} 个玩家 -> {args.db}")
+
+if __name__ == "__main__":
+    main()
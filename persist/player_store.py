@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家存档
+基于 SQLite 的玩家数据仓库，每个玩家一行
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+_UPSERT = "INSERT OR REPLACE INTO players (name, data, updated_at) VALUES (?, ?, ?)"
+_SELECT = "SELECT data FROM players WHERE name = ?"
+_SELECT_NAMES = "SELECT name FROM players ORDER BY name"
+_COUNT = "SELECT COUNT(*) FROM players"
+
+class PlayerStore:
+    """SQLite 玩家存档
+
+    使用 WAL 模式，单条保存和批量保存都在一个事务内完成。
+    所有方法都是同步的，调用方负责放到事件循环之外执行。
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_CREATE_TABLE)
+            conn.commit()
+            self._conn = conn
+            logger.info(f"玩家存档已打开: {self.db_file}")
+        return self._conn
+
+    @staticmethod
+    def _encode(data: Dict[str, Any]) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    def save(self, name: str, data: Dict[str, Any]):
+        """保存一个玩家"""
+        self.save_many([(name, data)])
+
+    def save_many(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """在一个事务中批量保存玩家，返回保存数量"""
+        now = time.time()
+        rows = [(name, self._encode(data), now) for name, data in records]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """加载一个玩家，不存在时返回 None"""
+        with self._lock:
+            row = self._connect().execute(_SELECT, (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def names(self) -> List[str]:
+        """所有已存档的玩家名"""
+        with self._lock:
+            return [row[0] for row in self._connect().execute(_SELECT_NAMES)]
+
+    def count(self) -> int:
+        """已存档的玩家数量"""
+        with self._lock:
+            return self._connect().execute(_COUNT).fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -8,6 +8,8 @@
 import json
 import logging
 import os
+import shutil
+import tempfile
 from typing import Dict, Any, Optional
 import time
 
@@ -25,7 +27,11 @@ class StorageManager:
         os.makedirs(self.backup_dir, exist_ok=True)
     
     def save_data(self, filename: str, data: Any):
-        """保存数据到文件"""
+        """保存数据到文件
+        
+        先写临时文件并 fsync，再原子替换目标文件，任何时刻目标文件都是完整的。
+        """
+        tmp_path = None
         try:
             filepath = os.path.join(self.data_dir, filename)
             
@@ -33,11 +39,18 @@ class StorageManager:
             if os.path.exists(filepath):
                 backup_name = f"{filename}.{int(time.time())}.bak"
                 backup_path = os.path.join(self.backup_dir, backup_name)
-                os.rename(filepath, backup_path)
+                shutil.copy2(filepath, backup_path)
             
-            # 保存新数据
-            with open(filepath, 'w', encoding='utf-8') as f:
+            # 写入同目录下的临时文件
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=".tmp", dir=self.data_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            # 原子替换
+            os.replace(tmp_path, filepath)
+            tmp_path = None
             
             logger.debug(f"数据已保存到 {filepath}")
             return True
@@ -45,6 +58,9 @@ class StorageManager:
         except Exception as e:
             logger.error(f"保存数据失败: {e}")
             return False
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
     
     def load_data(self, filename: str) -> Optional[Any]:
         """从文件加载数据"""
@@ -102,9 +118,7 @@ class StorageManager:
             backup_name = f"{filename}.{timestamp}.bak"
             backup_path = os.path.join(self.backup_dir, backup_name)
             
-            with open(source_path, 'r', encoding='utf-8') as src:
-                with open(backup_path, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
+            shutil.copy2(source_path, backup_path)
             
             logger.info(f"备份已创建: {backup_path}")
             return True
@@ -8,11 +8,34 @@
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import re
 
+import config
+from framing import LineFramer, encode_line, wire_stats
+from systems.rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
+
+def fanout(players, data: bytes, exclude=None) -> int:
+    """把同一份已编码的数据放入每个接收者的发送队列
+    
+    不等待任何接收者，慢客户端只会被丢弃消息或断开，不会拖慢发送者。
+    返回成功入队的接收者数量。
+    """
+    delivered = 0
+    for player in players:
+        if player is exclude:
+            continue
+        protocol = player.protocol
+        if protocol is not None and protocol.queue_bytes(data):
+            delivered += 1
+    wire_stats['broadcasts'] += 1
+    wire_stats['broadcast_deliveries'] += delivered
+    return delivered
+
+
 class GameProtocol:
     """游戏协议处理器"""
     
@@ -27,10 +50,27 @@ class GameProtocol:
         self.addr = writer.get_extra_info('peername')
         self.connected_at = asyncio.get_event_loop().time()
         
-        # 消息缓冲
-        self.input_buffer = ""
-        self.last_command_time = 0
-        self.command_cooldown = 0.1  # 100ms冷却时间
+        # 输入：分帧后的命令行放入有界队列，按顺序执行
+        self.framer = LineFramer(config.MAX_MESSAGE_LENGTH * 4)  # 按字节限制，UTF-8 每字最多 4 字节
+        self._commands: asyncio.Queue = asyncio.Queue(maxsize=config.COMMAND_QUEUE_SIZE)
+        self.bytes_received = 0
+        self.lines_received = 0
+        self.lines_too_long = 0
+        
+        # 限流：命令和聊天各一个令牌桶
+        self.rate_limiter = RateLimiter()
+        self.commands_delayed = 0
+        
+        # 发送队列：同一轮事件循环内产生的消息合并为一次 write()（同帧合并）
+        self._outbox: List[bytes] = []
+        self._outbox_size = 0
+        self._outbox_ready = asyncio.Event()
+        self.closing = False
+        self.lines_queued = 0
+        self.lines_dropped = 0
+        self.frames_written = 0
+        self.bytes_sent = 0
+        self._writer_task = asyncio.get_event_loop().create_task(self._writer_loop())
     
     async def send_welcome(self):
         """发送欢迎信息"""
@@ -55,111 +95,209 @@ class GameProtocol:
 新手任务：在老码头寻找【纸带】并带到【电传机房】！"""
     
     async def handle_communication(self):
-        """处理客户端通信"""
+        """处理客户端通信：读取协程分帧后放入命令队列，这里按顺序逐条执行"""
+        reader_task = asyncio.get_event_loop().create_task(self._read_loop())
         try:
-            while not self.reader.at_eof():
-                # 读取一行数据
-                data = await self.reader.readline()
-                if not data:
+            while not self.closing:
+                message = await self._commands.get()
+                if message is None:
                     break
-                
-                # 解码并处理命令
-                message = data.decode('utf-8', errors='ignore').strip()
-                if message:
-                    await self.process_message(message)
+                await self.process_message(message)
                 
         except asyncio.CancelledError:
             logger.info(f"客户端 {self.addr} 连接被取消")
         except Exception as e:
             logger.error(f"客户端 {self.addr} 通信错误: {e}")
         finally:
+            reader_task.cancel()
             await self.handle_disconnect()
     
+    async def _read_loop(self):
+        """按块读取输入并分帧；命令队列满时暂停读取，由 TCP 对客户端形成背压"""
+        try:
+            while not self.closing:
+                data = await self.reader.read(config.READ_CHUNK_SIZE)
+                if not data:
+                    break
+                self.bytes_received += len(data)
+                wire_stats['bytes_received'] += len(data)
+                
+                lines = self.framer.feed(data)
+                if self.framer.replies:
+                    self.queue_bytes(bytes(self.framer.replies))
+                    self.framer.replies.clear()
+                for line in lines:
+                    await self._enqueue_line(line)
+            
+            line = self.framer.flush()
+            if line:
+                await self._enqueue_line(line)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"客户端 {self.addr} 读取错误: {e}")
+        await self._commands.put(None)
+    
+    async def _enqueue_line(self, line: Optional[bytes]):
+        """解码一行并放入命令队列，超长的行直接回复错误"""
+        if line is None:
+            self.lines_too_long += 1
+            self.queue_bytes(encode_line(f"ERR 消息过长（最多 {config.MAX_MESSAGE_LENGTH} 字），已忽略。"))
+            return
+        
+        message = line.decode('utf-8', errors='replace').strip()
+        if not message:
+            return
+        if len(message) > config.MAX_MESSAGE_LENGTH:
+            self.lines_too_long += 1
+            self.queue_bytes(encode_line(f"ERR 消息过长（最多 {config.MAX_MESSAGE_LENGTH} 字），已忽略。"))
+            return
+        
+        self.lines_received += 1
+        await self._commands.put(message)
+    
     async def process_message(self, message: str):
         """处理客户端消息"""
         try:
-            current_time = asyncio.get_event_loop().time()
-            
-            # 检查命令冷却时间
-            if current_time - self.last_command_time < self.command_cooldown:
-                await self.send_message("ERR", "命令执行过快，请稍等片刻。")
-                return
+            # 超出速率的命令排队等待，持续刷屏则断开
+            wait = self.rate_limiter.reserve('command')
+            if wait > 0:
+                if self.rate_limiter.throttled_for() > config.RATE_LIMIT_DISCONNECT_AFTER:
+                    logger.warning(f"客户端 {self.addr} 持续发送过快，断开连接")
+                    await self.send_message("ERR", "命令发送过于频繁，连接已断开。")
+                    await self.close()
+                    return
+                self.commands_delayed += 1
+                await asyncio.sleep(wait)
             
-            self.last_command_time = current_time
-            
-            # 解析命令
-            command, args = self._parse_command(message)
-            
-            if not command:
+            if not message:
                 await self.send_message("ERR", "无效命令。输入 'HELP' 获取帮助。")
                 return
             
-            # 处理命令
-            await self.server.command_handler.handle_command(self, command, args)
+            # 解析并处理命令
+            await self.server.command_handler.handle_command(self, message)
             
         except Exception as e:
             logger.error(f"处理消息错误: {e}")
             await self.send_message("ERR", "命令执行出错，请重试。")
     
-    def _parse_command(self, message: str) -> tuple:
-        """解析命令和参数"""
-        # 处理引号内的内容（SAY命令）
-        if message.startswith('"') and message.endswith('"'):
-            return "SAY", [message[1:-1]]
+    def _format_message(self, msg_type: str, content: str, **kwargs) -> str:
+        """格式化一行协议消息（不含换行符）"""
+        if msg_type == "ROOM":
+            return f"ROOM {content}"
+        elif msg_type == "DESC":
+            return f"DESC {content}"
+        elif msg_type == "SYS":
+            return f"SYS {content}"
+        elif msg_type == "ERR":
+            return f"ERR {content}"
+        elif msg_type == "OK":
+            return f"OK {content}"
+        elif msg_type == "SEEN":
+            player_name = kwargs.get('player_name', '')
+            action = kwargs.get('action', '')
+            if player_name and action:
+                return f"SEEN {player_name} {action}"
+            # 如果没有player_name和action，直接使用content
+            return f"SEEN {content}"
+        elif msg_type == "LIST":
+            items = kwargs.get('items', [])
+            return f"LIST {' '.join(items)}"
+        elif msg_type == "ITEM":
+            item_data = kwargs.get('item_data', {})
+            return f"ITEM {json.dumps(item_data, ensure_ascii=False)}"
+        elif msg_type == "QUEST":
+            quest_data = kwargs.get('quest_data', {})
+            return f"QUEST {json.dumps(quest_data, ensure_ascii=False)}"
+        return f"{msg_type} {content}"
+    
+    async def send_message(self, msg_type: str, content: str, **kwargs):
+        """发送消息到客户端
         
-        # 分割命令和参数
-        parts = message.split()
-        if not parts:
-            return None, []
+        消息只进入发送队列，不等待 drain；同一轮事件循环内的多条消息
+        由发送协程合并成一次 write()。
+        """
+        try:
+            self.queue_bytes(encode_line(self._format_message(msg_type, content, **kwargs)))
+        except Exception as e:
+            logger.error(f"发送消息失败: {e}")
+    
+    def queue_bytes(self, data: bytes) -> bool:
+        """把已编码的数据放入发送队列，不等待发送完成
+        
+        积压超过高水位时丢弃消息，超过断开阈值时直接断开该客户端。
+        返回消息是否入队。
+        """
+        if self.closing:
+            return False
         
-        command = parts[0].upper()
-        args = parts[1:] if len(parts) > 1 else []
+        pending = self._outbox_size + self.writer.transport.get_write_buffer_size() + len(data)
+        if pending > config.OUTBOUND_HIGH_WATER:
+            self.lines_dropped += 1
+            if pending > config.OUTBOUND_DISCONNECT_LIMIT:
+                logger.warning(f"客户端 {self.addr} 发送积压 {pending} 字节，断开连接")
+                self.closing = True
+                self._outbox.clear()
+                self._outbox_size = 0
+                self._outbox_ready.set()
+                self.writer.transport.abort()
+            return False
         
-        return command, args
+        self._outbox.append(data)
+        self._outbox_size += len(data)
+        self.lines_queued += 1
+        self._outbox_ready.set()
+        return True
     
-    async def send_message(self, msg_type: str, content: str, **kwargs):
-        """发送消息到客户端"""
+    async def _writer_loop(self):
+        """发送协程：每次唤醒把队列中积攒的所有消息一次性写出"""
         try:
-            # 格式化消息
-            if msg_type == "ROOM":
-                message = f"ROOM {content}"
-            elif msg_type == "DESC":
-                message = f"DESC {content}"
-            elif msg_type == "SYS":
-                message = f"SYS {content}"
-            elif msg_type == "ERR":
-                message = f"ERR {content}"
-            elif msg_type == "OK":
-                message = f"OK {content}"
-            elif msg_type == "SEEN":
-                player_name = kwargs.get('player_name', '')
-                action = kwargs.get('action', '')
-                if player_name and action:
-                    message = f"SEEN {player_name} {action}"
-                else:
-                    # 如果没有player_name和action，直接使用content
-                    message = f"SEEN {content}"
-            elif msg_type == "LIST":
-                items = kwargs.get('items', [])
-                message = f"LIST {' '.join(items)}"
-            elif msg_type == "ITEM":
-                item_data = kwargs.get('item_data', {})
-                message = f"ITEM {json.dumps(item_data, ensure_ascii=False)}"
-            elif msg_type == "QUEST":
-                quest_data = kwargs.get('quest_data', {})
-                message = f"QUEST {json.dumps(quest_data, ensure_ascii=False)}"
-            else:
-                message = f"{msg_type} {content}"
-            
-            # 添加换行符
-            message += "\n"
-            
-            # 发送消息
-            self.writer.write(message.encode('utf-8'))
-            await self.writer.drain()
-            
+            while True:
+                await self._outbox_ready.wait()
+                self._outbox_ready.clear()
+                if self._outbox:
+                    await self._write_pending()
+                if self.closing and not self._outbox:
+                    break
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            logger.error(f"发送消息失败: {e}")
+            logger.error(f"客户端 {self.addr} 发送错误: {e}")
+            self._outbox.clear()
+    
+    async def _write_pending(self):
+        """写出当前队列中的全部数据"""
+        batch = self._outbox
+        self._outbox = []
+        self._outbox_size = 0
+        data = batch[0] if len(batch) == 1 else b"".join(batch)
+        self.writer.write(data)
+        self.frames_written += 1
+        self.bytes_sent += len(data)
+        wire_stats['bytes_sent'] += len(data)
+        await self.writer.drain()
+    
+    async def close(self, timeout: float = 5.0):
+        """发送完队列中的剩余消息后关闭连接"""
+        if self.closing:
+            return
+        self.closing = True
+        self._outbox_ready.set()
+        
+        try:
+            await asyncio.wait_for(self._writer_task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # 客户端长时间不读取数据，直接断开
+            self.writer.transport.abort()
+        except Exception as e:
+            logger.error(f"关闭连接时发送剩余消息失败: {e}")
+        
+        if not self.writer.is_closing():
+            self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
     
     async def send_multiline_desc(self, lines: list):
         """发送多行描述"""
@@ -173,16 +311,8 @@ class GameProtocol:
         
         room = self.server.world.get_room(self.player.current_room)
         if room:
-            for player in room.get_players():
-                if exclude_self and player == self.player:
-                    continue
-                
-                try:
-                    await player.protocol.send_message("SEEN", message, 
-                                                     player_name=self.player.name,
-                                                     action=message)
-                except Exception as e:
-                    logger.error(f"广播消息失败: {e}")
+            data = encode_line(f"SEEN {self.player.name} {message}")
+            fanout(room.get_players(), data, exclude=self.player if exclude_self else None)
     
     async def handle_disconnect(self):
         """处理客户端断开连接"""
@@ -192,17 +322,19 @@ class GameProtocol:
             
             # 通知房间内其他玩家
             if self.player.current_room:
-                await self.broadcast_to_room(f"离开了房间")
+                await self.broadcast_to_room(f"离开了房间", exclude_self=True)
             
-            # 从在线玩家列表中移除
+            # 从房间和在线玩家列表中移除
+            self.server.world.remove_player(self.player)
             self.server.players.remove_player(self.player)
+            events = getattr(self.server, 'events', None)
+            if events is not None:
+                events.record("logout", self.player.name, self.player.current_room or "")
             
             logger.info(f"玩家 {self.player.name} 断开连接")
         
-        # 关闭连接
-        if not self.writer.is_closing():
-            self.writer.close()
-            await self.writer.wait_closed()
+        # 发送剩余消息并关闭连接
+        await self.close()
     
     def is_authenticated(self) -> bool:
         """检查是否已认证"""
@@ -223,5 +355,13 @@ class GameProtocol:
             'addr': self.addr,
             'connected_at': self.connected_at,
             'authenticated': self.authenticated,
-            'player_name': self.player.name if self.player else None
+            'player_name': self.player.name if self.player else None,
+            'lines_queued': self.lines_queued,
+            'lines_dropped': self.lines_dropped,
+            'frames_written': self.frames_written,
+            'bytes_sent': self.bytes_sent,
+            'commands_delayed': self.commands_delayed,
+            'bytes_received': self.bytes_received,
+            'lines_received': self.lines_received,
+            'lines_too_long': self.lines_too_long
         }
@@ -12,11 +12,20 @@ import sys
 from typing import Dict, Set
 import time
 
+import config
 from protocol import GameProtocol
 from world.world_manager import WorldManager
+from world.hot_reload import WorldReloader
 from systems.player_manager import PlayerManager
 from systems.chat_manager import ChatManager
 from persist.storage import StorageManager
+from persist.async_storage import AsyncStorageManager
+from persist.event_log import EventRecorder
+from systems.tick_scheduler import TickScheduler
+from systems.timer_wheel import TimerWheel
+from systems.metrics import create_metrics
+from systems.metrics_exporter import MetricsExporter
+from systems.loop_monitor import LoopMonitor
 
 # 配置日志
 logging.basicConfig(
@@ -35,10 +44,27 @@ class GameServer:
         self.port = port
         self.server = None
         self.running = False
+        self.loop = None
+        self._shutdown = None
+        self._checkpoint_task = None
+        
+        # 游戏状态
+        self.tick_rate = config.GAME_TICK_RATE
+        self.tick_interval = 1.0 / self.tick_rate
+        self.scheduler = TickScheduler(self.tick, self.tick_rate)
+        self.timers = TimerWheel(resolution=self.tick_interval)
+        
+        # 运行指标（关闭时为 None）和 Prometheus 端点
+        self.metrics = create_metrics()
+        self.metrics_exporter = MetricsExporter(self) if config.METRICS_PORT else None
+        self.loop_monitor = LoopMonitor() if config.LOOP_MONITOR_ENABLED else None
         
         # 初始化各个管理器
         self.storage = StorageManager()
+        self.async_storage = AsyncStorageManager(self.storage)
+        self.events = EventRecorder()
         self.world = WorldManager()
+        self.world_reloader = WorldReloader(self.world)
         self.players = PlayerManager()
         self.chat = ChatManager(self)
         
@@ -46,14 +72,25 @@ class GameServer:
         from commands import CommandHandler
         self.command_handler = CommandHandler(self)
         
-        # 游戏状态
-        self.tick_rate = 10  # 10Hz tick
-        self.tick_interval = 1.0 / self.tick_rate
+        # tick 依次执行的阶段：(指标名, 函数)
+        self.tick_phases = [
+            ('world', self.world.tick),
+            ('players', self.players.tick),
+            ('timers', self.handle_timed_events)
+        ]
+        
+        # 注册定时器（整点/每日事件、自动存档、世界热加载）
+        self.world.setup_timers(self.timers)
+        self.players.setup_timers(self.timers)
+        self.timers.call_every(config.BACKUP_INTERVAL, self.checkpoint_stats)
+        if config.WORLD_HOT_RELOAD:
+            self.timers.call_every(config.WORLD_RELOAD_INTERVAL, self.world_reloader.check)
         
         # 统计信息
         self.stats = {
             'start_time': time.time(),
             'total_connections': 0,
+            'active_connections': 0,
             'peak_players': 0,
             'current_players': 0
         }
@@ -68,13 +105,26 @@ class GameServer:
         self.running = False
         if self.server:
             self.server.close()
+        if self.loop and self._shutdown:
+            self.loop.call_soon_threadsafe(self._shutdown.set)
     
     async def start(self):
         """启动游戏服务器"""
         try:
+            self.loop = asyncio.get_running_loop()
+            self._shutdown = asyncio.Event()
+            if self.loop_monitor is not None:
+                self.loop_monitor.start()
+            
             # 加载游戏数据
             logger.info("正在加载游戏世界...")
             await self.world.load_world()
+            try:
+                await self.events.open()
+            except OSError as e:
+                # 事件日志是可选的，目录只读等情况下停用记录，不影响启动
+                logger.warning(f"无法打开事件日志，本次运行不记录聊天和游戏事件: {e}")
+                self.events.disable()
             
             # 启动TCP服务器
             logger.info(f"正在启动服务器 {self.host}:{self.port}...")
@@ -89,6 +139,9 @@ class GameServer:
             logger.info("玩家可以通过以下命令连接:")
             logger.info(f"  telnet {self.host} {self.port}")
             
+            if self.metrics_exporter is not None:
+                await self.metrics_exporter.start()
+            
             # 启动游戏循环
             self.running = True
             await self.game_loop()
@@ -103,6 +156,7 @@ class GameServer:
         logger.info(f"新连接: {addr}")
         
         self.stats['total_connections'] += 1
+        self.stats['active_connections'] += 1
         
         try:
             # 创建游戏协议处理器
@@ -117,82 +171,111 @@ class GameServer:
         except Exception as e:
             logger.error(f"客户端 {addr} 处理错误: {e}")
         finally:
+            self.stats['active_connections'] -= 1
             writer.close()
             await writer.wait_closed()
             logger.info(f"连接关闭: {addr}")
     
     async def game_loop(self):
-        """游戏主循环"""
+        """游戏主循环
+        
+        tick由调度器在固定的截止时间点触发，这里只等待关闭信号。
+        """
         logger.info("游戏循环启动")
-        last_tick = time.time()
+        self.scheduler.start()
         
-        while self.running:
-            try:
-                current_time = time.time()
-                
-                # 执行游戏tick
-                if current_time - last_tick >= self.tick_interval:
-                    await self.tick()
-                    last_tick = current_time
-                
-                # 更新统计信息
-                current_players = len(self.players.get_online_players())
-                self.stats['current_players'] = current_players
-                if current_players > self.stats['peak_players']:
-                    self.stats['peak_players'] = current_players
-                
-                # 短暂休眠避免CPU占用过高
-                await asyncio.sleep(0.01)
-                
-            except Exception as e:
-                logger.error(f"游戏循环错误: {e}")
-                await asyncio.sleep(1)
+        await self._shutdown.wait()
         
+        self.scheduler.stop()
         logger.info("游戏循环结束")
     
     async def tick(self):
         """执行一个游戏tick"""
         try:
-            # 更新世界状态
-            await self.world.tick()
-            
-            # 更新玩家状态
-            await self.players.tick()
+            # 更新统计信息
+            current_players = len(self.players.online_players)
+            self.stats['current_players'] = current_players
+            if current_players > self.stats['peak_players']:
+                self.stats['peak_players'] = current_players
             
-            # 处理聊天系统
-            await self.chat.tick()
+            # 依次更新世界、玩家，处理定时事件；
+            # 开启指标时记录每个阶段的耗时，开启卡顿监视时标记正在执行的阶段
+            metrics, monitor = self.metrics, self.loop_monitor
+            if metrics is None and monitor is None:
+                for _, phase in self.tick_phases:
+                    await phase()
+            else:
+                clock = time.perf_counter
+                for name, phase in self.tick_phases:
+                    if monitor is not None:
+                        previous = monitor.begin('tick', name)
+                    start = clock()
+                    try:
+                        await phase()
+                    finally:
+                        if monitor is not None:
+                            monitor.end(previous)
+                    if metrics is not None:
+                        metrics.record_phase(name, clock() - start)
             
-            # 处理定时事件
-            await self.handle_timed_events()
+            # 在后台写出这个tick记录的聊天和事件
+            self.events.request_flush()
             
         except Exception as e:
             logger.error(f"Tick执行错误: {e}")
     
     async def handle_timed_events(self):
-        """处理定时事件"""
-        current_time = time.time()
-        
-        # 整点事件（灯塔鸣笛）
-        if int(current_time) % 3600 == 0:  # 每小时
-            await self.world.trigger_hourly_event()
-        
-        # 每日事件
-        if int(current_time // 86400) != int(self.stats['start_time'] // 86400):
-            await self.world.trigger_daily_event()
-            self.stats['start_time'] = current_time
+        """处理定时事件：推进时间轮，触发所有到期的定时器"""
+        await self.timers.advance()
+    
+    def checkpoint_stats(self):
+        """在后台启动一次统计存档，上一次尚未完成时跳过（不阻塞tick）"""
+        if self._checkpoint_task is None or self._checkpoint_task.done():
+            self._checkpoint_task = asyncio.get_running_loop().create_task(self.save_checkpoint())
+    
+    async def save_checkpoint(self):
+        """保存统计信息并清理旧备份（在存储线程池中执行）"""
+        try:
+            await self.async_storage.save_game_stats(self.get_stats())
+            await self.async_storage.cleanup_old_backups()
+        except Exception as e:
+            logger.error(f"保存统计信息失败: {e}")
+    
+    def get_stats(self) -> Dict:
+        """获取服务器统计信息（含tick漂移/超时）"""
+        stats = dict(self.stats)
+        stats['tick'] = self.scheduler.get_stats()
+        if self.metrics is not None:
+            stats['metrics'] = self.metrics.snapshot()
+        if self.loop_monitor is not None:
+            stats['loop'] = self.loop_monitor.get_stats()
+        return stats
     
     async def stop(self):
         """停止服务器"""
         logger.info("正在停止服务器...")
         self.running = False
+        self.scheduler.stop()
+        if self._shutdown:
+            self._shutdown.set()
         
         # 保存所有玩家数据
         await self.players.save_all_players()
+        self.players.close()
+        if self._checkpoint_task is not None:
+            await self._checkpoint_task
+        await self.async_storage.save_game_stats(self.get_stats())
+        self.async_storage.close()
+        await self.events.close()
         
-        # 关闭服务器
+        # 关闭服务器和指标端点
+        if self.metrics_exporter is not None:
+            await self.metrics_exporter.stop()
         if self.server:
             self.server.close()
             await self.server.wait_closed()
+        if self.loop_monitor is not None:
+            self.loop_monitor.stop()
         
         logger.info("服务器已停止")
 
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+聊天历史
+固定容量的环形缓冲区，另外按房间、频道、私聊双方建立索引，
+取某个目标最近 N 条消息只需要 O(N)，总内存不随运行时间增长。
+"""
+
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+import config
+
+def history_key(message) -> Tuple:
+    """消息所属的索引键：房间、频道、全服，私聊按双方名字排序后成对"""
+    if message.type == "private":
+        a, b = message.sender, message.target
+        return ("private", a, b) if a <= b else ("private", b, a)
+    return (message.type, message.target)
+
+class ChatHistory:
+    """聊天消息环形缓冲区
+
+    每条消息有一个递增的序号，存放在 slots[序号 % capacity]。
+    每个目标的索引是按时间顺序排列的序号队列；缓冲区覆盖最旧的消息时，
+    该消息一定也是它所属索引中最旧的一条，直接从队首弹出，索引为空时删除。
+    """
+
+    __slots__ = ('capacity', 'slots', 'keys', 'indexes', 'next_seq')
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity if capacity is not None else config.MAX_CHAT_HISTORY
+        self.slots: List = [None] * self.capacity
+        self.keys: List[Optional[Tuple]] = [None] * self.capacity
+        self.indexes: Dict[Hashable, Deque[int]] = {}
+        self.next_seq = 0
+
+    def __len__(self) -> int:
+        return min(self.next_seq, self.capacity)
+
+    def append(self, message):
+        """记录一条消息，缓冲区已满时覆盖最旧的一条"""
+        seq = self.next_seq
+        pos = seq % self.capacity
+        old_key = self.keys[pos]
+        if old_key is not None:
+            index = self.indexes[old_key]
+            index.popleft()
+            if not index:
+                del self.indexes[old_key]
+
+        key = history_key(message)
+        self.slots[pos] = message
+        self.keys[pos] = key
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = deque()
+        index.append(seq)
+        self.next_seq = seq + 1
+
+    def recent(self, limit: int, key: Optional[Tuple] = None) -> List:
+        """按时间顺序返回最近 limit 条消息；key 为 None 时不区分目标"""
+        if limit <= 0:
+            return []
+        slots, capacity = self.slots, self.capacity
+        if key is None:
+            end = self.next_seq
+            start = max(end - min(limit, capacity), 0)
+            return [slots[seq % capacity] for seq in range(start, end)]
+
+        index = self.indexes.get(key)
+        if not index:
+            return []
+        count = min(limit, len(index))
+        result = [None] * count
+        # 从队尾向前取，只访问需要的 count 个序号
+        for i in range(count):
+            result[count - 1 - i] = slots[index[-1 - i] % capacity]
+        return result
+
+    def room(self, room_id: str, limit: int) -> List:
+        return self.recent(limit, ("room", room_id))
+
+    def channel(self, channel_name: str, limit: int) -> List:
+        return self.recent(limit, ("channel", channel_name))
+
+    def private(self, a: str, b: str, limit: int) -> List:
+        return self.recent(limit, ("private", a, b) if a <= b else ("private", b, a))
+
+    def clear(self):
+        """清空历史"""
+        self.slots = [None] * self.capacity
+        self.keys = [None] * self.capacity
+        self.indexes.clear()
+        self.next_seq = 0
@@ -10,6 +10,11 @@ import logging
 import time
 from typing import Dict, List, Set, Optional
 
+import config
+from framing import encode_line
+from protocol import fanout
+from systems.chat_history import ChatHistory
+
 logger = logging.getLogger(__name__)
 
 class ChatManager:
@@ -20,30 +25,15 @@ class ChatManager:
         logger.info(f"server属性: {dir(server) if server else 'None'}")
         
         self.channels = {}  # 频道名称 -> Channel对象
-        self.chat_cooldown_time = 1.0  # 聊天冷却时间（秒）
-        self.chat_cooldowns = {}  # 玩家名 -> 下次可聊天时间
-        self.max_history = 100  # 最大历史记录数量
-        self.message_history: List[Message] = []
-    
-    async def tick(self):
-        """聊天系统tick更新"""
-        current_time = time.time()
-        
-        # 清理过期的聊天冷却
-        expired_cooldowns = [
-            player_id for player_id, cooldown_time in self.chat_cooldowns.items()
-            if current_time > cooldown_time
-        ]
-        for player_id in expired_cooldowns:
-            del self.chat_cooldowns[player_id]
+        self.history = ChatHistory(config.MAX_CHAT_HISTORY)
     
     async def send_room_message(self, player, message: str):
         """发送房间消息"""
         if not player:
             return False
         
-        # 检查聊天冷却
-        if not self._check_chat_cooldown(player.name):
+        # 检查聊天频率
+        if not self._check_chat_rate(player):
             return False
         
         # 创建消息对象
@@ -58,7 +48,7 @@ class ChatManager:
         self._add_to_history(chat_message)
         
         # 广播到房间
-        await self._broadcast_to_room(player.current_room, chat_message, exclude=player.name)
+        self._broadcast_to_room(player.current_room, chat_message, exclude=player)
         
         logger.info(f"房间消息 [{player.current_room}] {player.name}: {message}")
         return True
@@ -68,8 +58,8 @@ class ChatManager:
         if not player:
             return False
         
-        # 检查聊天冷却
-        if not self._check_chat_cooldown(player.name):
+        # 检查聊天频率
+        if not self._check_chat_rate(player):
             return False
         
         # 创建消息对象
@@ -84,7 +74,7 @@ class ChatManager:
         self._add_to_history(chat_message)
         
         # 广播到全服
-        await self._broadcast_to_global(chat_message, exclude=player.name)
+        self._broadcast_to_global(chat_message, exclude=player)
         
         logger.info(f"全服消息 {player.name}: {message}")
         return True
@@ -94,8 +84,8 @@ class ChatManager:
         if not sender:
             return False
         
-        # 检查聊天冷却
-        if not self._check_chat_cooldown(sender.name):
+        # 检查聊天频率
+        if not self._check_chat_rate(sender):
             return False
         
         # 查找目标玩家
@@ -108,7 +98,7 @@ class ChatManager:
             sender=sender.name,
             content=message,
             type="private",
-            target=target_name
+            target=target_player.name
         )
         
         # 添加到历史记录
@@ -116,7 +106,7 @@ class ChatManager:
         
         # 发送给目标玩家
         try:
-            await target_player.protocol.send_message("SEEN", f"私聊: {sender.name}: {message}")
+            target_player.protocol.queue_bytes(chat_message.wire)
             await sender.protocol.send_message("OK", f"私聊发送给 {target_name}")
         except Exception as e:
             logger.error(f"发送私聊失败: {e}")
@@ -138,6 +128,9 @@ class ChatManager:
         channel.add_member(player)
         
         await player.protocol.send_message("OK", f"已加入频道 {channel_name}")
+        replay = self.replay(self.history.channel(channel_name, config.CHAT_REPLAY_LINES))
+        if replay:
+            player.protocol.queue_bytes(replay)
         logger.info(f"玩家 {player.name} 加入频道 {channel_name}")
         return True
     
@@ -165,8 +158,8 @@ class ChatManager:
         if not player or channel_name not in self.channels:
             return False
         
-        # 检查聊天冷却
-        if not self._check_chat_cooldown(player.name):
+        # 检查聊天频率
+        if not self._check_chat_rate(player):
             return False
         
         channel = self.channels[channel_name]
@@ -186,91 +179,57 @@ class ChatManager:
         self._add_to_history(chat_message)
         
         # 广播到频道
-        await self._broadcast_to_channel(channel_name, chat_message, exclude=player.name)
+        self._broadcast_to_channel(channel_name, chat_message, exclude=player)
         
         logger.info(f"频道消息 [{channel_name}] {player.name}: {message}")
         return True
     
-    def _check_chat_cooldown(self, player_name: str) -> bool:
-        """检查聊天冷却"""
-        current_time = time.time()
-        if player_name in self.chat_cooldowns:
-            if current_time < self.chat_cooldowns[player_name]:
-                return False
-        
-        self.chat_cooldowns[player_name] = current_time + self.chat_cooldown_time
-        return True
+    def _check_chat_rate(self, player) -> bool:
+        """检查聊天频率：使用连接上的令牌桶，允许短时间内连续发送几条"""
+        protocol = player.protocol
+        if protocol is None:
+            return True
+        return protocol.rate_limiter.allow('chat')
     
     def _add_to_history(self, message: 'Message'):
-        """添加消息到历史记录"""
-        self.message_history.append(message)
-        
-        # 限制历史记录数量
-        if len(self.message_history) > self.max_history:
-            self.message_history.pop(0)
+        """添加消息到历史记录（环形缓冲区，满了覆盖最旧的一条），并写入事件日志"""
+        self.history.append(message)
+        events = getattr(self.server, 'events', None)
+        if events is not None:
+            events.record_message(message)
     
-    async def _broadcast_to_room(self, room_name: str, message: 'Message', exclude: str = None):
-        """广播消息到房间"""
-        try:
-            logger.debug(f"开始广播房间消息到 {room_name}")
-            
-            # 直接访问player_manager
-            if not hasattr(self.server, 'players'):
-                logger.error("服务器没有players属性")
-                return
-            
-            # 获取房间内的所有玩家
-            online_players = self.server.players.get_online_players()
-            logger.debug(f"在线玩家数量: {len(online_players)}")
-            
-            room_players = [p for p in online_players if p.current_room == room_name and p.name != exclude]
-            logger.debug(f"房间 {room_name} 中的玩家: {[p.name for p in room_players]}")
-            
-            if not room_players:
-                logger.warning(f"房间 {room_name} 中没有其他玩家")
-                return
-            
-            # 广播给房间内的所有玩家
-            for player in room_players:
-                try:
-                    await player.protocol.send_message("SEEN", f"{message.sender}: {message.content}")
-                    logger.debug(f"房间消息已发送给 {player.name}")
-                except Exception as e:
-                    logger.error(f"房间广播失败: {e}")
-            
-            logger.info(f"房间 {room_name} 消息已广播给 {len(room_players)} 个玩家")
-            
-        except Exception as e:
-            logger.error(f"房间广播过程中发生异常: {e}")
-            import traceback
-            logger.error(f"异常堆栈: {traceback.format_exc()}")
+    def replay(self, messages: List['Message']) -> bytes:
+        """把历史消息拼成一次写入的字节，没有消息时返回空"""
+        if not messages:
+            return b""
+        return encode_line(f"SYS 最近的 {len(messages)} 条消息:") + b"".join(m.wire for m in messages)
     
-    async def _broadcast_to_global(self, message: 'Message', exclude: str = None):
-        """广播消息到全服"""
-        if not hasattr(self.server, 'player_manager'):
+    def room_replay(self, room_id: str) -> bytes:
+        """进入房间时回放的最近房间消息"""
+        return self.replay(self.history.room(room_id, config.CHAT_REPLAY_LINES))
+    
+    def _broadcast_to_room(self, room_name: str, message: 'Message', exclude=None):
+        """广播消息到房间（只入队，不等待接收者）"""
+        room = self.server.world.get_room(room_name)
+        if room is None:
+            logger.warning(f"房间 {room_name} 不存在，消息未广播")
+            return
+        
+        delivered = fanout(room.get_players(), message.wire, exclude=exclude)
+        logger.debug(f"房间 {room_name} 消息已广播给 {delivered} 个玩家")
+    
+    def _broadcast_to_global(self, message: 'Message', exclude=None):
+        """广播消息到全服（只入队，不等待接收者）"""
+        if not hasattr(self.server, 'players'):
             return
         
-        # 获取所有在线玩家
-        online_players = self.server.player_manager.get_online_players()
-        for player in online_players:
-            if player.name != exclude:
-                try:
-                    await player.protocol.send_message("SEEN", f"[全服] {message.sender}: {message.content}")
-                except Exception as e:
-                    logger.error(f"全服广播失败: {e}")
+        fanout(self.server.players.get_online_players(), message.wire, exclude=exclude)
     
-    async def _broadcast_to_channel(self, channel_name: str, message: 'Message', exclude: str = None):
-        """广播消息到频道"""
+    def _broadcast_to_channel(self, channel_name: str, message: 'Message', exclude=None):
+        """广播消息到频道（只入队，不等待接收者）"""
         if channel_name in self.channels:
             channel = self.channels[channel_name]
-            for member in channel.members:
-                if exclude and member.name == exclude:
-                    continue
-                
-                try:
-                    await member.protocol.send_message("SEEN", f"[{channel_name}] {message.sender}: {message.content}")
-                except Exception as e:
-                    logger.error(f"频道广播失败: {e}")
+            fanout(channel.members, message.wire, exclude=exclude)
     
     def _find_player_by_name(self, name: str):
         """根据名字查找玩家"""
@@ -306,3 +265,19 @@ class Message:
         self.type = type  # room, global, private, channel
         self.target = target
         self.timestamp = time.time()
+        self._wire = None
+    
+    @property
+    def wire(self) -> bytes:
+        """发给接收者的协议行，只格式化和编码一次，所有接收者共享同一份 bytes"""
+        if self._wire is None:
+            if self.type == "channel":
+                line = f"SEEN [{self.target}] {self.sender}: {self.content}"
+            elif self.type == "global":
+                line = f"SEEN [全服] {self.sender}: {self.content}"
+            elif self.type == "private":
+                line = f"SEEN 私聊: {self.sender}: {self.content}"
+            else:
+                line = f"SEEN {self.sender}: {self.content}"
+            self._wire = encode_line(line)
+        return self._wire
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家背包
+每格保存 (物品编号, 数量)，交替存放在一个 array('H') 中
+"""
+
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, Tuple
+
+import config
+from world.item_catalog import ItemCatalog, item_catalog
+
+class Inventory(Mapping):
+    """按格存放的背包
+
+    - 可堆叠物品每格最多 max_stack 个，不可堆叠物品每格 1 个；
+    - 格子总数为 config.INVENTORY_SLOTS 加上背包类物品提供的格子；
+    - 作为只读映射使用时 inventory['paper_tape'] 是该物品的总数，不复制任何数据。
+
+    修改只能通过 add/remove，空间不足时整个操作失败、背包不变。
+    """
+
+    __slots__ = ('catalog', 'cells')
+
+    def __init__(self, catalog: ItemCatalog = item_catalog):
+        self.catalog = catalog
+        self.cells = array('H')  # [编号0, 数量0, 编号1, 数量1, ...]
+
+    # 只读映射接口：物品 id -> 总数
+
+    def __getitem__(self, item_id: str) -> int:
+        total = self.count(item_id)
+        if not total:
+            raise KeyError(item_id)
+        return total
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        ids = self.catalog.ids
+        for code in self.cells[::2]:
+            if code not in seen:
+                seen.add(code)
+                yield ids[code]
+
+    def __len__(self) -> int:
+        return len(set(self.cells[::2]))
+
+    def __repr__(self) -> str:
+        return f"Inventory({self.to_dict()!r})"
+
+    def count(self, item_id: str) -> int:
+        """某种物品的总数"""
+        code = self.catalog.index.get(item_id)
+        if code is None:
+            return 0
+        cells = self.cells
+        return sum(cells[i + 1] for i in range(0, len(cells), 2) if cells[i] == code)
+
+    def slots(self) -> Iterator[Tuple[int, int]]:
+        """逐格返回 (物品编号, 数量)，用于显示"""
+        cells = self.cells
+        return zip(cells[::2], cells[1::2])
+
+    @property
+    def used_slots(self) -> int:
+        return len(self.cells) // 2
+
+    @property
+    def capacity(self) -> int:
+        """当前格子总数"""
+        bag_slots = self.catalog.bag_slots
+        return config.INVENTORY_SLOTS + sum(bag_slots[code] for code in self.cells[::2])
+
+    # 修改
+
+    def add(self, item_id: str, count: int = 1) -> bool:
+        """放入物品，空间不足时返回 False 且不做任何修改"""
+        if count <= 0:
+            return count == 0
+        code = self.catalog.code(item_id)
+        max_stack = self.catalog.max_stack[code]
+        cells = self.cells
+
+        # 先补满已有的同类格子，剩下的占用新格子
+        partial = [i for i in range(0, len(cells), 2) if cells[i] == code and cells[i + 1] < max_stack]
+        free = sum(max_stack - cells[i + 1] for i in partial)
+        remaining = max(0, count - free)
+        new_slots = -(-remaining // max_stack)
+        gained = self.catalog.bag_slots[code] * new_slots
+        if self.used_slots + new_slots > self.capacity + gained:
+            return False
+
+        left = count
+        for i in partial:
+            if left == 0:
+                break
+            added = min(max_stack - cells[i + 1], left)
+            cells[i + 1] += added
+            left -= added
+        while left > 0:
+            added = min(max_stack, left)
+            cells.append(code)
+            cells.append(added)
+            left -= added
+        return True
+
+    def remove(self, item_id: str, count: int = 1) -> bool:
+        """取出物品，数量不足或取出背包后放不下其余物品时返回 False 且不做任何修改"""
+        code = self.catalog.index.get(item_id)
+        if code is None or count <= 0 or self.count(item_id) < count:
+            return False
+        cells = self.cells
+
+        # 从后往前取，优先清空零散的格子
+        positions = [i for i in range(len(cells) - 2, -1, -2) if cells[i] == code]
+        emptied = []
+        left = count
+        for i in positions:
+            if left == 0:
+                break
+            taken = min(cells[i + 1], left)
+            left -= taken
+            if taken == cells[i + 1]:
+                emptied.append(i)
+
+        lost = self.catalog.bag_slots[code] * len(emptied)
+        if self.used_slots - len(emptied) > self.capacity - lost:
+            return False
+
+        left = count
+        for i in positions:
+            if left == 0:
+                break
+            taken = min(cells[i + 1], left)
+            cells[i + 1] -= taken
+            left -= taken
+        for i in emptied:  # 下标从大到小，删除不影响其余下标
+            del cells[i:i + 2]
+        return True
+
+    # 存档
+
+    def to_dict(self) -> Dict[str, int]:
+        """存档格式：{物品 id: 总数}"""
+        ids = self.catalog.ids
+        result: Dict[str, int] = {}
+        for code, count in self.slots():
+            item_id = ids[code]
+            result[item_id] = result.get(item_id, 0) + count
+        return result
+
+    def load(self, data: Dict[str, int]):
+        """从存档恢复；旧存档可能超过格子上限，按原样全部放入"""
+        cells = self.cells
+        del cells[:]
+        for item_id, count in data.items():
+            code = self.catalog.code(item_id)
+            max_stack = self.catalog.max_stack[code]
+            while count > 0:
+                added = min(max_stack, count)
+                cells.append(code)
+                cells.append(added)
+                count -= added
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环卡顿监视
+持续测量事件循环延迟；某个回调或协程的一步同步执行太久（同步写文件、解析 YAML、大循环）
+卡住所有玩家时，记录事件循环线程当时的调用栈和正在执行的命令或 tick 阶段。
+最近的卡顿保存在固定长度的队列里，管理员用 LAG 命令查看。
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import config
+from systems.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 30  # 每次卡顿保留的栈帧数（从栈顶算起）
+
+def describe(activity: Optional[Tuple[str, str]]) -> str:
+    """卡顿时正在执行的命令或 tick 阶段"""
+    return f"{activity[0]} {activity[1]}" if activity else "无命令或 tick 阶段"
+
+def format_stack(frame) -> List[str]:
+    """调用栈，每帧一行，栈顶在最后"""
+    frames = []
+    while frame is not None and len(frames) < STACK_DEPTH:
+        code = frame.f_code
+        frames.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+class LoopMonitor:
+    """事件循环卡顿监视器
+
+    - 心跳：事件循环中每 interval 秒触发一次的回调，迟到的时间就是事件循环延迟，计入直方图；
+    - 看门狗：独立线程每 interval/2 检查一次心跳，心跳停了超过 threshold 时，
+      用 sys._current_frames() 取事件循环线程此刻的调用栈，阻塞的代码就在栈顶；
+    - 归因：命令分发和 tick 的每个阶段用 begin()/end() 标记所在任务正在执行的内容，
+      标记按 asyncio 任务分开保存，多个协程交错执行时看门狗读取的是此刻正在运行的任务的标记。
+
+    不使用 asyncio 调试模式的慢回调告警：调试模式会拖慢每一个回调，
+    而且只在回调结束后报告回调对象，拿不到卡住时的调用栈。
+    """
+
+    def __init__(self, interval: float = config.LOOP_MONITOR_INTERVAL,
+                 threshold: float = config.LOOP_STALL_THRESHOLD, history: int = config.LOOP_STALL_HISTORY):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: Deque[Dict] = deque(maxlen=history)
+        self.stall_count = 0
+        self.lag = Histogram()
+        self.last_lag = 0.0
+        self.activities: Dict[Optional[asyncio.Task], Tuple[str, str]] = {}  # 任务 -> 正在执行的命令或 tick 阶段
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id = 0
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._beat = 0.0  # 最近一次心跳的时间（单调时钟）
+        self._captured = 0.0  # 已经记录过卡顿的心跳，同一次卡顿只记一次
+        self._stall: Optional[Dict] = None  # 还没有结束的卡顿
+
+    def start(self):
+        """开始监视（必须在事件循环中调用）"""
+        if self._thread is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._beat = time.monotonic()
+        self._handle = self.loop.call_later(self.interval, self._heartbeat)
+        self._thread = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._thread.start()
+        logger.info(f"事件循环监视启动，卡顿阈值 {self.threshold * 1000:.0f}ms")
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def begin(self, kind: str, name: str) -> Optional[Tuple[str, str]]:
+        """标记当前任务开始执行一个命令或 tick 阶段，返回该任务之前的标记，交给 end() 恢复"""
+        task = asyncio.current_task()
+        previous = self.activities.get(task)
+        self.activities[task] = (kind, name)
+        return previous
+
+    def end(self, previous: Optional[Tuple[str, str]]):
+        """当前任务的命令或 tick 阶段结束，恢复 begin() 返回的标记"""
+        task = asyncio.current_task()
+        if previous is None:
+            self.activities.pop(task, None)
+        else:
+            self.activities[task] = previous
+
+    def current_activity(self) -> Optional[Tuple[str, str]]:
+        """事件循环中此刻正在运行的任务的标记（看门狗线程中调用）"""
+        task = asyncio.current_task(self.loop)
+        return self.activities.get(task) if task is not None else None
+
+    def _heartbeat(self):
+        """事件循环中的心跳：测量延迟，结束进行中的卡顿"""
+        now = time.monotonic()
+        with self._lock:
+            previous = self._beat
+            lag = max(0.0, now - previous - self.interval)
+            self._beat = now
+            stall, self._stall = self._stall, None
+            if stall is None and lag >= self.threshold and self._captured != previous:
+                # 卡顿在看门狗两次检查之间开始并结束，没有采到调用栈
+                self._captured = previous
+                self._add_stall(time.time() - lag, lag, None, [])
+        self.last_lag = lag
+        self.lag.record(lag)
+
+        if stall is not None:
+            stall['lag'] = lag
+            stall['ongoing'] = False
+            logger.warning(f"事件循环卡顿 #{stall['id']} 结束，共 {lag * 1000:.0f}ms")
+
+        self._handle = self.loop.call_later(self.interval, self._heartbeat)
+
+    def _watch(self):
+        """看门狗线程：心跳停止超过阈值时采集事件循环线程的调用栈"""
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == self._captured:
+                continue
+            activity = self.current_activity()
+            stack = format_stack(sys._current_frames().get(self._loop_thread_id))
+            with self._lock:
+                if self._beat != beat:
+                    # 采样期间事件循环已经恢复，调用栈可能不是卡住时的；这次卡顿由心跳记录
+                    continue
+                self._captured = beat
+                stall = self._add_stall(time.time() - blocked, blocked, activity, stack)
+                stall['ongoing'] = True
+                self._stall = stall
+            logger.warning(f"事件循环卡顿 #{stall['id']} 已 {blocked * 1000:.0f}ms（{describe(activity)}），"
+                           f"调用栈:\n  " + "\n  ".join(stack))
+
+    def _add_stall(self, started: float, lag: float, activity: Optional[Tuple[str, str]], stack: List[str]) -> Dict:
+        """新增一条卡顿记录（调用方持有 self._lock）"""
+        self.stall_count += 1
+        stall = {'id': self.stall_count, 'time': started, 'lag': lag, 'activity': activity,
+                 'stack': stack, 'ongoing': False}
+        self.stalls.append(stall)
+        return stall
+
+    def get_stall(self, stall_id: int) -> Optional[Dict]:
+        for stall in list(self.stalls):
+            if stall['id'] == stall_id:
+                return stall
+        return None
+
+    def get_stats(self) -> Dict:
+        stats = self.lag.summary()
+        stats['last_ms'] = round(self.last_lag * 1000, 3)
+        stats['stalls'] = self.stall_count
+        return stats
+
+    def report(self, limit: int = 10) -> List[str]:
+        """延迟分布和最近的卡顿，新的在前"""
+        s = self.lag.summary()
+        lines = [f"事件循环延迟: 当前 {self.last_lag * 1000:.1f}ms  p50 {s['p50_ms']:.1f}ms  "
+                 f"p99 {s['p99_ms']:.1f}ms  最大 {s['max_ms']:.1f}ms（{s['count']} 次心跳）",
+                 f"卡顿（超过 {self.threshold * 1000:.0f}ms）: 共 {self.stall_count} 次"]
+        for stall in list(self.stalls)[::-1][:limit]:
+            when = time.strftime('%H:%M:%S', time.localtime(stall['time']))
+            state = "进行中" if stall['ongoing'] else f"{stall['lag'] * 1000:.0f}ms"
+            top = os.path.basename(stall['stack'][-1]) if stall['stack'] else "未采到调用栈"
+            lines.append(f"#{stall['id']} {when} {state} {describe(stall['activity'])}  {top}")
+        return lines
+
+    def stall_report(self, stall: Dict) -> List[str]:
+        """一次卡顿的完整调用栈"""
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stall['time']))
+        lines = [f"卡顿 #{stall['id']} {when} {stall['lag'] * 1000:.0f}ms {describe(stall['activity'])}"]
+        lines.extend(f"  {frame}" for frame in stall['stack'])
+        return lines
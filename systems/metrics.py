@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+按命令名统计处理耗时，按阶段统计 tick 耗时，并汇总协议层的收发字节和广播次数。
+耗时使用 HDR 风格的对数-线性直方图：固定大小的计数数组，记录一次只是一次整数运算和一次数组自增。
+
+关闭时服务器上的 metrics 为 None，调用方只做一次 None 判断，不计时。
+"""
+
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import config
+from protocol import wire_stats
+
+# 每个二进制数量级分成 2**SUB_BITS 个桶，相对误差不超过 1/8
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+# 记录范围：0 ~ 2**MAX_BITS 微秒（约 19 小时），更大的值计入最后一个桶
+MAX_BITS = 36
+BUCKET_COUNT = 2 * SUB_BUCKETS + (MAX_BITS - SUB_BITS - 1) * SUB_BUCKETS
+
+def bucket_index(value: int) -> int:
+    """微秒值所在的桶：小于 16 的值各占一个桶，之后每个数量级 8 个桶"""
+    if value < 2 * SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BITS - 1
+    index = 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+    return index if index < BUCKET_COUNT else BUCKET_COUNT - 1
+
+def bucket_upper(index: int) -> int:
+    """桶内的最大微秒值"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = (index - 2 * SUB_BUCKETS) // SUB_BUCKETS + 1
+    top = (index - 2 * SUB_BUCKETS) % SUB_BUCKETS + SUB_BUCKETS
+    return ((top + 1) << shift) - 1
+
+class Histogram:
+    """耗时直方图（微秒精度，按桶计数）"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """记录一次耗时（秒）"""
+        self.counts[bucket_index(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """q 分位数（秒），取所在桶的上界"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(self.count * q / 100.0 + 0.999999))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= rank:
+                    return min(bucket_upper(index) / 1e6, self.max)
+        return self.max
+
+    def buckets(self) -> List[Tuple[int, int]]:
+        """非空的桶：[(桶上界微秒, 数量)]"""
+        return [(bucket_upper(index), n) for index, n in enumerate(self.counts) if n]
+
+    def summary(self) -> Dict[str, float]:
+        """计数、平均值和分位数（毫秒）"""
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'avg_ms': round(self.total / count * 1000, 3),
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+    def reset(self):
+        for index in range(BUCKET_COUNT):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+class Metrics:
+    """服务器运行指标
+
+    - commands：每个命令名一个直方图，在 CommandHandler.handle_command 中记录；
+    - phases：tick 的每个阶段一个直方图，在 GameServer.tick 中记录；
+    - 收发字节、广播次数直接读取协议层的 wire_stats，不重复计数。
+    """
+
+    def __init__(self):
+        self.commands: Dict[str, Histogram] = {}
+        self.phases: Dict[str, Histogram] = {}
+        self.started_at = time.time()
+
+    def record_command(self, name: str, seconds: float):
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.record(seconds)
+
+    def record_phase(self, name: str, seconds: float):
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = Histogram()
+        histogram.record(seconds)
+
+    def counters(self) -> Dict[str, int]:
+        return dict(wire_stats)
+
+    def snapshot(self) -> Dict:
+        """全部指标，可直接序列化为 JSON"""
+        return {
+            'uptime': round(time.time() - self.started_at, 1),
+            'commands': {name: h.summary() for name, h in sorted(self.commands.items())},
+            'tick_phases': {name: h.summary() for name, h in self.phases.items()},
+            'counters': self.counters()
+        }
+
+    def top_commands(self, limit: int = 10) -> List[Tuple[str, Dict[str, float]]]:
+        """按累计耗时排序的命令，最占用时间的在前"""
+        ranked = sorted(self.commands.items(), key=lambda item: item[1].total, reverse=True)
+        return [(name, histogram.summary()) for name, histogram in ranked[:limit]]
+
+    def report(self, limit: int = 10) -> List[str]:
+        """可读的文本报告"""
+        lines = [f"{'命令':<10}{'次数':>8}{'累计ms':>10}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"]
+        for name, s in self.top_commands(limit):
+            lines.append(f"{name:<10}{s['count']:>8}{s['total_ms']:>10.1f}{s['p50_ms']:>8.2f}"
+                         f"{s['p95_ms']:>8.2f}{s['p99_ms']:>8.2f}{s['max_ms']:>8.2f}")
+        for name, histogram in self.phases.items():
+            s = histogram.summary()
+            lines.append(f"tick.{name:<5}{s['count']:>8}{s['total_ms']:>10.1f}{s['p50_ms']:>8.2f}"
+                         f"{s['p95_ms']:>8.2f}{s['p99_ms']:>8.2f}{s['max_ms']:>8.2f}")
+        counters = self.counters()
+        lines.append(f"收 {counters['bytes_received']}B 发 {counters['bytes_sent']}B，"
+                     f"广播 {counters['broadcasts']} 次 / {counters['broadcast_deliveries']} 个接收者")
+        return lines
+
+def create_metrics() -> Optional[Metrics]:
+    """按配置创建指标，关闭时返回 None"""
+    return Metrics() if config.METRICS_ENABLED else None
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus 指标端点
+在游戏进程的事件循环中监听第二个端口，GET /metrics 返回 Prometheus 文本格式的指标：
+连接数、在线玩家、各房间人数、tick 耗时、事件循环延迟与卡顿次数、每个命令的调用次数和耗时分布、收发字节。
+
+输出按指标族逐块生成，每写完一块等待发送并让出事件循环，抓取大量房间时也不会卡住游戏循环。
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import config
+from protocol import wire_stats
+from systems.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'teletype'
+# 耗时分布的上界（秒），由 HDR 直方图的桶换算
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROOMS_PER_CHUNK = 500
+REQUEST_TIMEOUT = 5.0
+MAX_REQUEST_BYTES = 8192
+
+def _escape(value: str) -> str:
+    """标签值转义"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _header(name: str, kind: str, help_text: str) -> str:
+    return f"# HELP {PREFIX}_{name} {help_text}\n# TYPE {PREFIX}_{name} {kind}\n"
+
+def _samples(name: str, samples: Iterable[Tuple[str, float]]) -> str:
+    """样本行，样本为 (名称后缀和标签, 值)"""
+    return "".join(f"{PREFIX}_{name}{suffix} {value!r}\n" if isinstance(value, float) else
+                   f"{PREFIX}_{name}{suffix} {value}\n" for suffix, value in samples)
+
+def _family(name: str, kind: str, help_text: str, samples: Iterable[Tuple[str, float]]) -> str:
+    """一个完整的指标族：HELP/TYPE 加样本行"""
+    return _header(name, kind, help_text) + _samples(name, samples)
+
+def _histogram_samples(label: str, histogram: Histogram) -> List[Tuple[str, float]]:
+    """把 HDR 直方图换算成 Prometheus 的累计桶
+
+    HDR 桶按上界归入不小于它的第一个 le，落在边界附近的值最多偏大 1/8。
+    """
+    samples = []
+    buckets = histogram.buckets()
+    position = cumulative = 0
+    prefix, labels = (f'{label},', f'{{{label}}}') if label else ('', '')
+    for bound in LATENCY_BUCKETS:
+        limit = bound * 1e6
+        while position < len(buckets) and buckets[position][0] <= limit:
+            cumulative += buckets[position][1]
+            position += 1
+        samples.append((f'_bucket{{{prefix}le="{bound:g}"}}', cumulative))
+    samples.append((f'_bucket{{{prefix}le="+Inf"}}', histogram.count))
+    samples.append((f'_sum{labels}', histogram.total))
+    samples.append((f'_count{labels}', histogram.count))
+    return samples
+
+async def render(server) -> AsyncIterator[str]:
+    """逐块生成指标文本"""
+    stats = server.stats
+    yield _family('connections', 'gauge', "当前打开的连接数", [('', stats.get('active_connections', 0))])
+    yield _family('connections_total', 'counter', "累计连接数", [('', stats['total_connections'])])
+    yield _family('players_online', 'gauge', "在线玩家数", [('', len(server.players.online_players))])
+    yield _family('players_peak', 'gauge', "在线玩家峰值", [('', stats['peak_players'])])
+
+    # 各房间人数：只输出有人的房间，房间很多时分块输出
+    occupied = [(room_id, len(room.players)) for room_id, room in list(server.world.rooms.items()) if room.players]
+    yield _header('room_players', 'gauge', "房间内的玩家数")
+    for start in range(0, len(occupied), ROOMS_PER_CHUNK):
+        yield "".join(f'{PREFIX}_room_players{{room="{_escape(room_id)}"}} {count}\n'
+                      for room_id, count in occupied[start:start + ROOMS_PER_CHUNK])
+
+    scheduler = server.scheduler
+    yield _family('tick_duration_seconds_last', 'gauge', "最近一次 tick 的耗时", [('', scheduler.last_duration)])
+    yield _family('tick_duration_seconds_max', 'gauge', "tick 耗时的最大值", [('', scheduler.max_duration)])
+    yield _family('tick_overruns_total', 'counter', "超过 tick 间隔的次数", [('', scheduler.overruns)])
+    yield _family('tick_skipped_total', 'counter', "落后太多而跳过的 tick 数", [('', scheduler.skipped_ticks)])
+    yield _family('event_loop_lag_seconds', 'gauge', "tick 定时器的触发延迟（事件循环延迟）", [('', scheduler.last_drift)])
+    yield _family('event_loop_lag_seconds_max', 'gauge', "事件循环延迟的最大值", [('', scheduler.max_drift)])
+
+    monitor = getattr(server, 'loop_monitor', None)
+    if monitor is not None:
+        yield _family('event_loop_heartbeat_lag_seconds', 'histogram', "卡顿监视心跳的延迟",
+                      _histogram_samples('', monitor.lag))
+        yield _family('event_loop_stalls_total', 'counter', "事件循环卡顿次数", [('', monitor.stall_count)])
+
+    metrics = server.metrics
+    if metrics is not None:
+        samples: List[Tuple[str, float]] = []
+        for phase, histogram in list(metrics.phases.items()):
+            samples.extend(_histogram_samples(f'phase="{_escape(phase)}"', histogram))
+        yield _family('tick_phase_duration_seconds', 'histogram', "tick 各阶段的耗时", samples)
+
+        commands = sorted(metrics.commands.items())
+        yield _family('command_calls_total', 'counter', "命令调用次数",
+                      [(f'{{command="{_escape(name)}"}}', histogram.count) for name, histogram in commands])
+        yield _header('command_duration_seconds', 'histogram', "命令处理耗时")
+        for name, histogram in commands:
+            yield _samples('command_duration_seconds', _histogram_samples(f'command="{_escape(name)}"', histogram))
+
+    yield _family('bytes_received_total', 'counter', "收到的字节数", [('', wire_stats['bytes_received'])])
+    yield _family('bytes_sent_total', 'counter', "发出的字节数", [('', wire_stats['bytes_sent'])])
+    yield _family('broadcasts_total', 'counter', "广播次数", [('', wire_stats['broadcasts'])])
+    yield _family('broadcast_deliveries_total', 'counter', "广播送达的接收者数", [('', wire_stats['broadcast_deliveries'])])
+
+class MetricsExporter:
+    """Prometheus 抓取端点（与游戏共用事件循环）"""
+
+    def __init__(self, server, host: str = config.METRICS_HOST, port: int = config.METRICS_PORT):
+        self.server = server
+        self.host = host
+        self.port = port
+        self._listener: Optional[asyncio.AbstractServer] = None
+        self.scrapes = 0
+
+    async def start(self):
+        self._listener = await asyncio.start_server(self._handle, self.host, self.port,
+                                                    limit=MAX_REQUEST_BYTES, reuse_address=True)
+        self.port = self._listener.sockets[0].getsockname()[1]
+        logger.info(f"指标端点已启动: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            await self._listener.wait_closed()
+            self._listener = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            method, path = (request.split(b"\r\n", 1)[0].split(b" ") + [b"", b""])[:2]
+            path = path.split(b"?", 1)[0]
+            if method != b"GET":
+                await self._respond(writer, "405 Method Not Allowed", "只支持 GET\n")
+            elif path == b"/metrics":
+                self.scrapes += 1
+                writer.write(b"HTTP/1.1 200 OK\r\n"
+                             b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                             b"Connection: close\r\n\r\n")
+                async for chunk in render(self.server):
+                    writer.write(chunk.encode('utf-8'))
+                    await writer.drain()
+                    await asyncio.sleep(0)  # 每块之间让游戏循环先执行
+            elif path in (b"/", b"/health"):
+                await self._respond(writer, "200 OK", "ok\n")
+            else:
+                await self._respond(writer, "404 Not Found", "not found\n")
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"指标请求处理错误: {e}")
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: str, body: str):
+        data = body.encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('utf-8') + data)
+        await writer.drain()
@@ -7,17 +7,33 @@
 
 import asyncio
 import logging
-import json
+import sys
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import AbstractSet, Dict, List, Optional, Set
 import hashlib
 
+import config
+from persist.player_store import PlayerStore
+from systems.inventory import Inventory
+
 logger = logging.getLogger(__name__)
 
 class PlayerManager:
-    def __init__(self):
+    def __init__(self, db_file: str = config.DATABASE_FILE):
         self.online_players: Dict[str, 'Player'] = {}
-        self.player_data_file = 'data/players.json'
+        self.dirty_players: Set['Player'] = set()  # 有未保存改动的玩家
+        self._flush_task = None
+        self.store = PlayerStore(db_file)
+        # 单线程执行所有数据库操作，避免阻塞事件循环
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='player-db')
+        self.closed = False
+        self.timers = None
+    
+    def setup_timers(self, timers):
+        """注册定期写回有改动的玩家"""
+        self.timers = timers
+        timers.call_every(config.PLAYER_FLUSH_INTERVAL, self.request_flush)
         
     async def create_player(self, name: str, protocol) -> 'Player':
         """创建新玩家"""
@@ -28,6 +44,7 @@ class PlayerManager:
             
             # 创建新玩家
             player = Player(name, protocol)
+            player.dirty_sink = self.dirty_players
             
             # 添加到在线玩家列表
             self.online_players[name] = player
@@ -59,6 +76,7 @@ class PlayerManager:
         player.money = 0
         player.exp = 0
         player.level = 1
+        player.mark_dirty('spawn')
         
         logger.info(f"玩家 {player.name} 出生在 {player.current_room}")
     
@@ -76,69 +94,103 @@ class PlayerManager:
             del self.online_players[player.name]
             logger.info(f"玩家 {player.name} 已离线")
     
+    async def _run_db(self, func, *args):
+        """在数据库线程中执行存档操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+    
     async def save_player(self, player: 'Player'):
         """保存玩家数据"""
+        if self.closed:
+            # 服务器关闭时已经批量保存过所有在线玩家
+            logger.debug(f"存档已关闭，跳过保存玩家 {player.name}")
+            return
+        
         try:
-            # 读取现有数据
-            players_data = {}
-            try:
-                with open(self.player_data_file, 'r', encoding='utf-8') as f:
-                    players_data = json.load(f)
-            except FileNotFoundError:
-                pass
-            
-            # 更新玩家数据
-            players_data[player.name] = player.to_dict()
-            
-            # 保存到文件
-            with open(self.player_data_file, 'w', encoding='utf-8') as f:
-                json.dump(players_data, f, ensure_ascii=False, indent=2)
-                
+            player.clear_dirty()
+            self.dirty_players.discard(player)
+            await self._run_db(self.store.save, player.name, player.to_dict())
             logger.debug(f"玩家 {player.name} 数据已保存")
             
         except Exception as e:
             logger.error(f"保存玩家数据失败: {e}")
     
     async def save_all_players(self):
-        """保存所有玩家数据"""
+        """保存所有玩家数据（一个事务批量写入）"""
         logger.info("正在保存所有玩家数据...")
-        for player in self.get_online_players():
-            await self.save_player(player)
-        logger.info("所有玩家数据保存完成")
+        try:
+            records = []
+            for player in self.get_online_players():
+                player.clear_dirty()
+                records.append((player.name, player.to_dict()))
+            self.dirty_players.clear()
+            count = await self._run_db(self.store.save_many, records)
+            logger.info(f"所有玩家数据保存完成，共 {count} 个")
+        except Exception as e:
+            logger.error(f"批量保存玩家数据失败: {e}")
+    
+    def request_flush(self):
+        """在后台启动一次写回，上一次尚未完成时跳过（改动留到下一次合并写入）"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush_dirty())
+    
+    async def flush_dirty(self) -> int:
+        """写回有改动的玩家，同一玩家的多次改动只写一次，返回写入数量"""
+        if not self.dirty_players or self.closed:
+            return 0
+        
+        batch = list(self.dirty_players)
+        self.dirty_players.clear()
+        records = []
+        for player in batch:
+            player.clear_dirty()
+            records.append((player.name, player.to_dict()))
+        
+        try:
+            count = await self._run_db(self.store.save_many, records)
+            logger.debug(f"写回 {count} 个玩家")
+            return count
+        except Exception as e:
+            logger.error(f"写回玩家数据失败: {e}")
+            # 写入失败的玩家重新标记，下次重试
+            for player in batch:
+                player.mark_dirty('retry')
+            return 0
     
     async def load_player(self, name: str) -> Optional['Player']:
         """加载玩家数据"""
         try:
-            with open(self.player_data_file, 'r', encoding='utf-8') as f:
-                players_data = json.load(f)
+            player_data = await self._run_db(self.store.load, name)
+            if player_data:
+                return Player.from_dict(player_data)
                 
-            if name in players_data:
-                player_data = players_data[name]
-                player = Player.from_dict(player_data)
-                return player
-                
-        except FileNotFoundError:
-            pass
         except Exception as e:
             logger.error(f"加载玩家数据失败: {e}")
         
         return None
     
+    def close(self):
+        """关闭存档（等待未完成的写入）"""
+        self.closed = True
+        self._db_executor.shutdown(wait=True)
+        self.store.close()
+    
     async def tick(self):
         """玩家管理器tick更新"""
-        current_time = time.time()
-        
-        # 定期保存玩家数据
-        if int(current_time) % 300 == 0:  # 每5分钟
-            await self.save_all_players()
-        
         # 更新所有在线玩家状态
         for player in self.get_online_players():
             await player.tick()
 
+# 没有改动的玩家共享同一个空集合，第一次改动时才分配
+_CLEAN: AbstractSet[str] = frozenset()
+
 class Player:
+    __slots__ = ('name', 'protocol', 'title', 'level', 'exp', 'hp', 'max_hp', 'ep', 'max_ep',
+                 'money', 'position', '_current_room', 'inventory', 'equipment', 'quests',
+                 'stats', 'created_at', 'last_login', '_dirty', 'dirty_sink')
+    
     def __init__(self, name: str, protocol):
-        self.name = name
+        self.name = sys.intern(name)
         self.protocol = protocol
         self.title = ""
         self.level = 1
@@ -149,8 +201,8 @@ class Player:
         self.max_ep = 100
         self.money = 0
         self.position = [0, 0]
-        self.current_room = "dock"
-        self.inventory = {}
+        self._current_room = "dock"
+        self.inventory = Inventory()
         self.equipment = {}
         self.quests = {}
         self.stats = {
@@ -162,47 +214,82 @@ class Player:
         self.created_at = time.time()
         self.last_login = time.time()
         
-    def add_item(self, item_id: str, count: int = 1):
-        """添加物品到背包"""
-        if item_id in self.inventory:
-            self.inventory[item_id] += count
+        # 脏数据跟踪：记录自上次保存以来改动过的字段
+        self._dirty: AbstractSet[str] = _CLEAN
+        self.dirty_sink: Optional[Set['Player']] = None  # PlayerManager.dirty_players
+    
+    @property
+    def current_room(self) -> str:
+        return self._current_room
+    
+    @current_room.setter
+    def current_room(self, room_id: str):
+        if room_id != self._current_room:
+            self._current_room = sys.intern(room_id)
+            self.mark_dirty('current_room')
+    
+    @property
+    def dirty(self) -> bool:
+        """是否有未保存的改动"""
+        return bool(self._dirty)
+    
+    def mark_dirty(self, field: str):
+        """标记字段已改动，并登记到管理器的待写回集合"""
+        if self._dirty:
+            self._dirty.add(field)
         else:
-            self.inventory[item_id] = count
+            self._dirty = {field}
+        if self.dirty_sink is not None:
+            self.dirty_sink.add(self)
+    
+    def clear_dirty(self) -> AbstractSet[str]:
+        """清除改动标记（保存前调用），返回改动过的字段"""
+        fields = self._dirty
+        self._dirty = _CLEAN
+        return fields
+    
+    def add_item(self, item_id: str, count: int = 1) -> bool:
+        """添加物品到背包，背包放不下时返回 False"""
+        if not self.inventory.add(item_id, count):
+            return False
+        self.mark_dirty('inventory')
         
         logger.debug(f"玩家 {self.name} 获得物品: {item_id} x{count}")
+        return True
     
     def remove_item(self, item_id: str, count: int = 1) -> bool:
         """从背包移除物品"""
-        if item_id in self.inventory and self.inventory[item_id] >= count:
-            self.inventory[item_id] -= count
-            if self.inventory[item_id] <= 0:
-                del self.inventory[item_id]
+        if self.inventory.remove(item_id, count):
+            self.mark_dirty('inventory')
             return True
         return False
     
     def has_item(self, item_id: str, count: int = 1) -> bool:
         """检查是否有指定物品"""
-        return item_id in self.inventory and self.inventory[item_id] >= count
+        return self.inventory.count(item_id) >= count
     
-    def get_inventory(self) -> Dict[str, int]:
-        """获取背包内容"""
-        return self.inventory.copy()
+    def get_inventory(self) -> Inventory:
+        """获取背包内容（只读视图，不复制）"""
+        return self.inventory
     
     def add_money(self, amount: int):
         """添加金钱"""
         self.money += amount
+        self.mark_dirty('money')
         logger.debug(f"玩家 {self.name} 获得金钱: {amount}")
     
     def remove_money(self, amount: int) -> bool:
         """移除金钱"""
         if self.money >= amount:
             self.money -= amount
+            self.mark_dirty('money')
             return True
         return False
     
     def add_exp(self, amount: int):
         """添加经验值"""
         self.exp += amount
+        self.mark_dirty('exp')
         
         # 检查升级
         required_exp = self.level * 100
@@ -219,13 +306,14 @@ class Player:
     def heal(self, amount: int):
         """治疗玩家"""
         self.hp = max(0, self.hp - amount)
+        self.mark_dirty('hp')
         if self.hp <= 0:
             logger.info(f"玩家 {self.name} 死亡")
             return True
         return False
     
     def to_dict(self) -> dict:
-        """转换为字典格式"""
+        """转换为字典格式（容器为拷贝，可以安全地交给存档线程）"""
         return {
             'name': self.name,
             'title': self.title,
@@ -236,12 +324,12 @@ class Player:
             'ep': self.ep,
             'max_ep': self.max_ep,
             'money': self.money,
-            'position': self.position,
+            'position': list(self.position),
             'current_room': self.current_room,
-            'inventory': self.inventory,
-            'equipment': self.equipment,
-            'quests': self.quests,
-            'stats': self.stats,
+            'inventory': self.inventory.to_dict(),
+            'equipment': dict(self.equipment),
+            'quests': dict(self.quests),
+            'stats': dict(self.stats),
             'created_at': self.created_at,
             'last_login': time.time()
         }
@@ -259,8 +347,8 @@ class Player:
         player.max_ep = data.get('max_ep', 100)
         player.money = data.get('money', 0)
         player.position = data.get('position', [0, 0])
-        player.current_room = data.get('current_room', 'dock')
-        player.inventory = data.get('inventory', {})
+        player._current_room = sys.intern(data.get('current_room', 'dock'))
+        player.inventory.load(data.get('inventory', {}))
         player.equipment = data.get('equipment', {})
         player.quests = data.get('quests', {})
         player.stats = data.get('stats', {'str': 10, 'agi': 10, 'int': 10, 'cha': 10})
@@ -273,7 +361,9 @@ class Player:
         # 恢复精力
         if self.ep < self.max_ep:
             self.ep = min(self.max_ep, self.ep + 1)
+            self.mark_dirty('ep')
         
         # 恢复生命值（较慢）
         if self.hp < self.max_hp and time.time() % 10 == 0:
             self.hp = min(self.max_hp, self.hp + 1)
+            self.mark_dirty('hp')
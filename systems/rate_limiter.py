@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+令牌桶限流
+每个连接一个 RateLimiter，按命令类别各有一个令牌桶；令牌在取用时按经过的时间补充，
+不需要定时清理。
+"""
+
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import config
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def allow(self, now: float, cost: float = 1.0) -> bool:
+        """有足够令牌时取走并返回 True，否则不做修改并返回 False"""
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def reserve(self, now: float, cost: float = 1.0) -> float:
+        """取走令牌（不足时预支），返回需要等待的秒数"""
+        self._refill(now)
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+class RateLimiter:
+    """一个连接的限流器
+
+    - reserve('command')：命令超出速率时返回需要等待的时间，调用方等待后再执行，
+      短时间的连续输入（粘贴多行、提前输入）只是被放慢，不会被拒绝；
+    - allow('chat')：聊天等动作在令牌不足时直接拒绝；
+    - throttled_for()：连续处于限流状态的时间，持续过长说明是刷屏，应断开连接。
+    """
+
+    __slots__ = ('limits', 'clock', 'buckets', 'throttled_since')
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = limits if limits is not None else config.RATE_LIMITS
+        self.clock = clock
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.throttled_since: Optional[float] = None
+
+    def _bucket(self, kind: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(kind)
+        if bucket is None:
+            rate, burst = self.limits[kind]
+            bucket = self.buckets[kind] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def allow(self, kind: str, cost: float = 1.0) -> bool:
+        """令牌足够时放行，否则拒绝"""
+        now = self.clock()
+        return self._bucket(kind, now).allow(now, cost)
+
+    def reserve(self, kind: str, cost: float = 1.0) -> float:
+        """预订令牌，返回需要等待的秒数（0 表示可以立即执行）"""
+        now = self.clock()
+        wait = self._bucket(kind, now).reserve(now, cost)
+        if wait > 0:
+            if self.throttled_since is None:
+                self.throttled_since = now
+        else:
+            self.throttled_since = None
+        return wait
+
+    def throttled_for(self) -> float:
+        """已经连续被限流的秒数"""
+        if self.throttled_since is None:
+            return 0.0
+        return self.clock() - self.throttled_since
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tick调度器
+按固定频率在单调时钟的截止时间点触发游戏tick，并统计漂移与超时
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class TickScheduler:
+    """固定频率的tick调度器
+
+    用 loop.call_at 在第 n 个截止时间（start + n * interval）唤醒，空闲时不轮询。
+    上一个tick结束后才安排下一个，tick之间不会重叠：
+    落后不超过 max_catchup 个tick时连续补跑，落后更多时跳到下一个对齐的截止时间。
+    """
+
+    def __init__(self, callback: Callable[[], Awaitable], rate: float, max_catchup: int = 3):
+        self.callback = callback
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.max_catchup = max_catchup
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_deadline = 0.0
+
+        # 统计信息（秒）
+        self.tick_count = 0
+        self.skipped_ticks = 0
+        self.overruns = 0
+        self.last_drift = 0.0
+        self.max_drift = 0.0
+        self.total_drift = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+
+    def start(self):
+        """开始调度（必须在事件循环中调用）"""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.running = True
+        self._next_deadline = self.loop.time() + self.interval
+        self._schedule()
+        logger.info(f"Tick调度器启动，频率 {self.rate}Hz")
+
+    def stop(self):
+        """停止调度，正在执行的tick会跑完"""
+        self.running = False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        self._handle = self.loop.call_at(self._next_deadline, self._fire)
+
+    def _fire(self):
+        """到达截止时间，启动一次tick"""
+        self._handle = None
+        if not self.running:
+            return
+
+        drift = self.loop.time() - self._next_deadline
+        self.tick_count += 1
+        self.last_drift = drift
+        self.total_drift += drift
+        if drift > self.max_drift:
+            self.max_drift = drift
+
+        self._task = self.loop.create_task(self._run_tick())
+
+    async def _run_tick(self):
+        started = self.loop.time()
+        try:
+            await self.callback()
+        except Exception as e:
+            logger.error(f"Tick执行错误: {e}")
+        finally:
+            duration = self.loop.time() - started
+            self.last_duration = duration
+            if duration > self.max_duration:
+                self.max_duration = duration
+            if duration > self.interval:
+                self.overruns += 1
+                logger.warning(f"Tick超时: {duration * 1000:.1f}ms > {self.interval * 1000:.1f}ms")
+
+            if self.running:
+                self._advance()
+
+    def _advance(self):
+        """计算下一个截止时间，落后太多时跳过错过的tick"""
+        self._next_deadline += self.interval
+        behind = self.loop.time() - self._next_deadline
+        if behind > self.max_catchup * self.interval:
+            missed = int(behind // self.interval) + 1
+            self._next_deadline += missed * self.interval
+            self.skipped_ticks += missed
+            logger.warning(f"Tick落后 {behind * 1000:.1f}ms，跳过 {missed} 个tick")
+        self._schedule()
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取调度统计信息（毫秒）"""
+        fired = self.tick_count or 1
+        return {
+            'rate': self.rate,
+            'tick_count': self.tick_count,
+            'skipped_ticks': self.skipped_ticks,
+            'overruns': self.overruns,
+            'last_drift_ms': self.last_drift * 1000,
+            'avg_drift_ms': self.total_drift / fired * 1000,
+            'max_drift_ms': self.max_drift * 1000,
+            'last_duration_ms': self.last_duration * 1000,
+            'max_duration_ms': self.max_duration * 1000
+        }
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间轮
+为整点/每日事件、自动存档、各类冷却提供 O(1) 的定时器注册与到期
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 浮点误差容限（刻度）：避免 1000.3 秒被算成 2.9999 个刻度
+_EPSILON = 1e-6
+
+class Timer:
+    """时间轮中的一个定时器"""
+
+    __slots__ = ('when', 'expires_tick', 'interval', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when: float, interval: Optional[float], callback: Callable, args: tuple):
+        self.when = when
+        self.expires_tick = 0
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """取消定时器（惰性删除，下次扫到所在槽位时丢弃）"""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """哈希时间轮
+
+    时间按 resolution 切成刻度，定时器放入 到期刻度 % 槽位数 的槽位中，
+    注册和取消都是 O(1)；每次推进只检查经过的槽位，与定时器总数无关。
+    每个定时器在到期后的第一次推进中恰好触发一次；周期定时器按计划时间
+    （而不是实际触发时间）续期，不会累积漂移。
+    """
+
+    def __init__(self, resolution: float = 0.1, slots: int = 512, clock: Callable[[], float] = time.time):
+        self.resolution = resolution
+        self.clock = clock
+        self.origin = clock()
+        self.current_tick = 0
+        self._wheel: List[List[Timer]] = [[] for _ in range(slots)]
+        self.timer_count = 0
+        self.fired_count = 0
+
+    def _tick_of(self, when: float) -> int:
+        """时间点对应的刻度（向上取整，保证不会提前触发）"""
+        ticks = (when - self.origin) / self.resolution - _EPSILON
+        tick = int(ticks)
+        return tick if tick >= ticks else tick + 1
+
+    def _insert(self, timer: Timer):
+        timer.expires_tick = max(self._tick_of(timer.when), self.current_tick + 1)
+        self._wheel[timer.expires_tick % len(self._wheel)].append(timer)
+        self.timer_count += 1
+
+    def call_at(self, when: float, callback: Callable, *args) -> Timer:
+        """在指定时间点（clock 时间）触发一次"""
+        timer = Timer(when, None, callback, args)
+        self._insert(timer)
+        return timer
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        """在 delay 秒后触发一次"""
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def call_every(self, interval: float, callback: Callable, *args, first: Optional[float] = None) -> Timer:
+        """每隔 interval 秒触发一次；first 为第一次触发的时间点，默认一个周期之后"""
+        if first is None:
+            first = self.clock() + interval
+        timer = Timer(first, interval, callback, args)
+        self._insert(timer)
+        return timer
+
+    async def advance(self, now: Optional[float] = None) -> int:
+        """推进时间轮到 now，触发所有到期的定时器，返回触发数量"""
+        if now is None:
+            now = self.clock()
+        target = int((now - self.origin) / self.resolution + _EPSILON)
+        if target <= self.current_tick:
+            return 0
+
+        due: List[Timer] = []
+        if target - self.current_tick >= len(self._wheel):
+            # 落后超过一整圈：每个槽位扫一遍即可
+            for index in range(len(self._wheel)):
+                self._collect(index, target, due)
+            due.sort(key=lambda t: t.expires_tick)
+        else:
+            for tick in range(self.current_tick + 1, target + 1):
+                self._collect(tick % len(self._wheel), tick, due)
+        self.current_tick = target
+
+        for timer in due:
+            await self._fire(timer, now)
+        return len(due)
+
+    def _collect(self, index: int, cutoff: int, due: List[Timer]):
+        """取出槽位中到期的定时器，顺带丢弃已取消的"""
+        slot = self._wheel[index]
+        if not slot:
+            return
+        pending = []
+        for timer in slot:
+            if timer.cancelled:
+                self.timer_count -= 1
+            elif timer.expires_tick <= cutoff:
+                self.timer_count -= 1
+                due.append(timer)
+            else:
+                pending.append(timer)
+        self._wheel[index] = pending
+
+    async def _fire(self, timer: Timer, now: float):
+        if timer.cancelled:
+            return
+        self.fired_count += 1
+
+        if timer.interval:
+            # 按计划时间续期；停顿太久错过多个周期时只补一次
+            timer.when += timer.interval
+            if timer.when <= now:
+                missed = int((now - timer.when) // timer.interval) + 1
+                timer.when += missed * timer.interval
+            self._insert(timer)
+
+        try:
+            result = timer.callback(*timer.args)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"定时器回调执行错误: {e}")
+
+    def __len__(self) -> int:
+        return self.timer_count
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+聊天历史测试脚本
+验证环形缓冲区的容量上限、按目标索引以及加入频道时的回放，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from protocol import GameProtocol
+from systems.chat_history import ChatHistory
+from systems.chat_manager import ChatManager, Message
+from test_outbound import FakePlayer, FakeWriter
+
+
+def test_ring_buffer():
+    """测试容量上限和按目标查询"""
+    print("测试聊天环形缓冲区...")
+    history = ChatHistory(capacity=100)
+    for i in range(250):
+        room = "plaza" if i % 2 else "harbor"
+        history.append(Message(f"p{i % 3}", str(i), "room", room))
+    history.append(Message("alice", "hi", "private", "bob"))
+    history.append(Message("bob", "yo", "private", "alice"))
+
+    # 只保留最近 100 条，索引随覆盖一起收缩
+    assert len(history) == 100
+    assert sum(len(index) for index in history.indexes.values()) == 100
+    assert [m.content for m in history.recent(3)] == ["249", "hi", "yo"]
+    assert [m.content for m in history.room("plaza", 3)] == ["245", "247", "249"]
+    assert len(history.room("harbor", 1000)) == 49
+    assert [m.content for m in history.private("bob", "alice", 10)] == ["hi", "yo"]
+    assert history.channel("#无人", 5) == []
+
+    # 某个目标的消息全部被覆盖后，索引键也被删除
+    for i in range(100):
+        history.append(Message("p", str(i), "global", "global"))
+    assert set(history.indexes) == {("global", "global")}
+    print("✓ 容量固定为 100 条，按房间/私聊查询正确")
+
+
+async def _channel_replay():
+    chat = ChatManager(None)
+    for i in range(15):
+        chat._add_to_history(Message(f"p{i}", f"消息{i}", "channel", "#港口"))
+    chat._add_to_history(Message("x", "别的频道", "channel", "#集市"))
+
+    member = FakePlayer(GameProtocol(None, FakeWriter(), None), "newbie")
+    await chat.join_channel(member, "#港口")
+    await asyncio.sleep(0)
+    output = member.protocol.writer.output()
+    assert "SYS 最近的 10 条消息:" in output
+    assert "SEEN [#港口] p5: 消息5" in output and "p14: 消息14" in output
+    assert "消息4\n" not in output and "别的频道" not in output
+    await member.protocol.close()
+
+
+def test_channel_replay():
+    """测试加入频道时回放最近的频道消息"""
+    print("测试加入频道回放...")
+    asyncio.run(_channel_replay())
+    print("✓ 加入频道收到最近 10 条频道消息")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》聊天历史测试")
+    print("=" * 40)
+
+    test_ring_buffer()
+    test_channel_replay()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
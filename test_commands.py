@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令注册表测试脚本
+直接调用 CommandHandler，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from commands import CommandHandler, compile_parser
+
+
+class FakeProtocol:
+    """记录发送内容的假连接"""
+
+    def __init__(self, authenticated=False):
+        self.authenticated = authenticated
+        self.sent = []
+
+    def is_authenticated(self):
+        return self.authenticated
+
+    async def send_message(self, msg_type, content, **kwargs):
+        self.sent.append(f"{msg_type} {content}")
+
+
+def test_parser():
+    """测试参数格式编译出的解析器"""
+    print("测试参数解析...")
+    parse = compile_parser('<玩家名> <内容...>')
+    assert parse("bob  你好   世界") == ["bob", "你好   世界"]
+    assert parse("bob") is None
+
+    parse = compile_parser('<方向>')
+    assert parse(" n  extra") == ["n", "extra"]
+    assert parse("") is None
+
+    assert compile_parser('[主题]')("") == []
+    print("✓ 必填、可选、剩余文本参数解析正确")
+
+
+def test_dispatch():
+    """测试登录检查、用法提示、别名和引号简写"""
+    print("测试命令分发...")
+    handler = CommandHandler(None)
+    calls = []
+
+    async def record(protocol, args):
+        calls.append(args)
+
+    # 别名指向同一个处理函数并预先填入参数
+    go = handler.commands['GO']
+    assert handler.commands['N'].handler == go.handler
+    assert handler.commands['N'].parse("") == ["N"]
+
+    for name in ('GO', 'N', 'SAY', 'HELP'):
+        handler.commands[name].handler = record
+
+    async def run():
+        guest = FakeProtocol()
+        await handler.handle_command(guest, "LOOK")
+        await handler.handle_command(guest, "FOO")
+        await handler.handle_command(guest, "help")
+        assert guest.sent == ["ERR 请先登录", "ERR 未知命令: FOO"]
+
+        player = FakeProtocol(authenticated=True)
+        await handler.handle_command(player, "SAY")
+        await handler.handle_command(player, "n")
+        await handler.handle_command(player, "go s")
+        await handler.handle_command(player, '"大家 好"')
+        assert player.sent == ["ERR 用法: SAY <内容>"]
+
+    asyncio.run(run())
+    assert calls == [[], ["N"], ["s"], ["大家 好"]]
+    assert handler.commands['TELL'].usage == "用法: TELL <玩家名> <内容>"
+    print("✓ 登录检查、用法提示、别名、引号简写正确")
+
+
+def test_relogin():
+    """测试已登录的连接不能再次登录"""
+    print("测试重复登录...")
+    handler = CommandHandler(None)
+    player = FakeProtocol(authenticated=True)
+    player.get_player = lambda: type('Player', (), {'name': 'alice'})()
+    asyncio.run(handler.handle_command(player, "LOGIN bob"))
+    assert player.sent == ["ERR 你已经以 alice 登录"]
+    print("✓ 重复登录被拒绝，不会创建第二个玩家")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》命令注册表测试")
+    print("=" * 40)
+
+    test_parser()
+    test_dispatch()
+    test_relogin()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
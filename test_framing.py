@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入分帧测试脚本
+使用内存中的数据流验证分帧和命令流水线，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from framing import LineFramer, IAC, DO, WILL, WONT, DONT, SB, SE
+from protocol import GameProtocol
+
+
+class FakeTransport:
+    def abort(self):
+        pass
+
+    def get_write_buffer_size(self):
+        return 0
+
+
+class FakeWriter:
+    """记录所有输出的假 StreamWriter"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.transport = FakeTransport()
+
+    def get_extra_info(self, name, default=None):
+        return ('127.0.0.1', 12345) if name == 'peername' else default
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class RecordingHandler:
+    """只记录收到的命令"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_command(self, protocol, message):
+        self.messages.append(message)
+        await asyncio.sleep(0)
+
+
+class FakeServer:
+    def __init__(self):
+        self.command_handler = RecordingHandler()
+
+
+def test_split_lines():
+    """测试跨数据块的行、CRLF 和超长行"""
+    print("测试分帧...")
+    framer = LineFramer(max_length=10)
+    assert framer.feed(b"LOOK\r\nGO ") == [b"LOOK"]
+    assert framer.feed(b"N\nSA") == [b"GO N"]
+    assert framer.feed(b"Y hi\n") == [b"SAY hi"]
+
+    # 超长行整行丢弃，缓冲区不继续增长
+    assert framer.feed(b"x" * 50) == []
+    assert len(framer.buffer) == 0
+    assert framer.feed(b"yyy\nWHO\n") == [None, b"WHO"]
+    assert framer.feed(b"0123456789AB\nok\n") == [None, b"ok"]
+
+    assert framer.feed(b"QUIT") == []
+    assert framer.flush() == b"QUIT"
+    print("✓ 跨块拼接、CRLF、超长丢弃正确")
+
+
+def test_telnet_iac():
+    """测试过滤 telnet 协商并拒绝选项"""
+    print("测试 telnet 协商...")
+    framer = LineFramer(max_length=100)
+    data = bytes([IAC, DO, 1, IAC, WILL, 31]) + b"LO" + bytes([IAC, SB, 31, 0, 80, IAC])
+    assert framer.feed(data) == []
+    assert framer.feed(bytes([SE]) + b"OK\n") == [b"LOOK"]
+    assert bytes(framer.replies) == bytes([IAC, WONT, 1, IAC, DONT, 31])
+
+    # 同一个选项不重复回复；IAC IAC 是数据中的 0xFF
+    framer.replies.clear()
+    assert framer.feed(bytes([IAC, DO, 1, IAC, IAC]) + b"\n") == [bytes([IAC])]
+    assert not framer.replies
+    print("✓ 协商字节被过滤，选项请求被拒绝一次")
+
+
+async def _pipeline():
+    reader = asyncio.StreamReader()
+    writer = FakeWriter()
+    server = FakeServer()
+    protocol = GameProtocol(reader, writer, server)
+
+    # 一次到达的多行按顺序执行，超长行回复错误，非法 UTF-8 被替换
+    too_long = "长" * (config.MAX_MESSAGE_LENGTH + 1)
+    reader.feed_data(("\n".join(f"SAY {i}" for i in range(50)) + "\n").encode('utf-8'))
+    reader.feed_data(f"SAY {too_long}\n".encode('utf-8') + b"SAY \xc3(\n")
+    reader.feed_eof()
+    await protocol.handle_communication()
+
+    messages = server.command_handler.messages
+    assert messages[:50] == [f"SAY {i}" for i in range(50)]
+    assert messages[50] == "SAY \ufffd("
+    assert protocol.lines_too_long == 1
+    assert "消息过长".encode('utf-8') in writer.data
+
+
+def test_pipeline():
+    """测试命令队列按顺序执行流水线输入"""
+    print("测试命令流水线...")
+    original = config.RATE_LIMITS
+    config.RATE_LIMITS = {'command': (1000, 100), 'chat': (1, 3)}
+    try:
+        asyncio.run(_pipeline())
+    finally:
+        config.RATE_LIMITS = original
+    print("✓ 50 条流水线命令按顺序执行，超长行被拒绝")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》输入分帧测试")
+    print("=" * 40)
+
+    test_split_lines()
+    test_telnet_iac()
+    test_pipeline()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
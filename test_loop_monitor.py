@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环卡顿监视测试脚本
+在事件循环中故意同步阻塞，验证卡顿记录的调用栈、归因和 LAG 管理命令，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from commands import CommandHandler
+from systems.loop_monitor import LoopMonitor
+from test_commands import FakeProtocol
+
+
+def _blocking_save():
+    """模拟在事件循环里同步写文件"""
+    time.sleep(0.3)
+
+
+async def _stall():
+    monitor = LoopMonitor(interval=0.02, threshold=0.05, history=5)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        previous = monitor.begin('命令', 'SAVE')
+        _blocking_save()
+        monitor.end(previous)
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+    return monitor
+
+
+def test_stall():
+    """测试卡顿时采到阻塞代码的调用栈和正在执行的命令"""
+    print("测试卡顿采样...")
+    monitor = asyncio.run(_stall())
+    assert monitor.stall_count == 1, monitor.report()
+    stall = monitor.stalls[0]
+    assert stall['activity'] == ('命令', 'SAVE')
+    assert stall['stack'][-1].endswith('_blocking_save')
+    assert not stall['ongoing'] and 0.25 <= stall['lag'] < 1.0
+    assert monitor.lag.count > 5 and monitor.lag.max >= 0.25
+    report = monitor.report()
+    assert report[2].startswith("#1 ") and "命令 SAVE" in report[2]
+    print(f"✓ 卡顿 {stall['lag'] * 1000:.0f}ms 归因到命令 SAVE，栈顶为阻塞函数")
+
+
+class AdminProtocol(FakeProtocol):
+    def __init__(self, name):
+        super().__init__(authenticated=True)
+        self.player = type('Player', (), {'name': name})()
+
+    def get_player(self):
+        return self.player
+
+    def queue_bytes(self, data):
+        self.sent.append(data.decode('utf-8'))
+
+
+def test_lag_command():
+    """测试 LAG 命令只对管理员开放，命令结束后不留下标记"""
+    print("测试 LAG 管理命令...")
+    server = type('Server', (), {'loop_monitor': LoopMonitor(threshold=0.1)})()
+    server.loop_monitor._add_stall(time.time(), 0.5, ('tick', 'world'), ["world.py:10 tick", "yaml.py:20 load"])
+    handler = CommandHandler(server)
+
+    async def run():
+        guest = AdminProtocol('bob')
+        await handler.handle_command(guest, "LAG")
+        assert guest.sent == ["ERR 未知命令: LAG"]
+
+        admin = AdminProtocol('root')
+        config.ADMIN_PLAYERS.add('root')
+        try:
+            await handler.handle_command(admin, "LAG")
+            await handler.handle_command(admin, "LAG #1")
+            await handler.handle_command(admin, "LAG 9")
+        finally:
+            config.ADMIN_PLAYERS.discard('root')
+        report, stack, missing = admin.sent
+        assert "共 1 次" in report and "#1 " in report and "tick world" in report and "yaml.py:20 load" in report
+        assert stack.startswith("SYS 卡顿 #1") and "SYS   world.py:10 tick" in stack
+        assert missing == "ERR 没有卡顿记录 9"
+        assert not server.loop_monitor.activities
+
+    asyncio.run(run())
+    print("✓ 非管理员看不到命令，管理员可以查看报告和调用栈")
+
+
+def test_interleaved_activities():
+    """测试标记按任务保存：A 开始、B 开始、A 结束、B 结束时各自读到自己的标记"""
+    print("测试交错执行的命令标记...")
+    monitor = LoopMonitor()
+    server = type('Server', (), {'loop_monitor': monitor})()
+    handler = CommandHandler(server)
+    seen = {}
+
+    async def run():
+        monitor.loop = asyncio.get_running_loop()
+        b_started, a_finished = asyncio.Event(), asyncio.Event()
+
+        async def command_a(protocol, args):
+            await b_started.wait()
+            seen['A'] = monitor.current_activity()
+
+        async def command_b(protocol, args):
+            b_started.set()
+            await a_finished.wait()
+            seen['B'] = monitor.current_activity()
+
+        handler.commands['LOOK'].handler = command_a
+        handler.commands['WHO'].handler = command_b
+        player = FakeProtocol(authenticated=True)
+        task_a = asyncio.ensure_future(handler.handle_command(player, "LOOK"))
+        task_b = asyncio.ensure_future(handler.handle_command(player, "WHO"))
+        await task_a
+        assert list(monitor.activities.values()) == [('命令', 'WHO')]
+        a_finished.set()
+        await task_b
+        assert monitor.current_activity() is None and not monitor.activities
+
+    asyncio.run(run())
+    assert seen == {'A': ('命令', 'LOOK'), 'B': ('命令', 'WHO')}
+    print("✓ A 先结束后 B 仍标记为自己的命令，全部结束后没有残留")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》事件循环卡顿监视测试")
+    print("=" * 40)
+
+    test_stall()
+    test_lag_command()
+    test_interleaved_activities()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标测试脚本
+验证耗时直方图的精度、按命令统计耗时以及广播计数，不需要启动服务器
+"""
+
+import asyncio
+import random
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import protocol as protocol_module
+from commands import CommandHandler
+from protocol import GameProtocol, fanout
+from systems.metrics import BUCKET_COUNT, Histogram, Metrics, bucket_index, bucket_upper
+from systems.metrics_exporter import MetricsExporter
+from systems.tick_scheduler import TickScheduler
+from test_commands import FakeProtocol
+from test_outbound import FakePlayer, FakeWriter
+
+
+class FakeServer:
+    def __init__(self):
+        self.metrics = Metrics()
+
+
+def test_histogram():
+    """测试桶的边界和分位数的相对误差"""
+    print("测试耗时直方图...")
+    # 每个值都落在上界不小于它的桶里，桶按值单调递增
+    rng = random.Random(1)
+    previous = 0
+    for value in list(range(5000)) + [rng.randrange(1 << 35) for _ in range(2000)]:
+        index = bucket_index(value)
+        assert value <= bucket_upper(index)
+        assert index == 0 or value > bucket_upper(index - 1)
+    for value in sorted(rng.randrange(1 << 30) for _ in range(2000)):
+        assert bucket_index(value) >= previous
+        previous = bucket_index(value)
+    assert bucket_index(1 << 40) == BUCKET_COUNT - 1
+
+    histogram = Histogram()
+    samples = sorted(rng.uniform(0.0001, 0.5) for _ in range(10000))
+    for seconds in samples:
+        histogram.record(seconds)
+    for q in (50, 95, 99):
+        exact = samples[int(len(samples) * q / 100) - 1]
+        assert abs(histogram.percentile(q) - exact) / exact < 0.13, (q, exact)
+    assert histogram.percentile(100) == max(samples)
+    print("✓ 分位数相对误差小于 1/8")
+
+
+def test_command_metrics():
+    """测试 handle_command 按命令名记录耗时，别名计入原命令"""
+    print("测试命令耗时统计...")
+    server = FakeServer()
+    handler = CommandHandler(server)
+
+    async def slow(protocol, args):
+        await asyncio.sleep(0.01)
+
+    async def fail(protocol, args):
+        raise RuntimeError("boom")
+
+    handler.commands['GO'].handler = slow
+    handler.commands['N'].handler = slow
+    handler.commands['WHO'].handler = fail
+
+    async def run():
+        player = FakeProtocol(authenticated=True)
+        await handler.handle_command(player, "GO N")
+        await handler.handle_command(player, "n")
+        await handler.handle_command(player, "WHO")
+        await handler.handle_command(player, "FOO")
+
+    asyncio.run(run())
+    commands = server.metrics.commands
+    assert set(commands) == {'GO', 'WHO'}
+    assert commands['GO'].count == 2 and commands['GO'].percentile(50) >= 0.009
+    assert commands['WHO'].count == 1
+    assert server.metrics.top_commands(1)[0][0] == 'GO'
+    assert any(line.startswith("GO") for line in server.metrics.report())
+    print("✓ 每个命令的耗时都被记录，出错的命令也计入")
+
+
+async def _broadcast_counters():
+    members = [FakePlayer(GameProtocol(None, FakeWriter(), None), f"p{i}") for i in range(5)]
+    before = dict(protocol_module.wire_stats)
+    assert fanout(members, b"SEEN hi\n", exclude=members[0]) == 4
+    stats = protocol_module.wire_stats
+    assert stats['broadcasts'] - before['broadcasts'] == 1
+    assert stats['broadcast_deliveries'] - before['broadcast_deliveries'] == 4
+    for member in members:
+        await member.protocol.close()
+
+
+def test_broadcast_counters():
+    """测试广播次数和接收者数量计数"""
+    print("测试广播计数...")
+    asyncio.run(_broadcast_counters())
+    print("✓ 一次广播计数 1 次、4 个接收者")
+
+
+class FakeRoom:
+    def __init__(self, players):
+        self.players = set(players)
+
+
+async def _exporter():
+    server = FakeServer()
+    server.stats = {'total_connections': 7, 'active_connections': 3, 'peak_players': 5}
+    server.players = type('Players', (), {'online_players': {'alice': 1, 'bob': 2}})()
+    server.world = type('World', (), {'rooms': {'dock': FakeRoom(['alice', 'bob']), 'market': FakeRoom([]),
+                                                'ali"ce': FakeRoom(['x'])}})()
+    server.scheduler = TickScheduler(None, 10)
+    server.metrics.record_command('LOOK', 0.0002)
+    server.metrics.record_command('LOOK', 0.03)
+    server.metrics.record_phase('world', 0.001)
+
+    exporter = MetricsExporter(server, host='127.0.0.1', port=0)
+    await exporter.start()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', exporter.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = (await reader.read()).decode('utf-8')
+        writer.close()
+
+        head, body = response.split("\r\n\r\n", 1)
+        assert head.startswith("HTTP/1.1 200") and "version=0.0.4" in head
+        lines = body.splitlines()
+        assert "teletype_connections 3" in lines and "teletype_players_online 2" in lines
+        assert 'teletype_room_players{room="dock"} 2' in lines
+        assert 'teletype_room_players{room="ali\\"ce"} 1' in lines
+        assert not any('room="market"' in line for line in lines)
+        assert 'teletype_command_calls_total{command="LOOK"} 2' in lines
+        assert 'teletype_command_duration_seconds_bucket{command="LOOK",le="0.00025"} 1' in lines
+        assert 'teletype_command_duration_seconds_bucket{command="LOOK",le="0.05"} 2' in lines
+        assert 'teletype_command_duration_seconds_count{command="LOOK"} 2' in lines
+        assert 'teletype_tick_phase_duration_seconds_count{phase="world"} 1' in lines
+        # 每个指标族只有一组 HELP/TYPE
+        types = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+        assert len(types) == len(set(types))
+
+        reader, writer = await asyncio.open_connection('127.0.0.1', exporter.port)
+        writer.write(b"GET /nope HTTP/1.1\r\n\r\n")
+        assert (await reader.read()).startswith(b"HTTP/1.1 404")
+        writer.close()
+        assert exporter.scrapes == 1
+    finally:
+        await exporter.stop()
+
+
+def test_exporter():
+    """测试 Prometheus 端点的输出格式"""
+    print("测试指标端点...")
+    asyncio.run(_exporter())
+    print("✓ /metrics 输出连接、房间人数、命令耗时分布")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》运行指标测试")
+    print("=" * 40)
+
+    test_histogram()
+    test_command_metrics()
+    test_broadcast_counters()
+    test_exporter()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送队列测试脚本
+使用内存中的假连接验证同帧合并，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import protocol as protocol_module
+from protocol import GameProtocol, fanout
+from systems.chat_manager import ChatManager
+
+
+class FakeTransport:
+    """模拟传输层"""
+
+    def __init__(self):
+        self.aborted = False
+        self.buffered = 0  # 模拟内核/传输层中尚未发出的字节
+
+    def abort(self):
+        self.aborted = True
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+
+class FakeWriter:
+    """记录所有 write() 调用的假 StreamWriter"""
+
+    def __init__(self):
+        self.writes = []
+        self.drains = 0
+        self.closed = False
+        self.transport = FakeTransport()
+
+    def get_extra_info(self, name, default=None):
+        return ('127.0.0.1', 12345) if name == 'peername' else default
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+    async def drain(self):
+        self.drains += 1
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+    def output(self) -> str:
+        return b"".join(self.writes).decode('utf-8')
+
+
+async def _coalescing():
+    writer = FakeWriter()
+    protocol = GameProtocol(None, writer, None)
+
+    for i in range(20):
+        await protocol.send_message("SYS", f"第{i}行")
+
+    # 让发送协程运行一轮
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert len(writer.writes) == 1, writer.writes
+    assert writer.drains == 1
+    lines = writer.output().splitlines()
+    assert lines == [f"SYS 第{i}行" for i in range(20)]
+
+    await protocol.close()
+    return writer
+
+
+async def _flush_on_close():
+    writer = FakeWriter()
+    protocol = GameProtocol(None, writer, None)
+
+    await protocol.send_message("SYS", "再见")
+    await protocol.close()
+
+    assert writer.output() == "SYS 再见\n"
+    assert writer.closed
+
+    # 关闭后不再接受新消息
+    await protocol.send_message("SYS", "丢弃")
+    assert writer.output() == "SYS 再见\n"
+
+
+class FakePlayer:
+    """只包含 protocol 等必要属性的假玩家"""
+
+    def __init__(self, protocol, name="", current_room="dock"):
+        self.protocol = protocol
+        self.name = name
+        self.current_room = current_room
+
+
+async def _fanout_backpressure():
+    fast = GameProtocol(None, FakeWriter(), None)
+    slow = GameProtocol(None, FakeWriter(), None)
+    dead = GameProtocol(None, FakeWriter(), None)
+    sender = GameProtocol(None, FakeWriter(), None)
+
+    slow.writer.transport.buffered = config.OUTBOUND_HIGH_WATER
+    dead.writer.transport.buffered = config.OUTBOUND_DISCONNECT_LIMIT
+
+    players = [FakePlayer(p) for p in (fast, slow, dead, sender)]
+    delivered = fanout(players, "SEEN 海风: 你好\n".encode('utf-8'), exclude=players[3])
+
+    assert delivered == 1
+    assert fast.lines_queued == 1
+    assert slow.lines_dropped == 1 and not slow.writer.transport.aborted
+    assert dead.writer.transport.aborted and dead.closing
+    assert sender.lines_queued == 0
+
+    await asyncio.sleep(0)
+    assert fast.writer.output() == "SEEN 海风: 你好\n"
+
+    for protocol in (fast, slow, dead, sender):
+        await protocol.close()
+
+
+async def _encode_once():
+    members = [FakePlayer(GameProtocol(None, FakeWriter(), None), f"p{i}")
+               for i in range(config.MAX_PLAYERS)]
+    chat = ChatManager(None)
+    for member in members:
+        await chat.join_channel(member, "#港口")
+    await asyncio.sleep(0)
+
+    before = dict(protocol_module.wire_stats)
+    assert await chat.send_channel_message(members[0], "#港口", "开船了")
+    await asyncio.sleep(0)
+
+    line = "SEEN [#港口] p0: 开船了\n".encode('utf-8')
+    encoded = protocol_module.wire_stats['bytes_encoded'] - before['bytes_encoded']
+    sent = protocol_module.wire_stats['bytes_sent'] - before['bytes_sent']
+    assert encoded == len(line), encoded
+    assert sent == len(line) * (len(members) - 1), sent
+    assert members[1].protocol.writer.writes[-1] == line
+
+    for member in members:
+        await member.protocol.close()
+
+
+def test_coalescing():
+    """测试同一轮事件循环内的消息合并为一次写入"""
+    print("测试同帧合并...")
+    asyncio.run(_coalescing())
+    print("✓ 20 条消息合并为 1 次 write()")
+
+
+def test_flush_on_close():
+    """测试关闭连接前发送剩余消息"""
+    print("测试关闭时发送剩余消息...")
+    asyncio.run(_flush_on_close())
+    print("✓ 关闭前剩余消息已发送")
+
+
+def test_fanout_backpressure():
+    """测试广播不等待慢客户端，积压过多时丢弃或断开"""
+    print("测试广播背压...")
+    asyncio.run(_fanout_backpressure())
+    print("✓ 慢客户端丢弃消息，严重积压的客户端被断开")
+
+
+def test_encode_once():
+    """测试频道广播只编码一次"""
+    print("测试广播只编码一次...")
+    asyncio.run(_encode_once())
+    print(f"✓ {config.MAX_PLAYERS} 人频道消息只编码 1 次")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》发送队列测试")
+    print("=" * 40)
+
+    test_coalescing()
+    test_flush_on_close()
+    test_fanout_backpressure()
+    test_encode_once()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存档系统测试脚本
+在临时目录中测试玩家存档，不需要启动服务器
+"""
+
+import asyncio
+import json
+import sys
+import os
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from persist.async_storage import AsyncStorageManager
+from persist.event_log import EventLog, EventRecorder
+from persist.player_store import PlayerStore
+from persist.storage import StorageManager
+from persist.migrate_players import migrate
+from systems.player_manager import PlayerManager, Player
+
+
+async def _player_roundtrip(db_file):
+    manager = PlayerManager(db_file=db_file)
+    try:
+        players = []
+        for i in range(50):
+            player = Player(f"旅人{i}", None)
+            player.add_money(i)
+            player.add_item("paper_tape", 2)
+            manager.online_players[player.name] = player
+            players.append(player)
+
+        await manager.save_all_players()
+        assert manager.store.count() == 50
+
+        players[7].add_money(100)
+        await manager.save_player(players[7])
+
+        loaded = await manager.load_player("旅人7")
+        assert loaded.money == 107
+        assert loaded.inventory == {"paper_tape": 2}
+        assert await manager.load_player("不存在") is None
+    finally:
+        manager.close()
+
+
+async def _write_behind(db_file):
+    manager = PlayerManager(db_file=db_file)
+    try:
+        players = []
+        for i in range(100):
+            player = await manager.create_player(f"p{i}", None)
+            players.append(player)
+        assert len(manager.dirty_players) == 100
+        assert await manager.flush_dirty() == 100
+
+        # 没有改动时不写入
+        assert await manager.flush_dirty() == 0
+
+        # 同一玩家多次改动合并为一次写入，只写有改动的玩家
+        for _ in range(5):
+            players[3].add_money(1)
+        players[42].current_room = "market"
+        players[42].current_room = "market"
+        assert await manager.flush_dirty() == 2
+        assert not players[3].dirty
+
+        loaded = await manager.load_player("p42")
+        assert loaded.current_room == "market"
+        assert (await manager.load_player("p3")).money == 5
+    finally:
+        manager.close()
+
+
+async def _async_storage(tmp):
+    storage = StorageManager()
+    storage.data_dir = os.path.join(tmp, "data")
+    storage.backup_dir = os.path.join(tmp, "backups")
+    storage.ensure_directories()
+    async_storage = AsyncStorageManager(storage, max_workers=2)
+    try:
+        # 同一文件的 20 次保存按顺序执行，最后一次生效
+        results = await asyncio.gather(*[
+            async_storage.save_data("world_state.json", {"version": i}) for i in range(20)
+        ])
+        assert all(results)
+        assert await async_storage.load_data("world_state.json") == {"version": 19}
+
+        # 原子写入不留下临时文件
+        assert os.listdir(storage.data_dir) == ["world_state.json"]
+
+        await async_storage.cleanup_old_backups(max_backups=3)
+        assert len(os.listdir(storage.backup_dir)) <= 3
+    finally:
+        async_storage.close()
+
+
+async def _event_log(directory):
+    log = EventLog(directory, segment_size=4096, max_segments=100, index_interval=512)
+    recorder = EventRecorder(log)
+    await recorder.open()
+
+    # 每个 tick 的事件一批写入，时间戳单调
+    for tick in range(50):
+        for i in range(10):
+            recorder.record("room", f"p{i}", "plaza", f"第{tick}轮 消息{i}")
+        await recorder.flush()
+    assert log.stats['batches'] == 50 and log.stats['records_written'] == 500
+    assert len(log.segments) > 5 and log.segments[1].times
+
+    # 按发送者查询时不匹配的记录不解析正文
+    records = await recorder.query(sender="p3", limit=1000)
+    assert len(records) == 50 and records[0]['content'] == "第0轮 消息3"
+
+    # 按时间范围查询从稀疏索引定位，只扫描附近的记录
+    middle = log.segments[3]
+    start = middle.times[-1]
+    end = log.segments[4].last_ts
+    log.stats['records_scanned'] = 0
+    records = await recorder.query(start, end, limit=1000)
+    assert records and all(start <= r['time'] <= end for r in records)
+    assert log.stats['records_scanned'] < len(records) + 40
+    await recorder.close()
+
+    # 末尾写坏的记录在重新打开时被截断，之前的数据不受影响
+    last = log.segments[-1].path
+    with open(last, 'ab') as f:
+        f.write(b"\x10\x00\x00")
+    reopened = EventLog(directory, segment_size=4096, max_segments=100, index_interval=512)
+    reopened.open()
+    assert len(reopened.query(limit=1000)) == 500
+    reopened.append_many([(time.time(), "login", "p0", "dock", "")])
+    assert reopened.query(kind="login")[0]['sender'] == "p0"
+    reopened.close()
+
+    # 超出分段数量上限时删除最旧的分段
+    small = EventLog(directory, segment_size=4096, max_segments=3)
+    small.open()
+    for _ in range(10):
+        small.append_many([(time.time(), "global", "p", "global", "x" * 2000)] * 3)
+    assert len(os.listdir(directory)) == 3
+    small.close()
+
+
+class FailingFile:
+    """写入一半后报磁盘已满的文件"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        self.f.write(data[:len(data) // 2])
+        self.f.flush()
+        raise OSError(28, "No space left on device")
+
+    def close(self):
+        self.f.close()
+
+
+async def _event_log_failure(directory):
+    log = EventLog(directory, segment_size=1 << 20, index_interval=1)
+    recorder = EventRecorder(log, max_pending=15)
+    await recorder.open()
+    recorder.record("room", "p0", "plaza", "写入前")
+    await recorder.flush()
+    segment = log.segments[-1]
+    size, indexed = segment.size, len(segment.offsets)
+
+    # 写入失败：截掉写了一半的数据，索引不记录没有写成的记录，事件留在缓冲区
+    log._file = FailingFile(log._file)
+    for i in range(10):
+        recorder.record("room", "p1", "plaza", f"失败{i}")
+    assert await recorder.flush() == 0
+    assert os.path.getsize(segment.path) == segment.size == size
+    assert len(segment.offsets) == indexed and len(recorder.pending) == 10
+
+    # 持续失败时缓冲区不超过上限，丢弃最早的事件
+    log._file = FailingFile(log._file)
+    for i in range(10):
+        recorder.record("room", "p2", "plaza", f"再失败{i}")
+    await recorder.flush()
+    assert len(recorder.pending) == 15 and recorder.dropped == 5
+
+    # 磁盘恢复后重试，之前的记录和新记录都能正确读出
+    assert await recorder.flush() == 15
+    records = await recorder.query(limit=100)
+    assert [r['content'] for r in records] == ["写入前"] + [f"失败{i}" for i in range(5, 10)] + \
+        [f"再失败{i}" for i in range(10)]
+    await recorder.close()
+
+
+async def _event_log_unavailable(path):
+    # 日志目录无法创建时 open 抛出 OSError，停用后记录被忽略，关闭不报错
+    recorder = EventRecorder(EventLog(os.path.join(path, "events")))
+    try:
+        await recorder.open()
+        assert False, "目录无法创建时应抛出 OSError"
+    except OSError:
+        recorder.disable()
+    recorder.record("room", "p0", "plaza", "不会写入")
+    recorder.request_flush()
+    assert not recorder.pending
+    await recorder.close()
+
+
+def test_player_roundtrip():
+    """测试玩家批量保存、单个保存和加载"""
+    print("测试 SQLite 玩家存档...")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_player_roundtrip(os.path.join(tmp, "game.db")))
+    print("✓ 批量保存、单个保存、加载正确")
+
+
+def test_write_behind():
+    """测试只写回有改动的玩家"""
+    print("测试脏数据写回...")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_write_behind(os.path.join(tmp, "game.db")))
+    print("✓ 100 个在线玩家中只写回 2 个有改动的")
+
+
+def test_async_storage():
+    """测试异步存储按文件串行并原子写入"""
+    print("测试异步存储...")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_async_storage(tmp))
+    print("✓ 同一文件的保存按顺序执行，没有残留临时文件")
+
+
+def test_event_log():
+    """测试事件日志的批量写入、分段轮换、按时间和发送者查询"""
+    print("测试事件日志...")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_event_log(os.path.join(tmp, "events")))
+    print("✓ 分段轮换、稀疏索引定位、截断损坏的末尾正确")
+
+
+def test_event_log_write_failure():
+    """测试事件日志写入失败时截掉残缺数据、限制缓冲区，无法打开时可以停用"""
+    print("测试事件日志写入失败...")
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_event_log_failure(os.path.join(tmp, "events")))
+        blocker = os.path.join(tmp, "not_a_dir")
+        open(blocker, 'w').close()
+        asyncio.run(_event_log_unavailable(blocker))
+    print("✓ 写入失败后文件和索引保持一致，缓冲区不超过上限，无法打开时停用记录")
+
+
+def test_migration():
+    """测试从 players.json 迁移"""
+    print("测试 JSON 存档迁移...")
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, "players.json")
+        db_file = os.path.join(tmp, "game.db")
+        legacy = {
+            "海风": Player("海风", None).to_dict(),
+            "灯塔": Player("灯塔", None).to_dict()
+        }
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, ensure_ascii=False)
+
+        assert migrate(json_file, db_file) == 2
+
+        store = PlayerStore(db_file)
+        try:
+            assert store.names() == sorted(legacy)
+            assert store.load("海风")["current_room"] == "dock"
+        finally:
+            store.close()
+    print("✓ 旧存档已全部导入")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》存档系统测试")
+    print("=" * 40)
+
+    test_player_roundtrip()
+    test_write_behind()
+    test_async_storage()
+    test_event_log()
+    test_event_log_write_failure()
+    test_migration()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
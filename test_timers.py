@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时系统测试脚本
+测试tick调度器，不需要启动服务器
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from systems.tick_scheduler import TickScheduler
+from systems.timer_wheel import TimerWheel
+from systems.rate_limiter import RateLimiter
+
+
+async def _fixed_rate():
+    ticks = []
+
+    async def on_tick():
+        ticks.append(time.monotonic())
+
+    scheduler = TickScheduler(on_tick, rate=50)
+    scheduler.start()
+    await asyncio.sleep(0.5)
+    scheduler.stop()
+
+    # 50Hz 运行 0.5 秒大约 25 个tick，允许少量调度误差
+    assert 20 <= len(ticks) <= 26, len(ticks)
+    assert scheduler.overruns == 0
+    assert scheduler.skipped_ticks == 0
+    return scheduler.get_stats()
+
+
+async def _overrun_skips():
+    async def slow_tick():
+        time.sleep(0.12)  # 故意阻塞事件循环，超过 max_catchup 个tick
+
+    scheduler = TickScheduler(slow_tick, rate=50, max_catchup=2)
+    scheduler.start()
+    await asyncio.sleep(0.3)
+    scheduler.stop()
+    await asyncio.sleep(0.15)
+
+    assert scheduler.overruns >= 1
+    assert scheduler.skipped_ticks >= 1
+    assert scheduler.tick_count < 10
+
+
+class FakeClock:
+    """可手动拨动的时钟"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def _timer_wheel():
+    clock = FakeClock()
+    wheel = TimerWheel(resolution=0.1, slots=64, clock=clock)
+    fired = []
+
+    async def hourly():
+        fired.append(('hourly', clock.now))
+
+    wheel.call_every(3600, hourly, first=3600.0)
+    once = wheel.call_later(0.25, lambda: fired.append(('once', clock.now)))
+    cancelled = wheel.call_later(0.25, lambda: fired.append(('cancelled', clock.now)))
+    cancelled.cancel()
+
+    # 0.2 秒时尚未到期
+    clock.now = 1000.2
+    assert await wheel.advance() == 0
+
+    # 多次推进只触发一次
+    clock.now = 1000.3
+    assert await wheel.advance() == 1
+    clock.now = 1000.35
+    assert await wheel.advance() == 0
+    assert fired == [('once', 1000.3)]
+
+    # 逐tick推进到整点附近：整点事件恰好触发一次
+    fired.clear()
+    while clock.now < 3600.5:
+        clock.now = round(clock.now + 0.1, 1)
+        await wheel.advance()
+    assert fired == [('hourly', 3600.0)], fired
+
+    # 停顿超过一整圈后追上：下一个整点照常触发一次
+    clock.now = 7200.05
+    await wheel.advance()
+    clock.now = 7300.0
+    await wheel.advance()
+    assert [name for name, _ in fired] == ['hourly', 'hourly']
+    assert len(wheel) == 1
+
+
+def test_timer_wheel():
+    """测试时间轮一次性/周期定时器恰好触发一次"""
+    print("测试时间轮...")
+    asyncio.run(_timer_wheel())
+    print("✓ 到期触发一次，取消的不触发，周期定时器不重复")
+
+
+def test_fixed_rate():
+    """测试调度器按固定频率触发"""
+    print("测试固定频率调度...")
+    stats = asyncio.run(_fixed_rate())
+    print(f"✓ {stats['tick_count']} 个tick，平均漂移 {stats['avg_drift_ms']:.2f}ms")
+
+
+def test_overrun_skips():
+    """测试tick超时后跳过错过的tick而不是堆积"""
+    print("测试tick超时跳过...")
+    asyncio.run(_overrun_skips())
+    print("✓ 超时tick被计数，落后的tick被跳过")
+
+
+def test_rate_limiter():
+    """测试令牌桶：连续输入排队、聊天拒绝、持续刷屏计时"""
+    print("测试令牌桶限流...")
+    clock = FakeClock()
+    limiter = RateLimiter({'command': (10, 20), 'chat': (1, 3)}, clock=clock)
+
+    # 20 条以内立即执行，之后按每秒 10 条排队
+    assert all(limiter.reserve('command') == 0 for _ in range(20))
+    assert abs(limiter.reserve('command') - 0.1) < 1e-9
+    assert limiter.throttled_for() == 0
+    clock.now += 0.1
+    assert limiter.reserve('command') > 0
+    assert abs(limiter.throttled_for() - 0.1) < 1e-9
+
+    # 空闲后令牌恢复，限流状态解除
+    clock.now += 5
+    assert limiter.reserve('command') == 0
+    assert limiter.throttled_for() == 0
+
+    # 聊天：连续 3 条后拒绝，1 秒后恢复 1 条
+    assert [limiter.allow('chat') for _ in range(4)] == [True, True, True, False]
+    clock.now += 1
+    assert limiter.allow('chat') and not limiter.allow('chat')
+    print("✓ 突发放行、超速排队、聊天拒绝、限流计时正确")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》定时系统测试")
+    print("=" * 40)
+
+    test_fixed_rate()
+    test_overrun_skips()
+    test_timer_wheel()
+    test_rate_limiter()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+世界管理器测试脚本
+加载 data/ 下的真实数据，不需要启动服务器
+"""
+
+import asyncio
+import shutil
+import sys
+import os
+import tempfile
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from systems.inventory import Inventory
+from world import snapshot
+from world.item_catalog import ItemCatalog
+from world.room_graph import RoomGraph, render_map
+from world.world_manager import Room
+from world.hot_reload import WorldReloader
+from world import world_manager
+from world.world_manager import WorldManager
+
+
+class FakePlayer:
+    """只包含房间相关属性的假玩家"""
+
+    def __init__(self, name, current_room="dock"):
+        self.name = name
+        self.current_room = current_room
+        self.protocol = None
+
+
+def load_world() -> WorldManager:
+    world = WorldManager()
+    asyncio.run(world.load_world())
+    return world
+
+
+def test_room_index():
+    """测试房间在场玩家索引随登录、移动、离线更新"""
+    print("测试房间在场玩家索引...")
+    world = load_world()
+    alice = FakePlayer("alice")
+    bob = FakePlayer("bob", current_room="no_such_room")
+
+    world.place_player(alice, alice.current_room)
+    world.place_player(bob, bob.current_room)
+    assert bob.current_room == "dock"
+    assert world.get_room("dock").get_players() == {alice, bob}
+
+    world.move_player(alice, "market")
+    assert alice.current_room == "market"
+    assert world.get_room("dock").get_players() == {bob}
+    assert world.get_room("market").get_players() == {alice}
+
+    assert world.move_player(alice, "no_such_room") is None
+    assert alice.current_room == "market"
+
+    world.remove_player(alice)
+    assert not world.get_room("market").get_players()
+    print("✓ 登录、移动、离线时索引正确")
+
+
+def test_world_snapshot():
+    """测试世界快照与 YAML 内容一致，并在源文件变化时重建"""
+    print("测试世界快照...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in snapshot.WORLD_FILES:
+            shutil.copy(snapshot.source_path('data', kind), tmp)
+        cache_file = os.path.join(tmp, 'world.snapshot')
+
+        from_yaml = snapshot.load_world_data(tmp)
+        assert snapshot.load_world_data(tmp, cache_file) == from_yaml
+        assert os.path.exists(cache_file)
+
+        # 之后的加载直接读快照，不再解析 YAML
+        original_parse = snapshot.parse_yaml
+        snapshot.parse_yaml = None
+        try:
+            assert snapshot.load_world_data(tmp, cache_file) == from_yaml
+
+            # 只改 mtime、内容不变：仍然使用快照
+            rooms_file = snapshot.source_path(tmp, 'rooms')
+            os.utime(rooms_file, ns=(0, 0))
+            assert snapshot.load_world_data(tmp, cache_file) == from_yaml
+        finally:
+            snapshot.parse_yaml = original_parse
+
+        # 内容变化：重新解析
+        with open(rooms_file, 'a', encoding='utf-8') as f:
+            f.write("\n- id: pier\n  title: 栈桥\n  desc: 新的栈桥。\n")
+        rooms = snapshot.load_world_data(tmp, cache_file)['rooms']
+        assert rooms[-1]['id'] == 'pier'
+
+        # 校验失败时报错
+        with open(rooms_file, 'a', encoding='utf-8') as f:
+            f.write("\n- id: pier\n  title: 重复\n  desc: 重复的 id。\n")
+        try:
+            snapshot.load_world_data(tmp, cache_file)
+            assert False, "重复 id 应该校验失败"
+        except ValueError:
+            pass
+    print("✓ 快照命中、mtime 变化、内容变化、校验失败均正确")
+
+
+def test_entity_slots():
+    """测试实体使用 __slots__，id 驻留，空字段共享同一个对象"""
+    print("测试紧凑实体...")
+    world = load_world()
+    dock = world.get_room("dock")
+    assert not hasattr(dock, '__dict__')
+    assert all(not hasattr(obj, '__dict__') for obj in (
+        next(iter(world.npcs.values())), next(iter(world.items.values())), next(iter(world.quests.values()))))
+
+    # 出口指向的房间 id 与房间自身的 id 是同一个字符串对象
+    market = world.get_room(dock.get_exit_room("S"))
+    assert market.id is dock.exits["S"]
+
+    empty = [room.monsters for room in world.rooms.values() if not room.monsters]
+    assert empty and all(m is empty[0] for m in empty)
+    print("✓ 实体没有实例字典，id 已驻留，空字段共享")
+
+
+def test_inventory():
+    """测试背包按格堆叠、容量限制和背包类物品"""
+    print("测试背包...")
+    world = load_world()
+    catalog = ItemCatalog()
+    catalog.update(world.items)
+    inventory = Inventory(catalog)
+
+    # paper_tape 每格最多 10 个，sword 不可堆叠
+    assert inventory.add("paper_tape", 25)
+    assert inventory.add("sword", 2)
+    assert [count for _, count in inventory.slots()] == [10, 10, 5, 1, 1]
+    assert inventory == {"paper_tape": 25, "sword": 2}
+    assert inventory.add("paper_tape", 5)
+    assert inventory.used_slots == 5
+
+    # 放不下时整个操作失败，背包不变
+    free = config.INVENTORY_SLOTS - inventory.used_slots
+    assert not inventory.add("sword", free + 1)
+    assert inventory.used_slots == 5
+
+    # 背包类物品增加格子；取出后放不下其余物品时不能取出
+    assert inventory.add("pouch_small")
+    assert inventory.capacity == config.INVENTORY_SLOTS + 6
+    assert inventory.add("sword", inventory.capacity - inventory.used_slots)
+    assert not inventory.remove("pouch_small")
+    assert inventory.remove("sword", 10)
+    assert inventory.remove("pouch_small")
+
+    assert inventory.remove("paper_tape", 12)
+    assert inventory["paper_tape"] == 18
+    assert not inventory.remove("paper_tape", 19)
+
+    restored = Inventory(catalog)
+    restored.load(inventory.to_dict())
+    assert restored == inventory
+    print("✓ 堆叠、容量、背包格子、存档往返均正确")
+
+
+def test_room_graph():
+    """测试房间图的最短路径、路径缓存和地图渲染"""
+    print("测试房间图...")
+    world = load_world()
+    graph = world.graph
+    assert graph.distance("dock", "dock") == 0
+    assert graph.distance("teletype", "beach") == 3
+    assert world.find_path("teletype", "beach") == ["W", "N", "E"]
+    assert graph.next_step("beach", "sewer") == "W"
+    assert world.find_path("dock", "no_such_room") is None
+
+    # 100x100 网格：同一目标只做一次 BFS
+    side = 100
+    rooms = {}
+    for i in range(side * side):
+        x, y = i % side, i // side
+        exits = {}
+        if x + 1 < side:
+            exits['E'] = f"r{i + 1}"
+        if y + 1 < side:
+            exits['N'] = f"r{i + side}"
+        rooms[f"r{i}"] = Room({'id': f"r{i}", 'title': str(i), 'desc': '', 'pos': [x, y], 'exits': exits})
+    grid = RoomGraph(rooms)
+    for i in range(side * side):
+        grid.next_step(f"r{i}", f"r{side * side - 1}")
+    assert grid.stats['bfs_runs'] == 1
+    assert grid.distance("r0", f"r{side * side - 1}") == 2 * (side - 1)
+    assert grid.distance(f"r{side * side - 1}", "r0") is None  # 单向出口
+
+    lines = render_map(world.graph, world.rooms, "dock")
+    assert any("<老码头>" in line for line in lines)
+    assert any("地下水道" in line for line in lines)  # 与杂货店坐标重叠，列在下方
+    print("✓ 最短路径、缓存、地图渲染正确")
+
+
+def test_room_view():
+    """测试房间静态部分预编码并缓存"""
+    print("测试房间视图缓存...")
+    world = load_world()
+    dock = world.get_room("dock")
+    view = dock.view
+    assert dock.view is view
+    lines = view.decode('utf-8').splitlines()
+    assert lines[0] == f"ROOM {dock.title}"
+    assert all(line.startswith("DESC ") for line in lines[1:-1]) and len(lines) > 3
+    assert lines[-1].startswith("SYS 出口: ")
+    assert view.endswith(b"\n")
+    print("✓ ROOM/DESC/出口预编码，多行描述逐行加 DESC")
+
+
+async def _hot_reload(tmp):
+    world = WorldManager(data_dir=tmp, snapshot_file=None)
+    await world.load_world()
+    reloader = WorldReloader(world)
+    alice = FakePlayer("alice")
+    world.place_player(alice, "dock")
+    old_dock = world.get_room("dock")
+    old_market = world.get_room("market")
+    old_graph = world.graph
+
+    # 没有修改时不重新加载
+    reloader.check()
+    assert reloader._task is None
+
+    rooms_file = snapshot.source_path(tmp, 'rooms')
+    with open(rooms_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(rooms_file, 'w', encoding='utf-8') as f:
+        f.write(text.replace(old_dock.title, "新码头", 1))
+    os.utime(rooms_file, ns=(1, 1))
+
+    # 摘要在线程池中计算，事件循环中只比较
+    digest_threads = set()
+    record_digest = world_manager._record_digest
+
+    def traced_digest(record):
+        digest_threads.add(threading.get_ident())
+        return record_digest(record)
+    world_manager._record_digest = traced_digest
+    try:
+        reloader.check()
+        changes = await reloader._task
+    finally:
+        world_manager._record_digest = record_digest
+    assert digest_threads and threading.get_ident() not in digest_threads
+    assert changes == {'rooms': 1, 'npcs': 0, 'items': 0, 'quests': 0}
+    new_dock = world.get_room("dock")
+    assert new_dock is not old_dock and new_dock.title == "新码头"
+    assert new_dock.view.startswith("ROOM 新码头\n".encode('utf-8'))
+    assert new_dock.get_players() == {alice}
+    assert world.get_room("market") is old_market
+    assert world.graph is not old_graph
+
+    # 数据错误时保留当前世界
+    with open(rooms_file, 'a', encoding='utf-8') as f:
+        f.write("\n- id: dock\n  title: 重复\n  desc: 重复的 id。\n")
+    assert await reloader.reload() is None
+    assert world.get_room("dock") is new_dock
+    assert reloader.reload_count == 1
+
+    # 合并之后、替换之前玩家走进了被删除的房间：该房间继续保留
+    data = {'rooms': [{'id': room.id, 'title': room.title, 'desc': room.desc, 'exits': dict(room.exits)}
+                      for room in world.rooms.values() if room.id != 'market'],
+            'npcs': [], 'items': [], 'quests': []}
+    digests = world_manager.digest_world_data(data)
+    tables, changes = world.merge_world_data(data, digests)
+    assert 'market' not in tables['rooms']
+    bob = FakePlayer("bob")
+    world.place_player(bob, "market")
+    world.commit_world_data(tables, digests, changes, None)
+    assert world.get_room("market") is old_market and bob in old_market.players
+
+
+def test_hot_reload():
+    """测试世界数据热加载只替换变化的对象并保留在场玩家"""
+    print("测试世界热加载...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in snapshot.WORLD_FILES:
+            shutil.copy(snapshot.source_path('data', kind), tmp)
+        asyncio.run(_hot_reload(tmp))
+    print("✓ 只替换修改的房间，在场玩家保留，数据错误时不生效")
+
+
+def main():
+    """主测试函数"""
+    print("《终端·回响》世界管理器测试")
+    print("=" * 40)
+
+    test_room_index()
+    test_world_snapshot()
+    test_entity_slots()
+    test_inventory()
+    test_room_graph()
+    test_room_view()
+    test_hot_reload()
+
+    print("\n测试完成！")
+
+
+if __name__ == "__main__":
+    main()
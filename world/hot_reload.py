@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+世界数据热加载
+定期检查 data/*.yml 的修改时间，有变化时在后台线程解析并热替换变化的对象
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from world.room_graph import RoomGraph
+from world.world_manager import prepare_world_data
+
+logger = logging.getLogger(__name__)
+
+class WorldReloader:
+    """世界数据热加载器
+
+    check() 只做几次 stat，可以放在时间轮中频繁调用；
+    检测到修改后，YAML 解析、摘要计算和房间图构建在线程池中进行，事件循环中只做差异合并。
+    数据校验失败时保留当前世界不变。
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.reload_count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self):
+        """检查数据文件是否被修改，是则在后台启动一次热加载"""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            stamp = self.world.get_source_stamp()
+        except OSError as e:
+            logger.warning(f"检查世界数据文件失败: {e}")
+            return
+        if stamp != self.world.source_stamp:
+            self._task = asyncio.get_running_loop().create_task(self.reload(stamp))
+
+    async def reload(self, stamp: Optional[Dict[str, tuple]] = None) -> Optional[Dict[str, int]]:
+        """重新加载世界数据，返回每类数据的变化数量，失败时返回 None"""
+        if stamp is None:
+            stamp = self.world.get_source_stamp()
+        # 无论成功与否都记录本次看到的文件状态，避免对同一个错误反复重试
+        self.world.source_stamp = stamp
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            world_data, digests = await loop.run_in_executor(
+                None, prepare_world_data, self.world.data_dir, self.world.snapshot_file)
+        except Exception as e:
+            logger.error(f"世界数据热加载失败，保留当前世界: {e}")
+            return None
+
+        # 事件循环中只比较摘要、构建变化的对象；房间有变化时房间图回到线程池中构建
+        tables, changes = self.world.merge_world_data(world_data, digests)
+        graph = None
+        if changes['rooms']:
+            graph = await loop.run_in_executor(None, RoomGraph, tables['rooms'])
+        self.world.commit_world_data(tables, digests, changes, graph)
+        self.reload_count += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        summary = ", ".join(f"{kind} {count}" for kind, count in changes.items())
+        logger.info(f"世界数据热加载完成 ({elapsed:.1f}ms)，变化: {summary}")
+        return changes
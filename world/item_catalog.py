@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+物品目录
+把 data/items.yml 中的物品 id 编译为稠密的整数编号，背包中只保存编号和数量
+"""
+
+from array import array
+import logging
+import sys
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEM_CODES = 0xFFFF  # 编号保存在 array('H') 中
+UNKNOWN_MAX_STACK = 0xFFFF  # 目录中还没有定义的物品（例如世界加载前读取的存档）不限制堆叠
+
+class ItemCatalog:
+    """物品 id <-> 整数编号
+
+    编号一经分配就不再改变：热加载删除的物品保留编号，只清空定义，
+    在线玩家背包中的编号始终有效。
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []  # 编号 -> 物品 id
+        self.index: Dict[str, int] = {}  # 物品 id -> 编号
+        self.items: List[Optional['Item']] = []  # 编号 -> 物品定义
+        self.max_stack = array('H')  # 编号 -> 每格最大堆叠数量
+        self.bag_slots = array('H')  # 编号 -> 背包类物品提供的格子数
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def code(self, item_id: str) -> int:
+        """物品 id 对应的编号，第一次出现时分配"""
+        code = self.index.get(item_id)
+        if code is None:
+            code = len(self.ids)
+            if code >= MAX_ITEM_CODES:
+                raise ValueError(f"物品种类超过上限 {MAX_ITEM_CODES}")
+            item_id = sys.intern(item_id)
+            self.ids.append(item_id)
+            self.index[item_id] = code
+            self.items.append(None)
+            self.max_stack.append(UNKNOWN_MAX_STACK)
+            self.bag_slots.append(0)
+        return code
+
+    def update(self, items: Dict[str, 'Item']):
+        """用世界数据中的物品定义更新目录"""
+        for item_id, item in items.items():
+            code = self.code(item_id)
+            self.items[code] = item
+            self.max_stack[code] = min(max(1, item.max_stack), UNKNOWN_MAX_STACK) if item.stackable else 1
+            self.bag_slots[code] = min(item.slots, UNKNOWN_MAX_STACK) if item.type == 'bag' else 0
+
+        for code, item in enumerate(self.items):
+            if item is not None and self.ids[code] not in items:
+                logger.warning(f"物品 {self.ids[code]} 已从数据中删除，背包中的该物品保留为未知物品")
+                self.items[code] = None
+                self.max_stack[code] = UNKNOWN_MAX_STACK
+                self.bag_slots[code] = 0
+
+    def name(self, code: int) -> str:
+        """显示名称，没有定义的物品显示 id"""
+        item = self.items[code]
+        return item.name if item is not None else self.ids[code]
+
+# 全局物品目录，由 WorldManager 加载世界时填充
+item_catalog = ItemCatalog()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+房间图
+加载世界时把房间出口编译成邻接表，提供最短路径、距离查询和地图渲染
+
+最短路径按目标房间缓存：对目标做一次反向 BFS，得到所有房间到它的距离和下一步方向，
+之后任意房间到该目标的 next_step/distance 都是 O(1)，大量玩家查询同一目标的路线时只搜索一次。
+"""
+
+from array import array
+from collections import OrderedDict
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+UNREACHABLE = -1
+
+class RoomGraph:
+    """由房间出口编译的有向图，房间以整数下标表示"""
+
+    def __init__(self, rooms: Dict[str, 'Room'], cache_size: int = config.ROOM_PATH_CACHE_SIZE):
+        self.ids: List[str] = list(rooms)  # 下标 -> 房间 id
+        self.index: Dict[str, int] = {room_id: i for i, room_id in enumerate(self.ids)}
+        self.directions: List[str] = []  # 方向编号 -> 方向名
+        direction_codes: Dict[str, int] = {}
+
+        # adjacency[u] = ((v, 方向编号), ...)；reverse[v] = ((u, 方向编号), ...)
+        adjacency: List[List[Tuple[int, int]]] = [[] for _ in self.ids]
+        reverse: List[List[Tuple[int, int]]] = [[] for _ in self.ids]
+        for u, room in enumerate(rooms.values()):
+            for direction, target in room.exits.items():
+                v = self.index.get(target)
+                if v is None:
+                    logger.warning(f"房间 {room.id} 的出口 {direction} 指向不存在的房间 {target}")
+                    continue
+                code = direction_codes.get(direction)
+                if code is None:
+                    code = direction_codes[direction] = len(self.directions)
+                    self.directions.append(direction)
+                adjacency[u].append((v, code))
+                reverse[v].append((u, code))
+        self.adjacency = [tuple(edges) for edges in adjacency]
+        self.reverse = [tuple(edges) for edges in reverse]
+
+        # 坐标
+        self.positions: Dict[str, Tuple[int, int]] = {room_id: tuple(room.pos) for room_id, room in rooms.items()}
+        self.by_position: Dict[Tuple[int, int], List[str]] = {}
+        for room_id, pos in self.positions.items():
+            self.by_position.setdefault(pos, []).append(room_id)
+
+        # 目标下标 -> (距离数组, 下一步方向编号数组)，按最近使用淘汰
+        self.cache_size = cache_size
+        self._routes: 'OrderedDict[int, Tuple[array, array]]' = OrderedDict()
+        self.stats = {'bfs_runs': 0, 'cache_hits': 0}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self.index
+
+    def _routes_to(self, target: int) -> Tuple[array, array]:
+        """到 target 的距离和下一步方向（反向 BFS，结果缓存）"""
+        routes = self._routes.get(target)
+        if routes is not None:
+            self._routes.move_to_end(target)
+            self.stats['cache_hits'] += 1
+            return routes
+
+        count = len(self.ids)
+        dist = array('i', [UNREACHABLE]) * count
+        step = array('h', [UNREACHABLE]) * count
+        dist[target] = 0
+        frontier = [target]
+        reverse = self.reverse
+        while frontier:
+            next_frontier = []
+            for v in frontier:
+                d = dist[v] + 1
+                for u, code in reverse[v]:
+                    if dist[u] == UNREACHABLE:
+                        dist[u] = d
+                        step[u] = code
+                        next_frontier.append(u)
+            frontier = next_frontier
+
+        routes = (dist, step)
+        self._routes[target] = routes
+        self.stats['bfs_runs'] += 1
+        if len(self._routes) > self.cache_size:
+            self._routes.popitem(last=False)
+        return routes
+
+    def distance(self, source: str, target: str) -> Optional[int]:
+        """最短步数，不可达或房间不存在时返回 None"""
+        s = self.index.get(source)
+        t = self.index.get(target)
+        if s is None or t is None:
+            return None
+        d = self._routes_to(t)[0][s]
+        return None if d == UNREACHABLE else d
+
+    def next_step(self, source: str, target: str) -> Optional[str]:
+        """从 source 走向 target 的下一步方向，已到达、不可达或房间不存在时返回 None"""
+        s = self.index.get(source)
+        t = self.index.get(target)
+        if s is None or t is None or s == t:
+            return None
+        code = self._routes_to(t)[1][s]
+        return None if code == UNREACHABLE else self.directions[code]
+
+    def path(self, source: str, target: str) -> Optional[List[str]]:
+        """完整路线（方向列表），已在目标处返回空列表，不可达返回 None"""
+        s = self.index.get(source)
+        t = self.index.get(target)
+        if s is None or t is None:
+            return None
+        dist, step = self._routes_to(t)
+        if dist[s] == UNREACHABLE:
+            return None
+
+        route = []
+        while s != t:
+            code = step[s]
+            route.append(self.directions[code])
+            # 沿着该方向的出口走一步：出口中方向唯一
+            s = next(v for v, c in self.adjacency[s] if c == code)
+        return route
+
+    def neighbors(self, room_id: str) -> Dict[str, str]:
+        """方向 -> 相邻房间 id"""
+        u = self.index.get(room_id)
+        if u is None:
+            return {}
+        return {self.directions[code]: self.ids[v] for v, code in self.adjacency[u]}
+
+    def connected(self, a: str, b: str) -> bool:
+        """两个房间之间是否有出口（任一方向）"""
+        u = self.index.get(a)
+        v = self.index.get(b)
+        if u is None or v is None:
+            return False
+        return any(w == v for w, _ in self.adjacency[u]) or any(w == u for w, _ in self.adjacency[v])
+
+def _display_width(text: str) -> int:
+    """终端显示宽度，全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+
+def _pad(text: str, width: int) -> str:
+    """居中填充到指定显示宽度"""
+    space = width - _display_width(text)
+    left = space // 2
+    return ' ' * left + text + ' ' * (space - left)
+
+def render_map(graph: RoomGraph, rooms: Dict[str, 'Room'], current: str, radius: int = config.MAP_RADIUS) -> List[str]:
+    """以 current 为中心渲染 (2*radius+1) 见方范围内的房间，北在上，当前房间用 <> 标出"""
+    cx, cy = graph.positions.get(current, (0, 0))
+
+    # 每个坐标显示一个房间；坐标重叠时优先显示当前房间，其余列在地图下方
+    cells: Dict[Tuple[int, int], str] = {}
+    hidden = []
+    for y in range(cy + radius, cy - radius - 1, -1):
+        for x in range(cx - radius, cx + radius + 1):
+            room_ids = graph.by_position.get((x, y))
+            if not room_ids:
+                continue
+            shown = current if current in room_ids else room_ids[0]
+            cells[(x, y)] = shown
+            hidden.extend(room_id for room_id in room_ids if room_id != shown)
+    if not cells:
+        return []
+
+    def label(room_id: str) -> str:
+        title = rooms[room_id].title
+        return f"<{title}>" if room_id == current else f"[{title}]"
+
+    xs = sorted({x for x, _ in cells})
+    ys = sorted({y for _, y in cells}, reverse=True)
+    width = max(_display_width(label(room_id)) for room_id in cells.values())
+    blank = ' ' * width
+
+    lines = []
+    for row, y in enumerate(ys):
+        parts = []
+        for col, x in enumerate(xs):
+            room_id = cells.get((x, y))
+            parts.append(_pad(label(room_id), width) if room_id else blank)
+            if col + 1 < len(xs):
+                east = cells.get((xs[col + 1], y))
+                linked = room_id and east and xs[col + 1] == x + 1 and graph.connected(room_id, east)
+                parts.append('-' if linked else ' ')
+        lines.append(''.join(parts).rstrip())
+
+        if row + 1 < len(ys):
+            parts = []
+            for x in xs:
+                room_id = cells.get((x, y))
+                south = cells.get((x, ys[row + 1]))
+                linked = room_id and south and ys[row + 1] == y - 1 and graph.connected(room_id, south)
+                parts.append(_pad('|' if linked else '', width))
+            lines.append(' '.join(parts).rstrip())
+
+    for room_id in hidden:
+        x, y = graph.positions[room_id]
+        lines.append(f"同一位置 ({x},{y}) 还有: {label(room_id)}")
+    return lines
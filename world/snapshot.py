@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+世界数据快照
+把 data/*.yml 解析、校验后编译成 marshal 快照，启动时直接加载
+
+快照记录每个源文件的大小、mtime 和 SHA-1：大小和 mtime 不变时直接使用快照；
+mtime 变了但内容哈希没变（例如 git checkout）时只刷新记录；内容变了才重新解析 YAML。
+
+用法: python3 -m world.snapshot  # 预先构建快照
+"""
+
+import hashlib
+import logging
+import marshal
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # 没有编译 libyaml 时退回纯 Python 实现
+    from yaml import SafeLoader as YamlLoader
+
+logger = logging.getLogger(__name__)
+
+WORLD_FILES = ('rooms', 'npcs', 'items', 'quests')
+SNAPSHOT_MAGIC = b'TCWS'
+SNAPSHOT_VERSION = 1
+
+# 各类数据必须包含的字段
+REQUIRED_FIELDS = {
+    'rooms': ('id', 'title', 'desc'),
+    'npcs': ('id', 'name'),
+    'items': ('id', 'name', 'type', 'desc'),
+    'quests': ('id', 'name', 'desc')
+}
+
+def source_path(data_dir: str, kind: str) -> str:
+    """数据文件路径"""
+    return os.path.join(data_dir, f"{kind}.yml")
+
+def parse_yaml(path: str) -> List[Dict[str, Any]]:
+    """解析一个 YAML 数据文件（优先使用 libyaml）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=YamlLoader) or []
+
+def validate(kind: str, records: Any):
+    """校验一类数据，格式错误时抛出 ValueError"""
+    if not isinstance(records, list):
+        raise ValueError(f"{kind}.yml 顶层必须是列表")
+
+    seen = set()
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"{kind}.yml 第 {index + 1} 项不是字典")
+        for field in REQUIRED_FIELDS[kind]:
+            if field not in record:
+                raise ValueError(f"{kind}.yml 第 {index + 1} 项缺少字段 {field}")
+        if record['id'] in seen:
+            raise ValueError(f"{kind}.yml 中 id 重复: {record['id']}")
+        seen.add(record['id'])
+
+def _file_sha1(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _read_snapshot(cache_file: str) -> Optional[Dict[str, Any]]:
+    """读取快照文件，不存在、损坏或版本不符时返回 None"""
+    try:
+        with open(cache_file, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            payload = f.read()
+        # 从整块字节解码比 marshal.load 逐段读取文件快一个数量级
+        snapshot = marshal.loads(payload)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"世界快照损坏，将重新构建: {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+def _write_snapshot(cache_file: str, snapshot: Dict[str, Any]):
+    """原子写入快照文件；数据目录只读等情况下只记录警告"""
+    tmp_file = f"{cache_file}.tmp"
+    try:
+        payload = marshal.dumps(snapshot)
+        with open(tmp_file, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(payload)
+        os.replace(tmp_file, cache_file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法写入世界快照 {cache_file}: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def load_world_data(data_dir: str = 'data', cache_file: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """加载世界数据，返回 {'rooms': [...], 'npcs': [...], 'items': [...], 'quests': [...]}
+
+    cache_file 为 None 时不使用快照，直接解析 YAML。
+    """
+    stats = {kind: os.stat(source_path(data_dir, kind)) for kind in WORLD_FILES}
+    snapshot = _read_snapshot(cache_file) if cache_file else None
+
+    if snapshot is not None:
+        sources = snapshot['sources']
+        if all(sources[kind]['size'] == stats[kind].st_size and
+               sources[kind]['mtime_ns'] == stats[kind].st_mtime_ns for kind in WORLD_FILES):
+            return snapshot['data']
+
+    hashes = {kind: _file_sha1(source_path(data_dir, kind)) for kind in WORLD_FILES}
+    if snapshot is not None and all(snapshot['sources'][kind]['sha1'] == hashes[kind] for kind in WORLD_FILES):
+        data = snapshot['data']
+    else:
+        data = {}
+        for kind in WORLD_FILES:
+            records = parse_yaml(source_path(data_dir, kind))
+            validate(kind, records)
+            data[kind] = records
+
+    if cache_file:
+        _write_snapshot(cache_file, {
+            'version': SNAPSHOT_VERSION,
+            'sources': {
+                kind: {
+                    'size': stats[kind].st_size,
+                    'mtime_ns': stats[kind].st_mtime_ns,
+                    'sha1': hashes[kind]
+                }
+                for kind in WORLD_FILES
+            },
+            'data': data
+        })
+    return data
+
+def build_snapshot(data_dir: str, cache_file: str) -> Dict[str, List[Dict[str, Any]]]:
+    """强制从 YAML 重新构建快照"""
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+    return load_world_data(data_dir, cache_file)
+
+def main():
+    # 添加项目根目录到Python路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import config
+
+    start = time.perf_counter()
+    data = build_snapshot('data', config.WORLD_SNAPSHOT_FILE)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_world_data('data', config.WORLD_SNAPSHOT_FILE)
+    loaded = time.perf_counter() - start
+
+    counts = ", ".join(f"{kind} {len(data[kind])}" for kind in WORLD_FILES)
+    print(f"世界快照已写入 {config.WORLD_SNAPSHOT_FILE}: {counts}")
+    print(f"YAML 解析 {built * 1000:.1f}ms，快照加载 {loaded * 1000:.1f}ms ({YamlLoader.__name__})")
+
+if __name__ == "__main__":
+    main()
@@ -6,73 +6,147 @@
 """
 
 import asyncio
-import yaml
+import hashlib
 import logging
-from typing import Dict, List, Optional
+import os
+import sys
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 import time
 
+import config
+from framing import encode_line
+from world.item_catalog import ItemCatalog, item_catalog
+from world.room_graph import RoomGraph
+from world.snapshot import WORLD_FILES, load_world_data, source_path
+
 logger = logging.getLogger(__name__)
 
 class WorldManager:
-    def __init__(self):
+    def __init__(self, data_dir: str = 'data', snapshot_file: Optional[str] = config.WORLD_SNAPSHOT_FILE,
+                 catalog: ItemCatalog = item_catalog):
+        self.data_dir = data_dir
+        self.snapshot_file = snapshot_file
+        self.catalog = catalog  # 物品 id -> 整数编号，玩家背包使用
+        self.graph = RoomGraph({})  # 房间出口编译的图，房间变化时重建
         self.rooms = {}
         self.npcs = {}
         self.items = {}
         self.quests = {}
         self.events = []
-        self.last_hourly_event = 0
-        self.last_daily_event = 0
+        self.timers = None
+        
+        # 上次加载的每条原始数据的摘要（按 id 索引），热加载时用来比较差异
+        self._digests: Dict[str, Dict[str, bytes]] = {}
+        self.source_stamp: Dict[str, tuple] = {}
         
     async def load_world(self):
-        """加载游戏世界数据"""
+        """加载游戏世界数据（优先使用编译好的快照）"""
         try:
-            # 加载房间数据
-            with open('data/rooms.yml', 'r', encoding='utf-8') as f:
-                rooms_data = yaml.safe_load(f)
-                for room_data in rooms_data:
-                    room = Room(room_data)
-                    self.rooms[room.id] = room
-            
-            # 加载NPC数据
-            with open('data/npcs.yml', 'r', encoding='utf-8') as f:
-                npcs_data = yaml.safe_load(f)
-                for npc_data in npcs_data:
-                    npc = NPC(npc_data)
-                    self.npcs[npc.id] = npc
-            
-            # 加载物品数据
-            with open('data/items.yml', 'r', encoding='utf-8') as f:
-                items_data = yaml.safe_load(f)
-                for item_data in items_data:
-                    item = Item(item_data)
-                    self.items[item.id] = item
-            
-            # 加载任务数据
-            with open('data/quests.yml', 'r', encoding='utf-8') as f:
-                quests_data = yaml.safe_load(f)
-                for quest_data in quests_data:
-                    quest = Quest(quest_data)
-                    self.quests[quest.id] = quest
+            start = time.perf_counter()
+            self.source_stamp = self.get_source_stamp()
+            world_data = load_world_data(self.data_dir, self.snapshot_file)
+            self.apply_world_data(world_data)
             
-            logger.info(f"世界加载完成: {len(self.rooms)} 房间, {len(self.npcs)} NPC, {len(self.items)} 物品, {len(self.quests)} 任务")
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.info(f"世界加载完成: {len(self.rooms)} 房间, {len(self.npcs)} NPC, {len(self.items)} 物品, {len(self.quests)} 任务 ({elapsed:.1f}ms)")
             
         except Exception as e:
             logger.error(f"加载世界数据失败: {e}")
             raise
     
-    async def tick(self):
-        """世界tick更新"""
-        current_time = time.time()
+    def get_source_stamp(self) -> Dict[str, tuple]:
+        """数据文件的 (mtime, 大小)，用于检测文件是否被修改"""
+        stamp = {}
+        for kind in WORLD_FILES:
+            stat = os.stat(source_path(self.data_dir, kind))
+            stamp[kind] = (stat.st_mtime_ns, stat.st_size)
+        return stamp
+    
+    def apply_world_data(self, world_data: Dict[str, List[dict]],
+                         digests: Optional[Dict[str, Dict[str, bytes]]] = None) -> Dict[str, int]:
+        """应用世界数据，只重建有变化的对象，返回每类数据的变化数量（启动时同步调用）"""
+        if digests is None:
+            digests = digest_world_data(world_data)
+        tables, changes = self.merge_world_data(world_data, digests)
+        graph = RoomGraph(tables['rooms']) if changes['rooms'] else None
+        self.commit_world_data(tables, digests, changes, graph)
+        return changes
+    
+    def merge_world_data(self, world_data: Dict[str, List[dict]],
+                         digests: Dict[str, Dict[str, bytes]]) -> tuple:
+        """按摘要比较差异，只构建变化的对象，返回 (新的对象表, 每类的变化数量)，不替换当前世界
+        
+        摘要由 digest_world_data 预先算好（热加载时在线程池中），这里只做比较。
+        """
+        tables = {}
+        changes = {}
+        for kind, cls, current in (('rooms', Room, self.rooms), ('npcs', NPC, self.npcs),
+                                   ('items', Item, self.items), ('quests', Quest, self.quests)):
+            tables[kind], changes[kind] = self._merge(kind, cls, world_data[kind], digests[kind], current)
+        changes['rooms'] -= self._retain_occupied(tables['rooms'], digests['rooms'])
+        return tables, changes
+    
+    def commit_world_data(self, tables: Dict[str, Dict], digests: Dict[str, Dict[str, bytes]],
+                          changes: Dict[str, int], graph: Optional[RoomGraph]):
+        """一次性替换对象表和房间图（graph 为 None 时沿用当前的图）
         
-        # 检查整点事件
-        if int(current_time) % 3600 == 0 and int(current_time) != self.last_hourly_event:
-            await self.trigger_hourly_event()
-            self.last_hourly_event = int(current_time)
+        热加载在合并之后等待线程池构建房间图，期间玩家可能走进了被删除的房间，这里再保留一次。
+        """
+        self._retain_occupied(tables['rooms'], digests['rooms'])
+        self.rooms, self.npcs, self.items, self.quests = tables['rooms'], tables['npcs'], tables['items'], tables['quests']
+        if changes['items']:
+            self.catalog.update(self.items)
+        if graph is not None:
+            self.graph = graph
+        self._digests = digests
+    
+    def _retain_occupied(self, rooms: Dict[str, 'Room'], digests: Dict[str, bytes]) -> int:
+        """仍有玩家的房间即使已从数据中删除也暂时保留，避免玩家落入不存在的房间，返回保留的数量"""
+        kept = 0
+        for room_id, room in self.rooms.items():
+            if room.players and room_id not in rooms:
+                logger.warning(f"房间 {room_id} 已从数据中删除，但仍有 {len(room.players)} 个玩家，暂时保留")
+                rooms[room_id] = room
+                digests[room_id] = self._digests.get('rooms', {}).get(room_id)
+                kept += 1
+        return kept
+    
+    def _merge(self, kind: str, cls, records: List[dict], digests: Dict[str, bytes], current: Dict) -> tuple:
+        """合并一类数据：内容没变的对象原样保留，变化的重新构建"""
+        old_digests = self._digests.get(kind, {})
+        merged = {}
+        changed = 0
+        
+        for record in records:
+            obj_id = record['id']
+            old = current.get(obj_id)
+            if old is not None and old_digests.get(obj_id) == digests[obj_id]:
+                merged[obj_id] = old
+                continue
+            
+            obj = cls(record)
+            if kind == 'rooms' and old is not None:
+                obj.players = old.players
+            merged[obj_id] = obj
+            changed += 1
+        
+        for obj_id in current:
+            if obj_id not in merged:
+                changed += 1
         
-        # 检查每日事件
-        if int(current_time // 86400) != self.last_daily_event:
-            await self.trigger_daily_event()
-            self.last_daily_event = int(current_time // 86400)
+        return merged, changed
+    
+    def setup_timers(self, timers):
+        """注册整点和每日事件（对齐到整点/UTC零点）"""
+        self.timers = timers
+        now = timers.clock()
+        timers.call_every(3600, self.trigger_hourly_event, first=(now // 3600 + 1) * 3600)
+        timers.call_every(86400, self.trigger_daily_event, first=(now // 86400 + 1) * 86400)
+    
+    async def tick(self):
+        """世界tick更新（定时事件由时间轮触发）"""
+        pass
     
     async def trigger_hourly_event(self):
         """触发整点事件"""
@@ -99,31 +173,125 @@ class WorldManager:
     def get_quest(self, quest_id: str) -> Optional['Quest']:
         """获取任务"""
         return self.quests.get(quest_id)
+    
+    def place_player(self, player, room_id: str) -> Optional['Room']:
+        """把玩家放入房间（登录时调用），房间不存在时放到出生点"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            logger.warning(f"房间 {room_id} 不存在，玩家 {player.name} 被放到出生点")
+            room = self.rooms.get(config.STARTING_ROOM)
+            if room is None:
+                return None
+        
+        player.current_room = room.id
+        room.add_player(player)
+        return room
+    
+    def move_player(self, player, room_id: str) -> Optional['Room']:
+        """把玩家从当前房间移动到目标房间"""
+        target = self.rooms.get(room_id)
+        if target is None:
+            return None
+        
+        current = self.rooms.get(player.current_room)
+        if current is not None:
+            current.remove_player(player)
+        
+        player.current_room = target.id
+        target.add_player(player)
+        return target
+    
+    def remove_player(self, player):
+        """玩家离线时从所在房间移除"""
+        room = self.rooms.get(player.current_room)
+        if room is not None:
+            room.remove_player(player)
+
+    def find_room(self, name: str) -> Optional['Room']:
+        """按 id 或标题查找房间"""
+        room = self.rooms.get(name) or self.rooms.get(name.lower())
+        if room is not None:
+            return room
+        for room in self.rooms.values():
+            if room.title == name:
+                return room
+        return None
+
+    def find_path(self, source: str, target: str) -> Optional[List[str]]:
+        """两个房间之间的最短路线（方向列表），不可达时返回 None"""
+        return self.graph.path(source, target)
+
+# 缺省字段共享同一个不可变对象，不为每个实体单独分配空容器
+_EMPTY_TUPLE = ()
+_EMPTY_MAPPING = MappingProxyType({})
+_ORIGIN = (0, 0)
+
+def _intern_tuple(values) -> tuple:
+    """字符串 id 列表转为驻留字符串元组"""
+    if not values:
+        return _EMPTY_TUPLE
+    return tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+
+def _mapping(values) -> Mapping:
+    """字典字段，为空时返回共享的只读空映射"""
+    return values if values else _EMPTY_MAPPING
+
+def _record_digest(record: dict) -> bytes:
+    """一条原始数据的摘要；只保留摘要而不是整条数据，加载后原始数据即可释放"""
+    return hashlib.blake2b(repr(record).encode('utf-8'), digest_size=16).digest()
+
+def digest_world_data(world_data: Dict[str, List[dict]]) -> Dict[str, Dict[str, bytes]]:
+    """每类数据按 id 索引的摘要"""
+    return {kind: {record['id']: _record_digest(record) for record in records}
+            for kind, records in world_data.items()}
+
+def prepare_world_data(data_dir: str, snapshot_file: Optional[str]) -> tuple:
+    """读取世界数据并计算摘要，返回 (数据, 摘要)；热加载时整个在线程池中执行"""
+    world_data = load_world_data(data_dir, snapshot_file)
+    return world_data, digest_world_data(world_data)
 
 class Room:
+    __slots__ = ('id', 'title', 'desc', 'pos', 'exits', 'npcs', 'monsters',
+                 'items', 'features', 'on_enter', 'players', '_view')
+    
     def __init__(self, data: dict):
-        self.id = data['id']
+        self.id = sys.intern(data['id'])
         self.title = data['title']
         self.desc = data['desc']
-        self.pos = data.get('pos', [0, 0])
-        self.exits = data.get('exits', {})
-        self.npcs = data.get('npcs', [])
-        self.monsters = data.get('monsters', [])
-        self.items = data.get('items', [])
-        self.features = data.get('features', [])
-        self.on_enter = data.get('on_enter', [])
-        self.players = []
+        pos = data.get('pos')
+        self.pos = tuple(pos) if pos else _ORIGIN
+        exits = data.get('exits')
+        self.exits = {sys.intern(d): sys.intern(r) for d, r in exits.items()} if exits else _EMPTY_MAPPING
+        self.npcs = _intern_tuple(data.get('npcs'))
+        self.monsters = _intern_tuple(data.get('monsters'))
+        self.items = _intern_tuple(data.get('items'))
+        self.features = _intern_tuple(data.get('features'))
+        self.on_enter = _intern_tuple(data.get('on_enter'))
+        self.players = set()  # 由 WorldManager 维护的在场玩家索引
+        self._view: Optional[bytes] = None
+    
+    @property
+    def view(self) -> bytes:
+        """房间静态部分（ROOM、逐行 DESC、出口）预编码后的字节
+        
+        房间数据变化时热加载会创建新的 Room，所以缓存不需要单独失效。
+        """
+        if self._view is None:
+            lines = [f"ROOM {self.title}"]
+            lines.extend(f"DESC {line}" for line in self.desc.rstrip('\n').split('\n'))
+            if self.exits:
+                exits = ", ".join([f"{dir} -> {room_id}" for dir, room_id in self.exits.items()])
+                lines.append(f"SYS 出口: {exits}")
+            self._view = encode_line("\n".join(lines))
+        return self._view
     
     def add_player(self, player):
         """添加玩家到房间"""
-        if player not in self.players:
-            self.players.append(player)
-            player.current_room = self
+        self.players.add(player)
     
     def remove_player(self, player):
         """从房间移除玩家"""
-        if player in self.players:
-            self.players.remove(player)
+        self.players.discard(player)
     
     def get_players(self):
         """获取房间内的玩家"""
@@ -135,38 +303,46 @@ class Room:
         return room_id
 
 class NPC:
+    __slots__ = ('id', 'name', 'title', 'room', 'dialog', 'trade', 'quests', 'inventory')
+    
     def __init__(self, data: dict):
-        self.id = data['id']
+        self.id = sys.intern(data['id'])
         self.name = data['name']
         self.title = data.get('title', '')
-        self.room = data.get('room', '')
-        self.dialog = data.get('dialog', {})
-        self.trade = data.get('trade', {})
-        self.quests = data.get('quests', [])
-        self.inventory = data.get('inventory', [])
+        self.room = sys.intern(data.get('room', ''))
+        self.dialog = _mapping(data.get('dialog'))
+        self.trade = _mapping(data.get('trade'))
+        self.quests = _intern_tuple(data.get('quests'))
+        self.inventory = _intern_tuple(data.get('inventory'))
 
 class Item:
+    __slots__ = ('id', 'name', 'type', 'desc', 'value', 'weight', 'stackable',
+                 'max_stack', 'slots', 'durability', 'damage', 'defense', 'effect')
+    
     def __init__(self, data: dict):
-        self.id = data['id']
+        self.id = sys.intern(data['id'])
         self.name = data['name']
-        self.type = data['type']
+        self.type = sys.intern(data['type'])
         self.desc = data['desc']
         self.value = data.get('value', 0)
         self.weight = data.get('weight', 0.0)
         self.stackable = data.get('stackable', False)
         self.max_stack = data.get('max_stack', 1)
+        self.slots = data.get('slots', 0)  # 背包类物品提供的格子数
         self.durability = data.get('durability', 100)
         self.damage = data.get('damage', 0)
         self.defense = data.get('defense', 0)
         self.effect = data.get('effect', '')
 
 class Quest:
+    __slots__ = ('id', 'name', 'desc', 'type', 'steps', 'reward', 'repeatable', 'completed')
+    
     def __init__(self, data: dict):
-        self.id = data['id']
+        self.id = sys.intern(data['id'])
         self.name = data['name']
         self.desc = data['desc']
-        self.type = data.get('type', 'side')
-        self.steps = data.get('steps', [])
-        self.reward = data.get('reward', {})
+        self.type = sys.intern(data.get('type', 'side'))
+        self.steps = tuple(data.get('steps') or _EMPTY_TUPLE)
+        self.reward = _mapping(data.get('reward'))
         self.repeatable = data.get('repeatable', False)
         self.completed = False